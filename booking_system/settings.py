@@ -44,7 +44,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "bookings.middleware.StaticFilesMiddleware",  # whitenoise, async-capable
 
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -55,6 +55,17 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Opt-in request profiling: Server-Timing header, slow-request log, sampled cProfile dumps
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+PROFILING = {
+    "SLOW_REQUEST_MS": float(os.getenv("PROFILING_SLOW_REQUEST_MS", "500")),
+    "WORST_SQL": int(os.getenv("PROFILING_WORST_SQL", "3")),
+    "CPROFILE_SAMPLE_RATE": float(os.getenv("PROFILING_CPROFILE_SAMPLE_RATE", "0")),
+    "CPROFILE_DIR": os.getenv("PROFILING_CPROFILE_DIR", str(BASE_DIR / "profiles")),
+}
+if PROFILING_ENABLED:
+    MIDDLEWARE.insert(0, "bookings.middleware.ProfilingMiddleware")
+
 ROOT_URLCONF = "booking_system.urls"
 
 TEMPLATES = [
@@ -73,6 +84,19 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "booking_system.wsgi.application"
+ASGI_APPLICATION = "booking_system.asgi.application"
+
+# Serve the read endpoints (slots, services, my-bookings, me) with async views;
+# meant for ASGI workers (SERVER_MODE=asgi in start.sh)
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "False").lower() == "true"
+
+# Slot-events feed (bookings.feed, ASGI only): broker waking the streams on
+# commit, comment line interval, how long one connection is held open, and
+# how old an event must be to be sent (longer than any booking transaction)
+FEED_BROKER = os.getenv("FEED_BROKER", "bookings.feed.LocalBroker")
+FEED_HEARTBEAT_SECONDS = float(os.getenv("FEED_HEARTBEAT_SECONDS", "15"))
+FEED_MAX_SECONDS = float(os.getenv("FEED_MAX_SECONDS", "300"))
+FEED_SETTLE_SECONDS = float(os.getenv("FEED_SETTLE_SECONDS", "1"))
 
 
 # ======================================================
@@ -94,10 +118,75 @@ DATABASES = {
     }
 }
 
+# Local stand-in (tests, benchmarks): DB_ENGINE=sqlite
+if os.getenv("DB_ENGINE", "").lower() == "sqlite":
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.getenv("SQLITE_PATH", str(BASE_DIR / "db.sqlite3")),
+    }
+
+# Connection reuse. DB_POOL_SIZE > 0: a bounded pool per process shared by all
+# threads (threaded / ASGI workers), connections go back to it after each
+# request. Otherwise each thread keeps its connection for DB_CONN_MAX_AGE
+# seconds, health-checked before reuse (sync workers).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "0"))
+
+if DB_POOL_SIZE > 0:
+    DATABASES["default"]["ENGINE"] = DATABASES["default"]["ENGINE"].replace("django.db.backends.", "bookings.db.")
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["POOL"] = {
+        "MAX_SIZE": DB_POOL_SIZE,
+        "TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        "MAX_IDLE": float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+    }
+else:
+    DATABASES["default"]["CONN_MAX_AGE"] = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+
+
+# ======================================================
+# Cache (locmem per process unless a shared backend is configured)
+# ======================================================
+REDIS_URL = os.getenv("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Seconds a computed available-slots list is kept (invalidated on writes anyway)
+SLOTS_CACHE_TIMEOUT = int(os.getenv("SLOTS_CACHE_TIMEOUT", "300"))
+
+# Days ahead whose slots `pregenerate_slots` creates in advance; reading them never
+# writes. Dates outside the horizon are still generated on demand (0: always)
+SLOT_HORIZON_DAYS = int(os.getenv("SLOT_HORIZON_DAYS", "60"))
+
 
 # ======================================================
 # Password validation
 # ======================================================
+# PBKDF2 with a per-deployment cost, hashed on a bounded pool (bookings.passwords);
+# existing hashes of any other count keep working and are upgraded on login
+PASSWORD_HASHERS = [
+    "bookings.passwords.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+PBKDF2_ITERATIONS = int(os.getenv("PBKDF2_ITERATIONS", "600000"))
+# threads hashing passwords at once, per process; keep it below the core count
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
@@ -130,17 +219,67 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # ======================================================
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "bookings.authentication.BookingJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
+    # orjson when installed, byte-identical to DRF's JSONRenderer
+    "DEFAULT_RENDERER_CLASSES": (
+        "bookings.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    # token buckets per user (per IP when anonymous) for the scopes views declare;
+    # an empty rate turns its scope off
+    "DEFAULT_THROTTLE_CLASSES": (
+        "bookings.throttling.BucketThrottle",
+    ),
+    "DEFAULT_THROTTLE_RATES": {
+        "slots": os.getenv("THROTTLE_SLOTS_RATE", "120/min") or None,
+        "booking_writes": os.getenv("THROTTLE_BOOKING_WRITES_RATE", "30/min") or None,
+        "login": os.getenv("THROTTLE_LOGIN_RATE", "10/min") or None,
+        "register": os.getenv("THROTTLE_REGISTER_RATE", "10/hour") or None,
+    },
+    # proxies in front of the app, for the client IP in X-Forwarded-For: set it
+    # per deployment (0 ignores the header); unset keeps DRF's default
+    "NUM_PROXIES": int(os.environ["NUM_PROXIES"]) if os.getenv("NUM_PROXIES") else None,
 }
 
+THROTTLE_ENABLED = os.getenv("THROTTLE_ENABLED", "True").lower() == "true"
+
+# Raise instead of logging when a view exceeds its declared query budget
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "False").lower() == "true"
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "AUTH_HEADER_TYPES": ("Bearer",),
+    "TOKEN_OBTAIN_SERIALIZER": "bookings.serializers.BookingTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "bookings.serializers.BookingTokenRefreshSerializer",
+}
+
+# Seconds an authenticated user's fields are cached by id (dropped when the user is saved)
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv("AUTH_USER_CACHE_TIMEOUT", "60"))
+
+# Trust the user fields embedded in access tokens instead of loading the user:
+# no auth query at all, but changes (deactivation, a revoked is_staff too) only
+# apply to new access tokens. Refresh tokens carry none of them: a refresh
+# re-reads the user, so a change lasts at most ACCESS_TOKEN_LIFETIME
+AUTH_TOKEN_CLAIMS = os.getenv("AUTH_TOKEN_CLAIMS", "False").lower() == "true"
+
+
+# ======================================================
+# Logging
+# ======================================================
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "bookings": {"handlers": ["console"], "level": "INFO"},
+    },
 }
 
 
@@ -1,8 +1,76 @@
-from django.contrib import admin
-from .models import Service, Availability, Booking
+from django.contrib import admin, messages
+from .lifecycle import cancel_bookings, confirm_bookings
+from .models import ArchivedAvailability, ArchivedBooking, Service, Availability, Booking
 
 # Register your models here.
 
 admin.site.register(Service)
-admin.site.register(Availability)
-admin.site.register(Booking)
\ No newline at end of file
+
+
+@admin.register(Availability)
+class AvailabilityAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "is_active")
+    list_filter = ("is_active", "date")
+    list_select_related = ("service",)
+
+
+@admin.register(Booking)
+class BookingAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "status", "date", "start_time", "end_time")
+    list_filter = ("status", "date")
+    list_select_related = ("user", "service")
+    # the default <select> widgets would render every user / slot (and its service)
+    raw_id_fields = ("user", "availability")
+    actions = ["confirm_selected", "cancel_selected"]
+
+    @admin.action(description="Confirm selected bookings", permissions=["change"])
+    def confirm_selected(self, request, queryset):
+        self.report(request, confirm_bookings(queryset), "Confirmed")
+
+    @admin.action(description="Cancel selected bookings", permissions=["change"])
+    def cancel_selected(self, request, queryset):
+        self.report(request, cancel_bookings(queryset), "Cancelled")
+
+    def report(self, request, report, done):
+        rejected = {}
+        for result in report["results"]:
+            if result["status"] == "rejected":
+                rejected.setdefault(result["detail"], []).append(f"#{result['id']}")
+        self.message_user(request, f"{done} {len(report['results']) - sum(map(len, rejected.values()))} booking(s).")
+        for detail, ids in rejected.items():
+            self.message_user(request, f"{detail} ({', '.join(ids)})", messages.WARNING)
+
+    def save_model(self, request, obj, form, change):
+        # conflict checks read the snapshot columns
+        if obj.availability_id:
+            slot = obj.availability
+            obj.date, obj.start_time, obj.end_time = slot.date, slot.start_time, slot.end_time
+        super().save_model(request, obj, form, change)
+
+
+class ArchiveAdmin(admin.ModelAdmin):
+    """Read-only access to rows moved out by the archive command."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedAvailability)
+class ArchivedAvailabilityAdmin(ArchiveAdmin):
+    list_display = ("__str__", "is_active", "archived_at")
+    list_filter = ("is_active", "date")
+    list_select_related = ("service",)
+
+
+@admin.register(ArchivedBooking)
+class ArchivedBookingAdmin(ArchiveAdmin):
+    list_display = ("__str__", "status", "date", "start_time", "end_time", "archived_at")
+    list_filter = ("status", "date")
+    list_select_related = ("user", "service")
+    search_fields = ("user__username",)
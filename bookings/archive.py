@@ -0,0 +1,65 @@
+"""
+Moves old rows out of the hot Booking and Availability tables into
+ArchivedBooking and ArchivedAvailability, so conflict checks, slot lists and
+the admin keep scanning only current data.
+
+Rows move in chunks of one transaction each (insert into the archive, delete
+from the hot table), oldest id first: an interrupted run loses nothing and the
+next run continues where it stopped.
+"""
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .cache import invalidate_slots
+from .intervals import ACTIVE_STATUSES
+from .models import ArchivedAvailability, ArchivedBooking, Availability, Booking, DateLock
+
+BOOKING_FIELDS = (
+    "id", "date", "start_time", "end_time", "user_id", "service_id", "availability_id", "status", "notes",
+)
+AVAILABILITY_FIELDS = ("id", "service_id", "date", "start_time", "end_time", "is_active")
+
+
+def _delete(model, ids):
+    # a plain DELETE: QuerySet.delete() would send post_delete for every row,
+    # and the occupancy of archived dates goes away with their DateLock rows
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(ids))})", list(ids))
+
+
+def _move(model, archive_model, fields, queryset, batch):
+    """Moves the rows of queryset, `batch` per transaction. Yields each moved chunk."""
+    while True:
+        with transaction.atomic():
+            rows = list(queryset.order_by("id").values(*fields)[:batch])
+            if not rows:
+                return
+            archive_model.objects.bulk_create([archive_model(**row) for row in rows])
+            _delete(model, [row["id"] for row in rows])
+            invalidate_slots(*{row["date"] for row in rows})
+        yield rows
+
+
+def archive_bookings(cutoff, batch=1000, cancelled=False):
+    """
+    Archives the bookings dated before cutoff (with `cancelled`, also every
+    booking that is no longer active). Yields the number moved per chunk.
+    """
+    old = Q(date__lt=cutoff) | Q(date=None, availability__date__lt=cutoff)
+    if cancelled:
+        old |= ~Q(status__in=ACTIVE_STATUSES)
+    for rows in _move(Booking, ArchivedBooking, BOOKING_FIELDS, Booking.objects.filter(old), batch):
+        yield len(rows)
+
+
+def archive_availabilities(cutoff, batch=1000):
+    """
+    Archives the slots dated before cutoff that no remaining booking holds
+    (run archive_bookings first), then drops the DateLock rows of those dates.
+    Yields the number moved per chunk.
+    """
+    queryset = Availability.objects.filter(date__lt=cutoff, booking__isnull=True)
+    for rows in _move(Availability, ArchivedAvailability, AVAILABILITY_FIELDS, queryset, batch):
+        yield len(rows)
+    DateLock.objects.filter(date__lt=cutoff).delete()
@@ -0,0 +1,15 @@
+from django.urls import path
+
+from . import async_views
+
+# Mounted before bookings.urls when ASYNC_VIEWS is on; anything else falls through to DRF.
+urlpatterns = [
+    path("services/", async_views.service_list),
+    path("services/<int:pk>/", async_views.service_detail),
+    path("services/<int:pk>/available-slots/", async_views.available_slots),
+    path("services/<int:pk>/slot-events/", async_views.slot_events),  # no sync counterpart
+    path("my-bookings/", async_views.my_bookings),
+    path("auth/me/", async_views.me),
+    path("auth/register/", async_views.register),
+    path("auth/login/", async_views.login),
+]
@@ -0,0 +1,295 @@
+"""
+Async-native read endpoints, the slot-events feed, login and registration,
+served instead of their DRF counterparts when ASYNC_VIEWS is on (see
+booking_system/urls.py). Under an ASGI server a worker keeps serving other
+requests while these wait on the database or on a password hash.
+Responses are the same as the DRF views'.
+"""
+import json
+from datetime import datetime
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import _clean_credentials, user_login_failed
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import AnonymousUser, User, update_last_login
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from . import feed, passwords
+from .authentication import BookingJWTAuthentication
+from .cache import acatalog_etag, aget_available_slots, aslots_etag
+from .models import Booking, Service
+from .pagination import BookingCursorPagination
+from .projections import Shape
+from .renderers import FastJSONRenderer
+from .serializers import (
+    AvailabilitySerializer, BookingSerializer, BookingTokenObtainPairSerializer, RegisterSerializer, ServiceSerializer,
+)
+from .slots import aensure_slots_on_demand, afree_slots
+from .throttling import BucketThrottle
+from .views import LoginView, MeView, RegisterView, ServiceViewSet
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    renderer = FastJSONRenderer()
+    return HttpResponse(renderer.render(data), status=status_code, content_type=renderer.media_type)
+
+
+async def conditional(request, etag, respond):
+    """
+    What django.views.decorators.http.condition does for the DRF views: 304 when
+    If-None-Match matches etag, else await respond(); both carry the ETag.
+    """
+    if etag is None:
+        return await respond()
+    etag = quote_etag(etag)
+    response = get_conditional_response(request, etag=etag) or await respond()
+    response.headers.setdefault("ETag", etag)
+    return response
+
+
+def error_response(exc):
+    """What DRF's exception handler renders for an APIException."""
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+    response = json_response(data, exc.status_code)
+    if getattr(exc, "wait", None):
+        response["Retry-After"] = str(exc.wait)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        response.status_code = status.HTTP_401_UNAUTHORIZED
+        response["WWW-Authenticate"] = BookingJWTAuthentication().authenticate_header(None)
+    return response
+
+
+def async_api_view(fallback=None, throttle_scope=None, method="GET", anonymous=False):
+    """
+    Authenticates the Bearer token and requires a user, like IsAuthenticated
+    (anonymous views skip both), then applies the BucketThrottle of
+    throttle_scope. Other methods than `method` are handed to the sync DRF
+    view `fallback`.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != method:
+                if fallback is None:
+                    return error_response(exceptions.MethodNotAllowed(request.method))
+                return await sync_to_async(fallback)(request, *args, **kwargs)
+
+            try:
+                if anonymous:
+                    request.user = AnonymousUser()
+                else:
+                    auth = await BookingJWTAuthentication().aauthenticate(request)
+                    if auth is None:
+                        raise exceptions.NotAuthenticated()
+                    request.user = auth[0]
+                throttle = BucketThrottle()
+                if not await throttle.aallow_request(request, view, throttle_scope):
+                    raise exceptions.Throttled(throttle.wait())
+                return await view(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                return error_response(exc)
+
+        wrapper.csrf_exempt = True  # as DRF views; tokens, not cookies
+        return wrapper
+    return decorator
+
+
+def request_data(request):
+    """The JSON or form body, as DRF's default parsers would read it."""
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError as exc:
+            raise exceptions.ParseError(f"JSON parse error - {exc}")
+        if not isinstance(data, dict):
+            raise exceptions.ParseError("Expected a JSON object.")
+        return data
+    return request.POST
+
+
+async def aget_service(pk):
+    try:
+        return await Service.objects.aget(pk=pk)
+    except (Service.DoesNotExist, ValueError):
+        raise exceptions.NotFound("No Service matches the given query.")
+
+
+async def aget_service_row(pk, shape):
+    """The projected ServiceSerializer data of a service."""
+    try:
+        row = await shape.projection.values(Service.objects.filter(pk=pk)).afirst()
+    except ValueError:
+        row = None
+    if row is None:
+        raise exceptions.NotFound("No Service matches the given query.")
+    return shape.projection.row(row)
+
+
+@async_api_view(fallback=ServiceViewSet.as_view({"get": "list", "post": "create"}))
+async def service_list(request):
+    shape = Shape(request.GET, ServiceSerializer)
+
+    async def respond():
+        rows = [row async for row in shape.projection.values(Service.objects.all())]
+        return json_response(shape.render(rows))
+
+    return await conditional(request, await acatalog_etag() + shape.etag_suffix, respond)
+
+
+@async_api_view(fallback=ServiceViewSet.as_view({
+    "get": "retrieve", "put": "update", "patch": "partial_update", "delete": "destroy",
+}))
+async def service_detail(request, pk):
+    shape = Shape(request.GET, ServiceSerializer)
+
+    async def respond():
+        return json_response(await aget_service_row(pk, shape))
+
+    return await conditional(request, await acatalog_etag() + shape.etag_suffix, respond)
+
+
+@async_api_view(throttle_scope="slots")
+async def available_slots(request, pk):
+    """GET /api/services/{id}/available-slots/?date=YYYY-MM-DD (see ServiceViewSet.available_slots)."""
+    shape = Shape(request.GET, AvailabilitySerializer)
+    try:
+        etag = await aslots_etag(pk, datetime.strptime(request.GET.get("date", ""), "%Y-%m-%d").date())
+        etag += shape.etag_suffix
+    except ValueError:
+        etag = None
+    return await conditional(request, etag, lambda: slots_response(request, pk))
+
+
+async def slots_response(request, pk):
+    service = await aget_service(pk)
+    date_str = request.GET.get("date")
+
+    if not date_str:
+        raise exceptions.ParseError("date query param is required (YYYY-MM-DD).")
+
+    try:
+        target_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+    except ValueError:
+        raise exceptions.ParseError("Invalid date format. Use YYYY-MM-DD.")
+
+    shape = Shape(request.GET, AvailabilitySerializer)
+
+    async def compute():
+        await aensure_slots_on_demand([service.id], [target_date])
+        free = (await afree_slots([service.id], [target_date]))[(service.id, target_date)]
+        return AvailabilitySerializer(free, many=True).data
+
+    return json_response(shape.apply(await aget_available_slots(service.id, target_date, compute)))
+
+
+@async_api_view()
+async def my_bookings(request):
+    shape = Shape(request.GET, BookingSerializer)
+    rows = shape.projection.values(Booking.objects.filter(user=request.user))
+    paginator = BookingCursorPagination()
+    # the paginator evaluates the page itself; run it off the event loop
+    page = await sync_to_async(paginator.paginate_queryset)(rows, Request(request))
+    return json_response(paginator.get_paginated_response(shape.render(page)).data)
+
+
+@async_api_view()
+async def me(request):
+    return json_response(MeView.payload(request.user))
+
+
+@async_api_view(throttle_scope="slots")
+async def slot_events(request, pk):
+    """
+    GET /api/services/{id}/slot-events/?date=YYYY-MM-DD (date optional): a
+    text/event-stream of the service's slots being taken and freed (see
+    bookings.feed). Resumes after the Last-Event-ID header (or ?last_event_id=),
+    else starts from now. Refetch available-slots after a gap.
+    """
+    service = await aget_service(pk)
+    day = request.GET.get("date")
+    if day:
+        try:
+            day = datetime.strptime(day, "%Y-%m-%d").date()
+        except ValueError:
+            raise exceptions.ParseError("Invalid date format. Use YYYY-MM-DD.")
+    else:
+        day = None
+
+    last_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    if last_id:
+        try:
+            last_id = int(last_id)
+        except ValueError:
+            raise exceptions.ParseError("Last-Event-ID must be an event id.")
+    else:
+        last_id = await feed.alast_event_id()
+
+    response = StreamingHttpResponse(feed.stream(service.id, day, last_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx: pass events through as they come
+    return response
+
+
+MODEL_BACKEND = "django.contrib.auth.backends.ModelBackend"
+
+# Login and registration hash a password: the hash runs on the bookings.passwords
+# pool while the event loop serves other requests, and the queries around it on
+# the sync thread, as the other async views' ORM work.
+
+@async_api_view(fallback=RegisterView.as_view(), throttle_scope="register", method="POST", anonymous=True)
+async def register(request):
+    """POST /api/auth/register/ (see RegisterView)."""
+    serializer = RegisterSerializer(data=request_data(request))
+    await sync_to_async(serializer.is_valid)(raise_exception=True)
+    encoded = await passwords.amake_password(serializer.validated_data["password"])
+    await sync_to_async(serializer.save)(password_hash=encoded)
+    return json_response({"message": "User registered successfully"}, status.HTTP_201_CREATED)
+
+
+@async_api_view(fallback=LoginView.as_view(), throttle_scope="login", method="POST", anonymous=True)
+async def login(request):
+    """
+    POST /api/auth/login/: the tokens TokenObtainPairView issues, with what
+    authenticate() does for ModelBackend: user_can_authenticate(), outdated
+    hashes re-encoded, user_login_failed sent. Other AUTHENTICATION_BACKENDS
+    are left to the sync view.
+    """
+    if list(settings.AUTHENTICATION_BACKENDS) != [MODEL_BACKEND]:
+        return await sync_to_async(LoginView.as_view())(request)
+
+    data = request_data(request)
+    errors = {
+        name: [exceptions.ErrorDetail("This field is required.", code="required")]
+        for name in (User.USERNAME_FIELD, "password") if not data.get(name)
+    }
+    if errors:
+        raise exceptions.ValidationError(errors)
+
+    credentials = {User.USERNAME_FIELD: data[User.USERNAME_FIELD], "password": data["password"]}
+    user = await User._default_manager.filter(**{User.USERNAME_FIELD: credentials[User.USERNAME_FIELD]}).afirst()
+    if user is None:
+        # as ModelBackend: spend the time of a hash, so unknown names are not faster
+        await passwords.amake_password(data["password"])
+    elif (
+        await passwords.acheck_user_password(user, data["password"])
+        and ModelBackend().user_can_authenticate(user)
+    ):
+        refresh = await sync_to_async(BookingTokenObtainPairSerializer.get_token)(user)
+        if jwt_settings.UPDATE_LAST_LOGIN:
+            await sync_to_async(update_last_login)(None, user)
+        return json_response({"refresh": str(refresh), "access": str(refresh.access_token)})
+
+    await sync_to_async(user_login_failed.send)(
+        sender="django.contrib.auth", credentials=_clean_credentials(credentials), request=request
+    )
+    raise exceptions.AuthenticationFailed(
+        BookingTokenObtainPairSerializer.default_error_messages["no_active_account"], "no_active_account"
+    )
+
@@ -0,0 +1,168 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import TokenUser
+from .profiling import timer
+
+USER_CACHE_TIMEOUT = getattr(settings, "AUTH_USER_CACHE_TIMEOUT", 60)
+
+# User fields copied into issued access tokens (see BookingRefreshToken)
+TOKEN_CLAIMS = ("username", "first_name", "last_name", "email", "is_staff", "is_superuser")
+
+# User fields kept in the user cache: the claims, and what check_user() reads
+CACHED_FIELDS = TOKEN_CLAIMS + ("is_active",)
+
+
+def _user_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def invalidate_user(user_id):
+    """Drops the cached user once the current transaction commits."""
+    transaction.on_commit(lambda: cache.delete(_user_key(user_id)))
+
+
+def cached_user(user):
+    """
+    What the user cache keeps of a user: CACHED_FIELDS, and with
+    CHECK_REVOKE_TOKEN the digest tokens are checked against, never the hash.
+    """
+    data = {field: getattr(user, field) for field in (api_settings.USER_ID_FIELD, *CACHED_FIELDS)}
+    if api_settings.CHECK_REVOKE_TOKEN:
+        data["password_digest"] = get_md5_hash_password(user.password)
+    return data
+
+
+class BookingRefreshToken(RefreshToken):
+    """
+    Refresh tokens whose access tokens carry TOKEN_CLAIMS. The refresh token
+    itself carries none: each refresh re-reads them from the user, so a change
+    (a revoked is_staff) lasts at most ACCESS_TOKEN_LIFETIME.
+    """
+
+    user = None
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.user = user
+        return token
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        user = self.user
+        if user is None:
+            user = get_user_model()._default_manager.filter(
+                **{api_settings.USER_ID_FIELD: self[api_settings.USER_ID_CLAIM]}
+            ).first()
+        if user is not None:
+            for claim in TOKEN_CLAIMS:
+                access[claim] = getattr(user, claim)
+        return access
+
+
+class BookingJWTAuthentication(JWTAuthentication):
+    """
+    simplejwt authentication, timed as the "auth" phase of profiled requests.
+
+    The user's fields are cached for AUTH_USER_CACHE_TIMEOUT seconds per user id
+    (see cached_user), so only the first request of a user in that window
+    queries auth_user; later ones get a TokenUser. With
+    AUTH_TOKEN_CLAIMS on, tokens that carry TOKEN_CLAIMS need no lookup at all.
+    """
+
+    def authenticate(self, request):
+        with timer("auth"):
+            return super().authenticate(request)
+
+    def user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+    def token_user(self, user_id, fields):
+        user_id = TokenUser._meta.get_field(api_settings.USER_ID_FIELD).to_python(user_id)
+        return TokenUser(**{api_settings.USER_ID_FIELD: user_id}, **fields)
+
+    def claims_user(self, validated_token):
+        """A TokenUser from the token's claims, or None when they are off or missing."""
+        if not getattr(settings, "AUTH_TOKEN_CLAIMS", False) or api_settings.CHECK_REVOKE_TOKEN:
+            return None
+        if any(claim not in validated_token for claim in TOKEN_CLAIMS):
+            return None
+        return self.token_user(
+            self.user_id(validated_token), {claim: validated_token[claim] for claim in TOKEN_CLAIMS}
+        )
+
+    def check_user(self, data, validated_token):
+        """The checks simplejwt runs on a loaded user, on its cached_user() data."""
+        if api_settings.CHECK_USER_IS_ACTIVE and not data["is_active"]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != data["password_digest"]:
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+    def get_user(self, validated_token):
+        user = self.claims_user(validated_token)
+        if user is not None:
+            return user
+
+        user_id = self.user_id(validated_token)
+        data = cache.get(_user_key(user_id))
+        if data is None:
+            try:
+                user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            data = cached_user(user)
+            cache.set(_user_key(user_id), data, USER_CACHE_TIMEOUT)
+        else:
+            user = self.token_user(user_id, {field: data[field] for field in CACHED_FIELDS})
+        self.check_user(data, validated_token)
+        return user
+
+    async def aget_user(self, validated_token):
+        user = self.claims_user(validated_token)
+        if user is not None:
+            return user
+
+        user_id = self.user_id(validated_token)
+        data = await cache.aget(_user_key(user_id))
+        if data is None:
+            try:
+                user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            data = cached_user(user)
+            await cache.aset(_user_key(user_id), data, USER_CACHE_TIMEOUT)
+        else:
+            user = self.token_user(user_id, {field: data[field] for field in CACHED_FIELDS})
+        self.check_user(data, validated_token)
+        return user
+
+    async def aauthenticate(self, request):
+        """
+        authenticate() for plain Django async views: (user, validated_token) for
+        the request's Bearer token, None without one.
+        """
+        with timer("auth"):
+            header = self.get_header(request)
+            if header is None:
+                return None
+            raw_token = self.get_raw_token(header)
+            if raw_token is None:
+                return None
+
+            validated_token = self.get_validated_token(raw_token)
+            return await self.aget_user(validated_token), validated_token
@@ -0,0 +1,169 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import metrics
+
+SLOTS_TIMEOUT = getattr(settings, "SLOTS_CACHE_TIMEOUT", 300)
+
+
+CATALOG_KEY = "services:gen"
+
+
+def _generation_key(day):
+    return f"slots:gen:{day.isoformat()}"
+
+
+def _current(keys):
+    """
+    Current generation token of each key. Cached entries embed it in their key
+    (or ETag), so replacing the token invalidates all of them at once.
+    """
+    found = cache.get_many(keys)
+
+    gens = {}
+    for key in keys:
+        gen = found.get(key)
+        if gen is None:
+            gen = time.time_ns()
+            if not cache.add(key, gen, timeout=None):
+                gen = cache.get(key, gen)
+        gens[key] = gen
+    return gens
+
+
+async def _acurrent(keys):
+    found = await cache.aget_many(keys)
+
+    gens = {}
+    for key in keys:
+        gen = found.get(key)
+        if gen is None:
+            gen = time.time_ns()
+            if not await cache.aadd(key, gen, timeout=None):
+                gen = await cache.aget(key, gen)
+        gens[key] = gen
+    return gens
+
+
+def _generations(days):
+    """Current generation token of each date, dropping every service's slot list for it."""
+    keys = {day: _generation_key(day) for day in days}
+    gens = _current(list(keys.values()))
+    return {day: gens[key] for day, key in keys.items()}
+
+
+async def _agenerations(days):
+    keys = {day: _generation_key(day) for day in days}
+    gens = await _acurrent(list(keys.values()))
+    return {day: gens[key] for day, key in keys.items()}
+
+
+def _slots_etag(service_id, day, gens):
+    return f"slots-{service_id}-{day.isoformat()}-{gens[_generation_key(day)]}-{gens[CATALOG_KEY]}"
+
+
+def slots_etag(service_id, day):
+    """
+    ETag of the available-slots of (service, date), from one cache round trip.
+    Changes with every write to that date's bookings or slots (the overlap rule
+    spans services, so the date's generation is the version) and to the catalog.
+    """
+    return _slots_etag(service_id, day, _current([_generation_key(day), CATALOG_KEY]))
+
+
+async def aslots_etag(service_id, day):
+    return _slots_etag(service_id, day, await _acurrent([_generation_key(day), CATALOG_KEY]))
+
+
+def catalog_etag():
+    """ETag of the service list and details; changes with every Service write."""
+    return f"services-{_current([CATALOG_KEY])[CATALOG_KEY]}"
+
+
+async def acatalog_etag():
+    return f"services-{(await _acurrent([CATALOG_KEY]))[CATALOG_KEY]}"
+
+
+def _slots_key(service_id, day, gen):
+    return f"slots:{day.isoformat()}:{gen}:{service_id}"
+
+
+def get_available_slots(service_id, day, compute):
+    """Cached free-slot payload of (service, date); compute() builds it on a miss."""
+    return get_many_available_slots(
+        [service_id], [day], lambda missing: {(service_id, day): compute()}
+    )[(service_id, day)]
+
+
+def get_many_available_slots(service_ids, days, compute):
+    """
+    Cached free-slot payloads of every (service, date) pair, fetched in one
+    round trip. compute(missing_pairs) must return {(service_id, date): payload}
+    for at least the missing pairs; they are computed in one batch and stored.
+    """
+    gens = _generations(days)
+    keys = {
+        (service_id, day): _slots_key(service_id, day, gens[day])
+        for service_id in service_ids
+        for day in days
+    }
+    found = cache.get_many(keys.values())
+
+    result = {pair: found[key] for pair, key in keys.items() if key in found}
+    missing = [pair for pair in keys if pair not in result]
+
+    if result:
+        metrics.incr("slots_cache_hits", len(result))
+    if missing:
+        metrics.incr("slots_cache_misses", len(missing))
+        computed = compute(missing)
+        fresh = {pair: computed[pair] for pair in missing}
+        cache.set_many({keys[pair]: data for pair, data in fresh.items()}, SLOTS_TIMEOUT)
+        result.update(fresh)
+
+    return result
+
+
+async def aget_available_slots(service_id, day, compute):
+    """Async get_available_slots(); compute is a coroutine function."""
+    key = _slots_key(service_id, day, (await _agenerations([day]))[day])
+    data = await cache.aget(key)
+    if data is not None:
+        await metrics.aincr("slots_cache_hits")
+        return data
+
+    await metrics.aincr("slots_cache_misses")
+    data = await compute()
+    await cache.aset(key, data, SLOTS_TIMEOUT)
+    return data
+
+
+def invalidate_slots(*days):
+    """
+    Drops the cached slot lists of the given dates once the current transaction
+    commits, so a concurrent reader cannot re-cache the pre-commit state.
+    """
+    days = {d for d in days if d is not None}
+
+    def bump():
+        for day in days:
+            cache.set(_generation_key(day), time.time_ns(), timeout=None)
+            metrics.incr("slots_cache_invalidations")
+
+    if days:
+        transaction.on_commit(bump)
+
+
+async def ainvalidate_slots(*days):
+    """invalidate_slots() for the async paths, which write in autocommit: drops them right away."""
+    for day in {d for d in days if d is not None}:
+        await cache.aset(_generation_key(day), time.time_ns(), timeout=None)
+        await metrics.aincr("slots_cache_invalidations")
+
+
+def invalidate_catalog():
+    """Moves the service catalog to a new version once the transaction commits."""
+    transaction.on_commit(lambda: cache.set(CATALOG_KEY, time.time_ns(), timeout=None))
@@ -0,0 +1,14 @@
+from django.db.backends.mysql.base import DatabaseWrapper as MySQLDatabaseWrapper
+
+from ..pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, MySQLDatabaseWrapper):
+    """The MySQL backend with pooled connections (ENGINE "bookings.db.mysql")."""
+
+    def ping(self, conn):
+        try:
+            conn.ping()
+        except self.Database.Error:
+            return False
+        return True
@@ -0,0 +1,198 @@
+"""
+Bounded, process-wide connection pool behind the pooled database backends
+(bookings.db.mysql, bookings.db.sqlite3).
+
+Django opens a connection per thread and closes it at the end of each request
+(CONN_MAX_AGE=0). With a pooled ENGINE, "open" checks a connection out of the
+pool of the alias and "close" hands it back, so threaded and ASGI workers share
+at most POOL["MAX_SIZE"] connections instead of reconnecting every request.
+"""
+import contextlib
+import threading
+import time
+from collections import deque
+
+from django.db.utils import OperationalError
+
+DEFAULTS = {
+    "MAX_SIZE": 10,
+    "TIMEOUT": 10.0,     # seconds a checkout waits for a free connection
+    "MAX_IDLE": 300.0,   # idle connections older than this are closed, not reused
+    "CHECK": True,       # ping idle connections before handing them out
+}
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, connect, close, check=None, max_size=10, timeout=10.0, max_idle=300.0):
+        self.connect = connect
+        self.close = close
+        self.check = check
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (connection, returned_at), most recent last
+        self.open = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+
+    @property
+    def in_use(self):
+        return self.open - len(self._idle)
+
+    def checkout(self):
+        """An idle connection, a new one while under MAX_SIZE, or wait for a checkin."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+        with self._cond:
+            while True:
+                conn = self._take_idle()
+                if conn is not None:
+                    break
+                if self.open < self.max_size:
+                    self.open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f"No database connection free after {self.timeout}s (pool size {self.max_size})."
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+            self.checkouts += 1
+            if waited:
+                self.waits += 1
+                self.wait_seconds += time.monotonic() - started
+
+        if conn is None:
+            try:
+                conn = self.connect()
+            except Exception:
+                self._forget()
+                raise
+        return conn
+
+    def checkin(self, conn, discard=False):
+        if discard:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _take_idle(self):
+        # called with the lock held; stale or broken connections are dropped
+        while self._idle:
+            conn, since = self._idle.pop()
+            if time.monotonic() - since > self.max_idle or (self.check and not self.check(conn)):
+                self.open -= 1
+                self._close_quietly(conn)
+                continue
+            return conn
+        return None
+
+    def _discard(self, conn):
+        self._close_quietly(conn)
+        self._forget()
+
+    def _forget(self):
+        with self._cond:
+            self.open -= 1
+            self._cond.notify()
+
+    def _close_quietly(self, conn):
+        try:
+            self.close(conn)
+        except Exception:
+            pass
+
+    def stats(self):
+        with self._cond:
+            return {
+                "db_pool_max_size": self.max_size,
+                "db_pool_open": self.open,
+                "db_pool_in_use": self.in_use,
+                "db_pool_checkouts": self.checkouts,
+                "db_pool_waits": self.waits,
+                "db_pool_wait_seconds": round(self.wait_seconds, 6),
+                "db_pool_timeouts": self.timeouts,
+            }
+
+    def clear(self):
+        """Closes the idle connections (checked-out ones close on checkin)."""
+        with self._cond:
+            idle, self._idle = self._idle, deque()
+            self.open -= len(idle)
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def stats():
+    """{alias: stats} of this process's pools."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {alias: pool.stats() for (alias, _), pool in pools.items()}
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Mixed into a backend's DatabaseWrapper: connections come from, and go back
+    to, the pool of the alias. Configured by the POOL key of the database
+    settings (see DEFAULTS).
+    """
+
+    def get_pool(self):
+        # keyed by NAME too: the test runner repoints the alias to a test database
+        key = (self.alias, self.settings_dict["NAME"])
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                options = {**DEFAULTS, **self.settings_dict.get("POOL", {})}
+                params = self.get_connection_params()
+                pool = _pools[key] = ConnectionPool(
+                    connect=lambda: super(PooledDatabaseWrapperMixin, self).get_new_connection(params),
+                    close=lambda conn: conn.close(),
+                    check=self.ping if options["CHECK"] else None,
+                    max_size=options["MAX_SIZE"],
+                    timeout=options["TIMEOUT"],
+                    max_idle=options["MAX_IDLE"],
+                )
+        return pool
+
+    def ping(self, conn):
+        """Whether an idle DB-API connection still works; backends may override it with a cheaper check."""
+        try:
+            with contextlib.closing(conn.cursor()) as cursor:
+                cursor.execute("SELECT 1")
+        except self.Database.Error:
+            return False
+        return True
+
+    def get_new_connection(self, conn_params):
+        return self.get_pool().checkout()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # closed inside atomic(): Django keeps self.connection, so it can't be shared
+        discard = self.in_atomic_block
+        if not discard and not self.get_autocommit():
+            try:
+                self.connection.rollback()
+            except Exception:
+                discard = True
+        self.get_pool().checkin(self.connection, discard=discard)
@@ -0,0 +1,17 @@
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+
+from ..pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, SQLiteDatabaseWrapper):
+    """
+    The SQLite backend with pooled connections (ENGINE "bookings.db.sqlite3"),
+    a local stand-in to exercise the pool without MySQL.
+    """
+
+    def get_new_connection(self, conn_params):
+        # Django never closes in-memory databases (that would drop them), so
+        # their connections would never come back to the pool
+        if self.is_in_memory_db():
+            return SQLiteDatabaseWrapper.get_new_connection(self, conn_params)
+        return super().get_new_connection(conn_params)
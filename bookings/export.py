@@ -0,0 +1,75 @@
+"""
+Streaming export of bookings as CSV or NDJSON. Rows are read as values() dicts
+in keyset-paginated chunks (`id < last ORDER BY id DESC LIMIT n`), so memory
+and per-query cost stay constant whatever the number of rows, and no server-side
+cursor is held open between chunks.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+CHUNK_SIZE = 2000
+
+# exported column -> values() key
+COLUMNS = {
+    "id": "id",
+    "username": "username",
+    "service": "service_id",
+    "availability": "availability_id",
+    "status": "status",
+    "date": "date",
+    "start_time": "start_time",
+    "end_time": "end_time",
+    "notes": "notes",
+}
+
+# first characters spreadsheets read as a formula: such CSV cells get a quote
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def rows(queryset, chunk_size=CHUNK_SIZE):
+    """The bookings of queryset as dicts of COLUMNS, newest first."""
+    fields = [key for key in COLUMNS.values() if key != "username"]
+    queryset = queryset.order_by("-id").values(*fields, username=F("user__username"))
+    last = None
+    while True:
+        batch = list((queryset if last is None else queryset.filter(id__lt=last))[:chunk_size])
+        for row in batch:
+            yield {column: row[key] for column, key in COLUMNS.items()}
+        if len(batch) < chunk_size:
+            return
+        last = batch[-1]["id"]
+
+
+class _Echo:
+    """File-like object whose write() returns the line, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def _cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_lines(queryset, chunk_size=CHUNK_SIZE):
+    """CSV of rows(); text cells that would start a formula are prefixed with '."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    for row in rows(queryset, chunk_size):
+        yield writer.writerow([_cell(value) for value in row.values()])
+
+
+def ndjson_lines(queryset, chunk_size=CHUNK_SIZE):
+    for row in rows(queryset, chunk_size):
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+
+FORMATS = {
+    "csv": (csv_lines, "text/csv; charset=utf-8"),
+    "ndjson": (ndjson_lines, "application/x-ndjson"),
+}
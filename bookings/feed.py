@@ -0,0 +1,204 @@
+"""
+The slot-events feed: Server-Sent Events of slots taken and freed, per service
+(and date), instead of polling available-slots.
+
+Booking writes add SlotEvent rows (the outbox) in their own transaction, one
+per slot whose bookability they may have changed: the overlap rule spans
+services, so a booking takes (and its cancel frees) the slots of every service
+at that time. Once the transaction commits, the broker wakes the streams of that service, which read the new
+rows after the last id they sent. The outbox is the source of truth: a stream
+that misses a wake-up (another process, a restart) still reads the rows on
+its next FEED_HEARTBEAT_SECONDS tick, and a client reconnecting with
+Last-Event-ID resumes where it stopped.
+
+Ids are allocated at insert, not at commit: bookings of different dates do
+not wait for each other, so event 41 may commit after event 42. A stream
+therefore sends an event only once it is FEED_SETTLE_SECONDS old (longer than
+a booking transaction lasts), by then every lower id is committed or rolled
+back, and never skips past a younger one. The id order of the feed is exact
+and Last-Event-ID is a safe cursor, for a delay of at most that window.
+
+FEED_BROKER names the broker class. LocalBroker wakes the streams of its own
+process only, which is all tests and single-process deployments need; a broker
+across processes (e.g. Redis pub/sub) only has to provide subscribe() and
+publish() and turns the heartbeat polling into instant delivery everywhere.
+"""
+import asyncio
+import json
+import threading
+from datetime import timedelta
+from functools import cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Availability, SlotEvent
+from .occupancy import load_occupancy
+
+PAGE = 100
+
+
+class Subscription:
+    def __init__(self, broker, service_id):
+        self.broker = broker
+        self.service_id = service_id
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def notify(self):
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            pass  # the stream's loop is gone
+
+    async def wait(self, timeout):
+        """True when woken before `timeout` seconds."""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.event.clear()
+        return True
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """Wakes the subscribed streams of this process; publish() is safe from any thread."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = {}
+
+    def subscribe(self, service_id):
+        subscription = Subscription(self, service_id)
+        with self.lock:
+            self.subscriptions.setdefault(service_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.get(subscription.service_id, set()).discard(subscription)
+
+    def publish(self, service_ids):
+        with self.lock:
+            woken = [s for service_id in service_ids for s in self.subscriptions.get(service_id, ())]
+        for subscription in woken:
+            subscription.notify()
+
+
+@cache
+def broker():
+    return import_string(getattr(settings, "FEED_BROKER", "bookings.feed.LocalBroker"))()
+
+
+def record_slot_changes(ranges):
+    """
+    Adds to the outbox, in the current transaction, the state of every active
+    slot (of any service) overlapping one of the changed (date, start, end)
+    ranges, read from the dates' occupancy once it was updated: taken when a
+    booking covers it, freed otherwise. A range without times stands for its
+    whole date. The streams of the services concerned are woken on commit.
+    """
+    ranges = [r for r in ranges if r is not None and r[0] is not None]
+    if not ranges:
+        return
+    overlapping = Q()
+    for day, start, end in ranges:
+        if start is None or end is None:
+            overlapping |= Q(date=day)
+        else:
+            overlapping |= Q(date=day, start_time__lt=end, end_time__gt=start)
+    slots = list(
+        Availability.objects.filter(overlapping, is_active=True)
+        .order_by("date", "start_time", "service_id")
+        .values_list("id", "service_id", "date", "start_time", "end_time")
+    )
+    if not slots:
+        return
+
+    booked = load_occupancy({day for _, _, day, _, _ in slots})
+    SlotEvent.objects.bulk_create([
+        SlotEvent(
+            kind=SlotEvent.TAKEN if booked[day].overlaps(start, end) else SlotEvent.FREED,
+            service_id=service_id, date=day, availability_id=slot_id,
+        )
+        for slot_id, service_id, day, start, end in slots
+    ])
+    services = {service_id for _, service_id, _, _, _ in slots}
+    transaction.on_commit(lambda: broker().publish(services))
+
+
+def prune_slot_events(older_than):
+    """Deletes outbox rows older than the timedelta `older_than`; returns how many."""
+    deleted, _ = SlotEvent.objects.filter(created_at__lt=timezone.now() - older_than).delete()
+    return deleted
+
+
+def format_event(event):
+    data = {
+        "id": event.id,
+        "service": event.service_id,
+        "date": event.date.isoformat(),
+        "availability": event.availability_id,
+        "kind": event.kind,
+    }
+    return f"id: {event.id}\nevent: slot\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+async def alast_event_id():
+    return await SlotEvent.objects.order_by("-id").values_list("id", flat=True).afirst() or 0
+
+
+async def stream(service_id, day, last_id):
+    """
+    The SSE body: events of the service (of `day` when given) after `last_id`,
+    as they are committed, with a comment line every FEED_HEARTBEAT_SECONDS
+    to keep proxies from closing the connection. Ends after FEED_MAX_SECONDS;
+    clients reconnect with Last-Event-ID.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + getattr(settings, "FEED_MAX_SECONDS", 300)
+    heartbeat = getattr(settings, "FEED_HEARTBEAT_SECONDS", 15)
+    settle = timedelta(seconds=getattr(settings, "FEED_SETTLE_SECONDS", 1))
+    events = SlotEvent.objects.filter(service_id=service_id)
+    if day is not None:
+        events = events.filter(date=day)
+
+    # subscribed before the first read, so that no commit falls in between
+    subscription = broker().subscribe(service_id)
+    try:
+        yield f"retry: {round(heartbeat * 1000)}\n\n"
+        beat = loop.time() + heartbeat
+        while True:
+            settled = timezone.now() - settle
+            page = [event async for event in events.filter(id__gt=last_id).order_by("id")[:PAGE]]
+            unsettled = None
+            for event in page:
+                if event.created_at > settled:
+                    # lower ids may still commit: hold this one and those after it
+                    unsettled = event
+                    break
+                yield format_event(event)
+                last_id = event.id
+                beat = loop.time() + heartbeat
+            if unsettled is None and len(page) == PAGE:
+                continue
+
+            now = loop.time()
+            if now >= deadline:
+                return
+            if now >= beat:
+                yield ": keep-alive\n\n"
+                beat = now + heartbeat
+            timeout = min(beat, deadline) - now
+            if unsettled is not None:
+                timeout = min(timeout, (unsettled.created_at - settled).total_seconds())
+            await subscription.wait(max(timeout, 0))
+    finally:
+        subscription.close()
+
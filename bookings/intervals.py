@@ -0,0 +1,73 @@
+from bisect import bisect_left, bisect_right, insort
+
+from .models import Booking
+
+ACTIVE_STATUSES = ["PENDING", "CONFIRMED"]
+
+
+class IntervalIndex:
+    """
+    Overlap index over the half-open [start, end) ranges of a single date.
+
+    Keeps the starts and the ends in two sorted arrays. A query range overlaps
+    every interval that starts before it ends, except those that already ended
+    by the time it starts, so each lookup is two bisections: O(log m).
+    """
+
+    def __init__(self, ranges=()):
+        ranges = list(ranges)
+        self.starts = sorted(start for start, _ in ranges)
+        self.ends = sorted(end for _, end in ranges)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, start, end):
+        insort(self.starts, start)
+        insort(self.ends, end)
+
+    def count_overlaps(self, start, end):
+        return bisect_left(self.starts, end) - bisect_right(self.ends, start)
+
+    def overlaps(self, start, end):
+        return self.count_overlaps(start, end) > 0
+
+    def free(self, slots, bounds=lambda slot: (slot.start_time, slot.end_time)):
+        """Slots (in their original order) that overlap none of the indexed ranges."""
+        return [slot for slot in slots if not self.overlaps(*bounds(slot))]
+
+
+def active_ranges(target_date, exclude_id=None):
+    """
+    (start_time, end_time) of every active booking on target_date, across all
+    services. Reads the snapshot columns of Booking only (no join), covered by
+    the (status, date, start_time, end_time) index.
+    """
+    qs = Booking.objects.filter(status__in=ACTIVE_STATUSES, date=target_date)
+    if exclude_id is not None:
+        qs = qs.exclude(id=exclude_id)
+    return qs.values_list("start_time", "end_time")
+
+
+def booked_index(target_date, exclude_id=None):
+    """One query: the IntervalIndex of the active bookings of a date."""
+    return IntervalIndex(active_ranges(target_date, exclude_id=exclude_id))
+
+
+def _active_ranges_of(days):
+    return Booking.objects.filter(
+        status__in=ACTIVE_STATUSES,
+        date__in=list(days),
+    ).values_list("date", "start_time", "end_time")
+
+
+def _index_by_date(rows):
+    ranges = {}
+    for day, start, end in rows:
+        ranges.setdefault(day, []).append((start, end))
+    return {day: IntervalIndex(r) for day, r in ranges.items()}
+
+
+def booked_indexes(days):
+    """One query: {date: IntervalIndex} of the active bookings of several dates."""
+    return _index_by_date(_active_ranges_of(days))
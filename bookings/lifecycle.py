@@ -0,0 +1,92 @@
+"""
+Status changes of many bookings at once (the bulk-confirm / bulk-cancel API
+actions and the admin actions), with the rules of the single-booking actions:
+cancelled bookings cannot be confirmed, past ones cannot be cancelled.
+
+The bookings are read and locked with one SELECT, checked in Python and
+changed with one UPDATE, in one transaction. UPDATE sends no post_save, so the
+occupancy bitmaps, slot caches and slot events of cancelled bookings are
+handled here.
+"""
+from datetime import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import occupancy
+from .cache import invalidate_slots
+from .feed import record_slot_changes
+from .models import Booking
+
+CANCELLED_NOT_CONFIRMABLE = "Cannot confirm a cancelled booking."
+ALREADY_CANCELLED = "Already cancelled."
+PAST_NOT_CANCELLABLE = "You cannot cancel a past booking."
+NOT_FOUND = "Booking not found."
+
+# snapshot columns; bookings older than the snapshot still read the slot
+ROW = (
+    "id", "status", "availability_id", "date", "start_time", "end_time",
+    "availability__date", "availability__start_time", "availability__end_time",
+)
+
+
+def _locked_rows(queryset, ids):
+    if ids is not None:
+        queryset = queryset.filter(id__in=ids)
+    rows = queryset.select_for_update().values_list(*ROW)
+    return {row[0]: row for row in rows}
+
+
+def _report(ids, rows, errors, done):
+    """Per-booking results in request order (ids) or queryset order."""
+    results = []
+    for booking_id in (ids if ids is not None else rows):
+        if booking_id not in rows:
+            results.append({"id": booking_id, "status": "rejected", "detail": NOT_FOUND})
+        elif booking_id in errors:
+            results.append({"id": booking_id, "status": "rejected", "detail": errors[booking_id]})
+        else:
+            results.append({"id": booking_id, "status": done})
+    return {done: len(rows) - len(errors), "results": results}
+
+
+def confirm_bookings(queryset, ids=None):
+    """Confirms the bookings of queryset (those of `ids` only, when given)."""
+    with transaction.atomic():
+        rows = _locked_rows(queryset, ids)
+        errors = {
+            booking_id: CANCELLED_NOT_CONFIRMABLE
+            for booking_id, status, *_ in rows.values() if status == "CANCELLED"
+        }
+        pending = [booking_id for booking_id, status, *_ in rows.values() if status == "PENDING"]
+        if pending:
+            # both statuses hold the same time: bitmaps and slot lists are unchanged
+            Booking.objects.filter(id__in=pending).update(status="CONFIRMED")
+    return _report(ids, rows, errors, "confirmed")
+
+
+def cancel_bookings(queryset, ids=None):
+    """Cancels the bookings of queryset (those of `ids` only, when given), freeing their slots."""
+    now = timezone.now()
+    tz = timezone.get_current_timezone()
+    with transaction.atomic():
+        rows = _locked_rows(queryset, ids)
+        errors, days, freed = {}, set(), []
+        for booking_id, status, availability_id, day, start, end, slot_day, slot_start, slot_end in rows.values():
+            if day is None or start is None:
+                day, start, end = slot_day, slot_start, slot_end
+            if status == "CANCELLED":
+                errors[booking_id] = ALREADY_CANCELLED
+            elif availability_id is not None and timezone.make_aware(datetime.combine(day, start), tz) <= now:
+                errors[booking_id] = PAST_NOT_CANCELLABLE
+            else:
+                days.add(day)
+                freed.append((day, start, end))
+
+        cancelled = [booking_id for booking_id in rows if booking_id not in errors]
+        if cancelled:
+            Booking.objects.filter(id__in=cancelled).update(status="CANCELLED", availability=None)
+            occupancy.rebuild(days)
+            invalidate_slots(*days)
+            record_slot_changes(freed)
+    return _report(ids, rows, errors, "cancelled")
@@ -0,0 +1,43 @@
+from django.db import transaction
+
+from .models import DateLock
+
+
+def ensure_date_locks(days):
+    """Creates the lock rows of the given dates (outside of any booking transaction)."""
+    DateLock.objects.bulk_create(
+        [DateLock(date=day) for day in set(days)], ignore_conflicts=True
+    )
+
+
+async def aensure_date_locks(days):
+    await DateLock.objects.abulk_create(
+        [DateLock(date=day) for day in set(days)], ignore_conflicts=True
+    )
+
+
+def lock_dates(days):
+    """
+    Blocks until the current transaction holds the row locks of the given dates
+    and returns the locked rows, {date: DateLock}. Locks are taken in date order
+    so that multi-date writers cannot deadlock. Writers of other dates are not
+    affected.
+    """
+    days = sorted(set(days))
+    if not days:
+        return {}
+
+    assert transaction.get_connection().in_atomic_block, "lock_dates() needs a transaction"
+
+    locked = {
+        row.date: row
+        for row in DateLock.objects.select_for_update().filter(date__in=days).order_by("date")
+    }
+    if len(locked) != len(days):
+        # rows are normally created with the date's first slot; this is the fallback
+        ensure_date_locks(d for d in days if d not in locked)
+        locked = {
+            row.date: row
+            for row in DateLock.objects.select_for_update().filter(date__in=days).order_by("date")
+        }
+    return locked
@@ -0,0 +1,80 @@
+"""Synthetic dataset shared by the benchmark commands."""
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+
+from bookings.locks import ensure_date_locks
+from bookings.models import Availability, Booking, Service
+from bookings.occupancy import rebuild
+from bookings.slots import day_slot_bounds
+
+SEED_PREFIX = "bench-"
+
+
+def seed(start, days, services=3, users=50, fill=0.6, cancelled=1.0, rng_seed=0):
+    """
+    Creates `services` services with a full slot grid over `days` days, books
+    `fill` of each day's time grid (one service per time, as the global rule
+    requires) and adds `cancelled` detached cancelled bookings per active one.
+    Returns the counts of created rows.
+    """
+    rng = random.Random(rng_seed)
+
+    service_objs = Service.objects.bulk_create([
+        Service(name=f"{SEED_PREFIX}service-{i}", description="", duration_minutes=30, price="10.00")
+        for i in range(services)
+    ])
+    if service_objs[0].pk is None:  # MySQL does not return primary keys
+        service_objs = list(Service.objects.filter(name__startswith=SEED_PREFIX).order_by("-id")[:services])
+
+    user_objs = User.objects.bulk_create([
+        User(username=f"{SEED_PREFIX}{rng_seed}-{i}", password="!") for i in range(users)
+    ])
+    if user_objs[0].pk is None:
+        user_objs = list(User.objects.filter(username__startswith=f"{SEED_PREFIX}{rng_seed}-"))
+
+    dates = [start + timedelta(days=i) for i in range(days)]
+    Availability.objects.bulk_create(
+        [
+            Availability(service=service, date=day, start_time=s, end_time=e)
+            for day in dates
+            for (s, e) in day_slot_bounds(day)
+            for service in service_objs
+        ],
+        batch_size=2000,
+        ignore_conflicts=True,
+    )
+    slots = {
+        (a.service_id, a.date, a.start_time): a
+        for a in Availability.objects.filter(service__in=service_objs, date__in=dates)
+    }
+
+    bookings = []
+    for day in dates:
+        for (s, e) in day_slot_bounds(day):
+            if rng.random() >= fill:
+                continue
+            slot = slots[(rng.choice(service_objs).id, day, s)]
+            user = rng.choice(user_objs)
+            bookings.append(Booking(
+                user=user, service_id=slot.service_id, availability=slot,
+                status=rng.choice(["PENDING", "CONFIRMED"]),
+                date=day, start_time=s, end_time=e,
+            ))
+            while rng.random() < cancelled / (1 + cancelled):
+                bookings.append(Booking(
+                    user=rng.choice(user_objs), service_id=slot.service_id, availability=None,
+                    status="CANCELLED", date=day, start_time=s, end_time=e,
+                ))
+    Booking.objects.bulk_create(bookings, batch_size=2000)
+    # bulk_create sends no signals: lock rows and occupancy bitmaps by hand
+    ensure_date_locks(dates)
+    rebuild(dates)
+
+    return {
+        "services": len(service_objs),
+        "users": len(user_objs),
+        "availabilities": len(slots),
+        "bookings": len(bookings),
+    }
@@ -0,0 +1,47 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from bookings.archive import archive_availabilities, archive_bookings
+from bookings.feed import prune_slot_events
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves bookings and slots dated before the cutoff (default: 90 days ago) into the "
+        "archive tables, --batch rows per transaction, and prunes old slot events. "
+        "Safe to interrupt and re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=90, help="Archive rows dated more than this many days ago.")
+        parser.add_argument("--before", type=date.fromisoformat, help="Explicit cutoff date (YYYY-MM-DD).")
+        parser.add_argument("--batch", type=int, default=1000, help="Rows per transaction.")
+        parser.add_argument("--cancelled", action="store_true", help="Also archive cancelled bookings of any date.")
+        parser.add_argument(
+            "--events-days", type=int, default=1,
+            help="Delete slot events older than this many days (feed clients further behind resync).",
+        )
+
+    def handle(self, *args, **opts):
+        if opts["batch"] < 1:
+            raise CommandError("--batch must be positive.")
+        cutoff = opts["before"] or timezone.localdate() - timedelta(days=opts["days"])
+        if cutoff > timezone.localdate():
+            raise CommandError("The cutoff cannot be in the future.")
+
+        bookings = 0
+        for moved in archive_bookings(cutoff, opts["batch"], cancelled=opts["cancelled"]):
+            bookings += moved
+            self.stdout.write(f"bookings: {bookings}")
+
+        availabilities = 0
+        for moved in archive_availabilities(cutoff, opts["batch"]):
+            availabilities += moved
+            self.stdout.write(f"availabilities: {availabilities}")
+
+        self.stdout.write(f"Archived {bookings} booking(s) and {availabilities} slot(s) dated before {cutoff}.")
+
+        events = prune_slot_events(timedelta(days=opts["events_days"]))
+        self.stdout.write(f"Pruned {events} slot event(s).")
@@ -0,0 +1,263 @@
+import json
+import math
+import statistics
+import subprocess
+import time as clock
+from datetime import date, time, timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from bookings.models import Availability, Booking, Service
+from bookings.querybudget import QueryCounter
+
+from ._seed import seed
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class Scenario:
+    """
+    One endpoint call. path/data are callables of the iteration number so that
+    write endpoints get a fresh target every time.
+    """
+
+    def __init__(self, name, method, path, data=None, as_user="user"):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.data = data
+        self.as_user = as_user
+
+
+class Fixtures:
+    """Rows the scenarios act on, created next to the seeded dataset."""
+
+    def __init__(self, start, iterations):
+        self.start = start
+        self.seeded_ids = ",".join(str(i) for i in Service.objects.order_by("id").values_list("id", flat=True))
+        self.service = Service.objects.order_by("id").first()
+        self.user = User.objects.create_user("bench-user", password="bench-pass-123")
+        self.admin = User.objects.create_superuser("bench-admin", password="bench-pass-123")
+        self.booking = Booking.objects.filter(status__in=["PENDING", "CONFIRMED"]).order_by("id").first()
+        self.slot = Availability.objects.filter(service=self.service).order_by("id").first()
+
+        # dates after the seeded range, one per iteration, for writes and cold reads
+        far = start + timedelta(days=3650)
+        self.free_days = [far + timedelta(days=i) for i in range(iterations)]
+        Availability.objects.bulk_create([
+            Availability(service=self.service, date=day, start_time=time(h, 0), end_time=time(h, 30))
+            for day in self.free_days
+            for h in (9, 10, 11, 12, 13)
+        ])
+        self.free_slots = list(Availability.objects.filter(date__in=self.free_days).order_by("date", "start_time"))
+        self.own_bookings = [
+            Booking.objects.create(
+                user=self.user, service=self.service, availability=slot,
+                date=slot.date, start_time=slot.start_time, end_time=slot.end_time,
+            )
+            for slot in self.free_slots[4::5]
+        ]
+        self.spare_services = [
+            Service.objects.create(name=f"bench-spare-{i}", description="-", duration_minutes=30, price="1.00")
+            for i in range(iterations)
+        ]
+        self.spare_slots = [
+            Availability.objects.create(service=self.service, date=day, start_time=time(16, 0), end_time=time(16, 30))
+            for day in self.free_days
+        ]
+
+    def slot_on(self, i, k):
+        return self.free_slots[i * 5 + k].id
+
+
+def scenarios(fx):
+    day = fx.start.isoformat()
+    return [
+        Scenario("services.list", "get", lambda i: "/api/services/"),
+        Scenario("services.retrieve", "get", lambda i: f"/api/services/{fx.service.id}/"),
+        Scenario("services.create", "post", lambda i: "/api/services/",
+                 lambda i: {"name": f"new-{i}", "description": "-", "duration_minutes": 30, "price": "5.00"}, "admin"),
+        Scenario("services.update", "put", lambda i: f"/api/services/{fx.spare_services[i].id}/",
+                 lambda i: {"name": f"upd-{i}", "description": "-", "duration_minutes": 30, "price": "5.00"}, "admin"),
+        Scenario("services.partial_update", "patch", lambda i: f"/api/services/{fx.spare_services[i].id}/",
+                 lambda i: {"price": "6.00"}, "admin"),
+        Scenario("services.available_slots.warm", "get",
+                 lambda i: f"/api/services/{fx.service.id}/available-slots/?date={day}"),
+        Scenario("services.available_slots.cold", "get",
+                 lambda i: f"/api/services/{fx.service.id}/available-slots/?date={fx.start + timedelta(days=i)}"),
+        Scenario("availability_calendar.week", "get",
+                 lambda i: f"/api/availability-calendar/?services={fx.seeded_ids}&from={fx.start + timedelta(days=i)}&to={fx.start + timedelta(days=i + 6)}"),
+        Scenario("availabilities.list", "get", lambda i: "/api/availabilities/"),
+        Scenario("availabilities.retrieve", "get", lambda i: f"/api/availabilities/{fx.slot.id}/"),
+        Scenario("availabilities.create", "post", lambda i: "/api/availabilities/",
+                 lambda i: {"service": fx.service.id, "date": fx.free_days[i].isoformat(), "start_time": "18:00", "end_time": "18:30"}, "admin"),
+        Scenario("availabilities.update", "put", lambda i: f"/api/availabilities/{fx.spare_slots[i].id}/",
+                 lambda i: {"service": fx.service.id, "date": fx.free_days[i].isoformat(), "start_time": "16:00", "end_time": "17:00"}, "admin"),
+        Scenario("availabilities.partial_update", "patch", lambda i: f"/api/availabilities/{fx.spare_slots[i].id}/",
+                 lambda i: {"end_time": "16:45"}, "admin"),
+        Scenario("bookings.list.admin", "get", lambda i: "/api/bookings/", as_user="admin"),
+        Scenario("bookings.list.admin_filtered", "get", lambda i: f"/api/bookings/?status=PENDING&date={day}", as_user="admin"),
+        Scenario("bookings.list.user", "get", lambda i: "/api/bookings/"),
+        Scenario("bookings.retrieve", "get", lambda i: f"/api/bookings/{fx.booking.id}/", as_user="admin"),
+        Scenario("bookings.export", "get", lambda i: f"/api/bookings/export/?date={day}", as_user="admin"),
+        Scenario("bookings.create", "post", lambda i: "/api/bookings/",
+                 lambda i: {"service": fx.service.id, "availability": fx.slot_on(i, 0)}),
+        Scenario("bookings.bulk", "post", lambda i: "/api/bookings/bulk/",
+                 lambda i: {"availabilities": [fx.slot_on(i, 1), fx.slot_on(i, 2)]}),
+        Scenario("bookings.partial_update", "patch", lambda i: f"/api/bookings/{fx.own_bookings[i].id}/",
+                 lambda i: {"availability": fx.slot_on(i, 3)}),
+        Scenario("bookings.cancel", "post", lambda i: f"/api/bookings/{fx.own_bookings[i].id}/cancel/"),
+        Scenario("bookings.confirm", "post", lambda i: f"/api/bookings/{fx.booking.id}/confirm/", as_user="admin"),
+        Scenario("bookings.destroy", "delete", lambda i: f"/api/bookings/{fx.booking.id}/"),
+        Scenario("my_bookings", "get", lambda i: "/api/my-bookings/"),
+        Scenario("auth.me", "get", lambda i: "/api/auth/me/"),
+        Scenario("auth.register", "post", lambda i: "/api/auth/register/",
+                 lambda i: {"username": f"bench-new-{i}", "password": "bench-pass-123", "email": f"new{i}@bench.io"}, None),
+        Scenario("metrics", "get", lambda i: "/api/metrics/", as_user="admin"),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a throwaway test database and drives every API endpoint through the "
+        "DRF test client; reports p50/p95/p99 latency, queries and bytes per request "
+        "as JSON, optionally failing on regressions against a previous report."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=60)
+        parser.add_argument("--services", type=int, default=3)
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--fill", type=float, default=0.6)
+        parser.add_argument("--cancelled", type=float, default=1.0)
+        parser.add_argument("--requests", type=int, default=30, help="Measured requests per endpoint.")
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument("--only", nargs="*", default=None, help="Endpoint name prefixes to run.")
+        parser.add_argument("--throttle", action="store_true", help="Keep throttling on (429s once a scope is used up).")
+        parser.add_argument("--output", help="Write the JSON report to this file.")
+        parser.add_argument("--compare", help="Previous JSON report to compare against.")
+        parser.add_argument("--threshold", type=float, default=0.25,
+                            help="Allowed relative p95/bytes growth before failing (0.25 = 25%%).")
+        parser.add_argument("--min-delta-ms", type=float, default=2.0,
+                            help="Ignore p95 regressions smaller than this absolute amount.")
+
+    def handle(self, *args, **opts):
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # every endpoint is called more often than its throttle scope allows
+            with override_settings(THROTTLE_ENABLED=opts["throttle"]):
+                report = self.run(opts)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        payload = json.dumps(report, indent=2)
+        if opts["output"]:
+            with open(opts["output"], "w") as fh:
+                fh.write(payload + "\n")
+        self.stdout.write(payload)
+
+        if opts["compare"]:
+            with open(opts["compare"]) as fh:
+                regressions = compare(json.load(fh), report, opts["threshold"], opts["min_delta_ms"])
+            if regressions:
+                raise CommandError("Regressions:\n  " + "\n  ".join(regressions))
+            self.stderr.write("No regressions.")
+
+    def run(self, opts):
+        cache.clear()
+        start = date.today() + timedelta(days=1)
+        dataset = seed(start, opts["days"], services=opts["services"], users=opts["users"],
+                       fill=opts["fill"], cancelled=opts["cancelled"])
+
+        total = opts["warmup"] + opts["requests"]
+        fx = Fixtures(start, total)
+        clients = {None: APIClient()}
+        for role, user in (("user", fx.user), ("admin", fx.admin)):
+            clients[role] = APIClient()
+            clients[role].credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+
+        results = {}
+        for scenario in scenarios(fx):
+            if opts["only"] and not any(scenario.name.startswith(p) for p in opts["only"]):
+                continue
+            results[scenario.name] = self.measure(clients[scenario.as_user], scenario, opts["warmup"], opts["requests"])
+
+        return {
+            "meta": {
+                "commit": git_commit(),
+                "database": connection.vendor,
+                "dataset": dataset,
+                "requests": opts["requests"],
+            },
+            "endpoints": results,
+        }
+
+    def measure(self, client, scenario, warmup, requests):
+        latencies, queries, sizes, statuses = [], [], [], set()
+        for i in range(warmup + requests):
+            kwargs = {"format": "json"}
+            if scenario.data:
+                kwargs["data"] = scenario.data(i)
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                t0 = clock.perf_counter()
+                response = getattr(client, scenario.method)(scenario.path(i), **kwargs)
+                body = b"".join(response.streaming_content) if response.streaming else response.content
+                elapsed = (clock.perf_counter() - t0) * 1000
+            if i < warmup:
+                continue
+            latencies.append(elapsed)
+            queries.append(counter.count)
+            sizes.append(len(body))
+            statuses.add(response.status_code)
+
+        return {
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "queries": round(statistics.mean(queries), 2),
+            "queries_max": max(queries),
+            "bytes": round(statistics.mean(sizes)),
+            "status": sorted(statuses),
+        }
+
+
+def compare(baseline, current, threshold, min_delta_ms):
+    regressions = []
+    for name, now in current["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if before is None:
+            continue
+        if now["queries_max"] > before["queries_max"]:
+            regressions.append(f"{name}: queries {before['queries_max']} -> {now['queries_max']}")
+        if (now["p95_ms"] > before["p95_ms"] * (1 + threshold)
+                and now["p95_ms"] - before["p95_ms"] > min_delta_ms):
+            regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {now['p95_ms']}ms")
+        if now["bytes"] > before["bytes"] * (1 + threshold):
+            regressions.append(f"{name}: bytes {before['bytes']} -> {now['bytes']}")
+        if now["status"] != before["status"]:
+            regressions.append(f"{name}: status {before['status']} -> {now['status']}")
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,278 @@
+import asyncio
+import io
+import json
+import statistics
+import sys
+import threading
+import time as clock
+from datetime import date, time, timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import include, path
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from bookings.models import Availability, Booking, Service
+
+from ._seed import seed
+from .bench import percentile
+
+
+class AsyncRoot:
+    """The project urls with ASYNC_VIEWS on."""
+
+    urlpatterns = [
+        path("api/", include("bookings.async_urls")),
+        path("api/", include("bookings.urls")),
+    ]
+
+
+class SyncRoot:
+    urlpatterns = [
+        path("api/", include("bookings.urls")),
+    ]
+
+
+class DatabaseLatency:
+    """execute_wrapper adding a fixed round trip to every query, on every connection."""
+
+    def __init__(self, ms):
+        self.seconds = ms / 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        clock.sleep(self.seconds)
+        return execute(sql, params, many, context)
+
+    def install(self):
+        connection_created.connect(self.attach, weak=False)
+        for conn in connections.all():
+            self.attach(connection=conn)
+
+    def uninstall(self):
+        connection_created.disconnect(self.attach)
+        for conn in connections.all():
+            if self in conn.execute_wrappers:
+                conn.execute_wrappers.remove(self)
+
+    def attach(self, sender=None, connection=None, **kwargs):
+        # outermost: connecting can happen inside another execute_wrapper() block,
+        # which pops the last wrapper on exit
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, self)
+
+
+def split(paths, workers):
+    return [paths[w::workers] for w in range(workers)]
+
+
+def _target(path):
+    """(method, path, body) of a GET given as a path, or a JSON POST as a (path, data) pair."""
+    if isinstance(path, tuple):
+        return "POST", path[0], json.dumps(path[1]).encode()
+    return "GET", path, b""
+
+
+def run_wsgi(paths, token, workers):
+    """`workers` sync workers: each serves one request at a time."""
+    handler = WSGIHandler()
+    results = []
+
+    def call(path):
+        method, path, body = _target(path)
+        route, _, query = path.partition("?")
+        environ = {
+            "REQUEST_METHOD": method,
+            "SCRIPT_NAME": "",
+            "PATH_INFO": route,
+            "QUERY_STRING": query,
+            "SERVER_NAME": "testserver",
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "HTTP_HOST": "testserver",
+            "HTTP_AUTHORIZATION": token,
+            "CONTENT_TYPE": "application/json",
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.url_scheme": "http",
+        }
+        status = []
+        t0 = clock.perf_counter()
+        body = handler(environ, lambda s, headers: status.append(int(s.split()[0])))
+        b"".join(body)
+        body.close()
+        results.append((status[0], (clock.perf_counter() - t0) * 1000))
+
+    def worker(share):
+        for p in share:
+            call(p)
+
+    return results, threaded(worker, split(paths, workers))
+
+
+def run_asgi(paths, token, workers, concurrency):
+    """`workers` ASGI workers: one event loop each, `concurrency` requests in flight."""
+    handler = ASGIHandler()
+    results = []
+
+    async def call(path):
+        method, path, body = _target(path)
+        route, _, query = path.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": route,
+            "raw_path": route.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"authorization", token.encode()),
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+            "client": ("127.0.0.1", 0),
+            "server": ("testserver", 80),
+        }
+        done = asyncio.Event()
+        sent = []
+
+        async def receive():
+            if not sent:
+                sent.append(None)
+                return {"type": "http.request", "body": body, "more_body": False}
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        status = []
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+
+        t0 = clock.perf_counter()
+        await handler(scope, receive, send)
+        done.set()
+        results.append((status[0], (clock.perf_counter() - t0) * 1000))
+
+    async def loop(share):
+        gate = asyncio.Semaphore(concurrency)
+
+        async def bounded(p):
+            async with gate:
+                await call(p)
+
+        await asyncio.gather(*(bounded(p) for p in share))
+
+    return results, threaded(lambda share: asyncio.run(loop(share)), split(paths, workers))
+
+
+def threaded(target, shares):
+    threads = [threading.Thread(target=target, args=(share,)) for share in shares]
+    t0 = clock.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return clock.perf_counter() - t0
+
+
+def summary(results, elapsed):
+    latencies = [ms for _, ms in results]
+    return {
+        "requests": len(results),
+        "throughput_rps": round(len(results) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "mean_ms": round(statistics.mean(latencies), 3),
+        "status": sorted({code for code, _ in results}),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the throughput of the read endpoints served by sync WSGI workers "
+        "and by ASGI workers running the async views, at the same worker count, on "
+        "a seeded throwaway test database with a simulated database round trip."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=1)
+        parser.add_argument("--concurrency", type=int, default=20, help="In-flight requests per ASGI worker.")
+        parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint and mode.")
+        parser.add_argument("--db-latency-ms", type=float, default=5.0, help="Added to every query.")
+        parser.add_argument("--days", type=int, default=14)
+        parser.add_argument("--output", help="Write the JSON report to this file.")
+
+    def handle(self, *args, **opts):
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(THROTTLE_ENABLED=False):
+                report = self.run(opts)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        payload = json.dumps(report, indent=2)
+        if opts["output"]:
+            with open(opts["output"], "w") as fh:
+                fh.write(payload + "\n")
+        self.stdout.write(payload)
+
+    def run(self, opts):
+        cache.clear()
+        start = date.today() + timedelta(days=1)
+        seed(start, opts["days"], services=3, users=20)
+        service = Service.objects.order_by("id").first()
+        user = User.objects.create_user("bench-asgi", password="bench-pass-123")
+        far = start + timedelta(days=3650)
+        for h in range(9, 14):
+            slot = Availability.objects.create(service=service, date=far, start_time=time(h, 0), end_time=time(h, 30))
+            Booking.objects.create(user=user, service=service, availability=slot,
+                                   date=slot.date, start_time=slot.start_time, end_time=slot.end_time)
+        token = f"Bearer {RefreshToken.for_user(user).access_token}"
+
+        endpoints = {
+            "services.list": "/api/services/",
+            "services.retrieve": f"/api/services/{service.id}/",
+            "services.available_slots": f"/api/services/{service.id}/available-slots/?date={start}",
+            "my_bookings": "/api/my-bookings/",
+            "auth.me": "/api/auth/me/",
+        }
+
+        latency = DatabaseLatency(opts["db_latency_ms"])
+        latency.install()
+        results = {}
+        try:
+            for name, url in endpoints.items():
+                paths = [url] * opts["requests"]
+                with override_settings(ROOT_URLCONF=SyncRoot):
+                    wsgi = summary(*run_wsgi(paths, token, opts["workers"]))
+                with override_settings(ROOT_URLCONF=AsyncRoot):
+                    asgi = summary(*run_asgi(paths, token, opts["workers"], opts["concurrency"]))
+                asgi["speedup"] = round(asgi["throughput_rps"] / wsgi["throughput_rps"], 2)
+                results[name] = {"wsgi": wsgi, "asgi": asgi}
+        finally:
+            latency.uninstall()
+
+        return {
+            "meta": {
+                "database": connection.vendor,
+                "workers": opts["workers"],
+                "asgi_concurrency": opts["concurrency"],
+                "db_latency_ms": opts["db_latency_ms"],
+            },
+            "endpoints": results,
+        }
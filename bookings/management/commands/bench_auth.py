@@ -0,0 +1,91 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import path
+
+from bookings.views import LoginView
+
+from .bench_asgi import AsyncRoot, SyncRoot, run_asgi, run_wsgi, summary
+
+
+LOGIN = [path("api/auth/login/", LoginView.as_view())]
+
+
+class SyncAuthRoot:
+    urlpatterns = SyncRoot.urlpatterns + LOGIN
+
+
+class AsyncAuthRoot:
+    urlpatterns = AsyncRoot.urlpatterns + LOGIN
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares login and register throughput of sync WSGI workers and ASGI workers "
+        "running the async views, at the same worker count, on a throwaway test "
+        "database; passwords are hashed on the PASSWORD_HASH_WORKERS pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=1)
+        parser.add_argument("--concurrency", type=int, default=20, help="In-flight requests per ASGI worker.")
+        parser.add_argument("--requests", type=int, default=40, help="Requests per endpoint and mode.")
+        parser.add_argument("--iterations", type=int, default=settings.PBKDF2_ITERATIONS, help="PBKDF2 rounds.")
+        parser.add_argument("--output", help="Write the JSON report to this file.")
+
+    def handle(self, *args, **opts):
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(THROTTLE_ENABLED=False, PBKDF2_ITERATIONS=opts["iterations"]):
+                report = self.run(opts)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        payload = json.dumps(report, indent=2)
+        if opts["output"]:
+            with open(opts["output"], "w") as fh:
+                fh.write(payload + "\n")
+        self.stdout.write(payload)
+
+    def run(self, opts):
+        cache.clear()
+        User.objects.create_user("bench-login", password="bench-pass-123")
+        n = opts["requests"]
+        endpoints = {
+            "auth.login": lambda mode: [
+                ("/api/auth/login/", {"username": "bench-login", "password": "bench-pass-123"})
+            ] * n,
+            "auth.register": lambda mode: [
+                ("/api/auth/register/", {"username": f"bench-{mode}-{i}", "password": "bench-pass-123"})
+                for i in range(n)
+            ],
+        }
+
+        results = {}
+        for name, requests in endpoints.items():
+            with override_settings(ROOT_URLCONF=SyncAuthRoot):
+                wsgi = summary(*run_wsgi(requests("wsgi"), "", opts["workers"]))
+            with override_settings(ROOT_URLCONF=AsyncAuthRoot):
+                asgi = summary(*run_asgi(requests("asgi"), "", opts["workers"], opts["concurrency"]))
+            asgi["speedup"] = round(asgi["throughput_rps"] / wsgi["throughput_rps"], 2)
+            results[name] = {"wsgi": wsgi, "asgi": asgi}
+
+        return {
+            "meta": {
+                "database": connection.vendor,
+                "workers": opts["workers"],
+                "asgi_concurrency": opts["concurrency"],
+                "pbkdf2_iterations": opts["iterations"],
+                "password_hash_workers": settings.PASSWORD_HASH_WORKERS,
+            },
+            "endpoints": results,
+        }
@@ -0,0 +1,92 @@
+import statistics
+import time as clock
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from bookings.archive import archive_availabilities, archive_bookings
+from bookings.intervals import ACTIVE_STATUSES, active_ranges
+from bookings.models import Availability, Booking
+
+from ._seed import seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Prints EXPLAIN output and timings of the booking conflict queries on a "
+        "seeded dataset (rolled back afterwards unless --keep). With --archive, "
+        "measures again after archiving the --history days seeded in the past."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=365)
+        parser.add_argument("--services", type=int, default=3)
+        parser.add_argument("--fill", type=float, default=0.6, help="Share of each day's grid that is booked.")
+        parser.add_argument("--cancelled", type=float, default=1.0, help="Cancelled bookings per active one.")
+        parser.add_argument("--history", type=int, default=0, help="Also seed this many past days.")
+        parser.add_argument("--archive", action="store_true", help="Report again after archiving the past days.")
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--no-seed", action="store_true", help="Run against the existing data only.")
+        parser.add_argument("--keep", action="store_true", help="Commit the seeded rows.")
+
+    def handle(self, *args, **opts):
+        with transaction.atomic():
+            start = date.today() + timedelta(days=1)
+            if not opts["no_seed"]:
+                t0 = clock.perf_counter()
+                counts = seed(start - timedelta(days=opts["history"]), opts["days"] + opts["history"],
+                              services=opts["services"], fill=opts["fill"], cancelled=opts["cancelled"])
+                self.stdout.write(f"seeded {counts} in {clock.perf_counter() - t0:.1f}s")
+
+            self.report(start, opts["repeat"])
+
+            if opts["archive"]:
+                t0 = clock.perf_counter()
+                bookings = sum(archive_bookings(date.today(), batch=5000))
+                slots = sum(archive_availabilities(date.today(), batch=5000))
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f"\narchived {bookings} bookings and {slots} slots in {clock.perf_counter() - t0:.1f}s"
+                ))
+                self.report(start, opts["repeat"])
+
+            if not opts["keep"]:
+                transaction.set_rollback(True)
+
+    def queries(self, day):
+        week = [day + timedelta(days=i) for i in range(7)]
+        service_id = Availability.objects.filter(date=day).values_list("service_id", flat=True).first()
+        return [
+            ("active ranges of a date (validate, available-slots)", active_ranges(day)),
+            (
+                "active ranges of a week (calendar, bulk)",
+                Booking.objects.filter(status__in=ACTIVE_STATUSES, date__in=week).values_list("date", "start_time", "end_time"),
+            ),
+            (
+                "active slots of a service and date",
+                Availability.objects.filter(service_id=service_id, date=day, is_active=True).order_by("start_time"),
+            ),
+            (
+                "previous join through availability (reference)",
+                Booking.objects.filter(status__in=ACTIVE_STATUSES, availability__date=day, availability__isnull=False)
+                .values_list("availability__start_time", "availability__end_time"),
+            ),
+        ]
+
+    def report(self, day, repeat):
+        self.stdout.write(f"database: {connection.vendor}, bookings: {Booking.objects.count()}, "
+                          f"availabilities: {Availability.objects.count()}")
+        for label, qs in self.queries(day):
+            timings = []
+            for _ in range(repeat):
+                t0 = clock.perf_counter()
+                list(qs.all())
+                timings.append((clock.perf_counter() - t0) * 1000)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n{label}"))
+            self.stdout.write(str(qs.query))
+            self.stdout.write(qs.explain())
+            self.stdout.write(
+                f"median {statistics.median(timings):.3f} ms, "
+                f"max {max(timings):.3f} ms over {repeat} runs"
+            )
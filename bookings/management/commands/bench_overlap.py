@@ -0,0 +1,70 @@
+import random
+import time as clock
+from datetime import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.intervals import IntervalIndex
+
+
+DAY_SECONDS = 24 * 60 * 60
+
+
+def _clock(seconds):
+    return time(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def _bookings(rng, count):
+    """Non-overlapping ranges (as the global rule guarantees) spread over the day."""
+    cuts = sorted(rng.sample(range(DAY_SECONDS), 2 * count))
+    return [(_clock(cuts[i]), _clock(cuts[i + 1])) for i in range(0, len(cuts), 2)]
+
+
+def _slots(rng, count, length=30):
+    starts = sorted(rng.randrange(0, DAY_SECONDS - length) for _ in range(count))
+    return [(_clock(s), _clock(s + length)) for s in starts]
+
+
+def _scan(slots, ranges):
+    return [
+        (s, e) for (s, e) in slots
+        if not any(s < b_end and e > b_start for (b_start, b_end) in ranges)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark: linear overlap scan vs IntervalIndex on days with many bookings."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bookings", type=int, nargs="+", default=[100, 1000, 5000, 10000])
+        parser.add_argument("--slots", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **opts):
+        rng = random.Random(opts["seed"])
+        slots = _slots(rng, opts["slots"])
+
+        self.stdout.write(f"{'bookings':>9} {'slots':>6} {'scan ms':>10} {'index ms':>10} {'speedup':>8}")
+        for count in opts["bookings"]:
+            ranges = _bookings(rng, count)
+
+            scan = self._best(lambda: _scan(slots, ranges), opts["repeat"])
+            index = self._best(
+                lambda: IntervalIndex(ranges).free(slots, bounds=lambda slot: slot),
+                opts["repeat"],
+            )
+
+            assert _scan(slots, ranges) == IntervalIndex(ranges).free(slots, bounds=lambda slot: slot)
+            self.stdout.write(
+                f"{count:>9} {len(slots):>6} {scan * 1000:>10.2f} {index * 1000:>10.2f} {scan / index:>7.1f}x"
+            )
+
+    @staticmethod
+    def _best(fn, repeat):
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = clock.perf_counter()
+            fn()
+            best = min(best, clock.perf_counter() - t0)
+        return best
@@ -0,0 +1,107 @@
+import json
+import time as clock
+from datetime import date, time, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.renderers import JSONRenderer
+
+from bookings.models import Availability, Booking, Service
+from bookings.projections import projection
+from bookings.renderers import FastJSONRenderer
+from bookings.serializers import AvailabilitySerializer, BookingSerializer
+
+
+def best(fn, repeat):
+    """(fastest seconds, result) of `repeat` runs."""
+    timings = []
+    for _ in range(repeat):
+        t0 = clock.perf_counter()
+        result = fn()
+        timings.append(clock.perf_counter() - t0)
+    return min(timings), result
+
+
+class Command(BaseCommand):
+    help = (
+        "Per-row cost of rendering large lists through the ModelSerializers + DRF's "
+        "JSONRenderer versus the values() projections + FastJSONRenderer, on a seeded "
+        "throwaway test database. Checks that both produce the same bytes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--output", help="Write the JSON report to this file.")
+
+    def handle(self, *args, **opts):
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            report = self.run(opts)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        payload = json.dumps(report, indent=2)
+        if opts["output"]:
+            with open(opts["output"], "w") as fh:
+                fh.write(payload + "\n")
+        self.stdout.write(payload)
+
+    def seed(self, rows):
+        service = Service.objects.create(name="bench", description="", duration_minutes=30, price="10.00")
+        user = User.objects.create_user("bench-serializers", password="!")
+        start = date.today() + timedelta(days=1)
+        slots = [
+            Availability(service=service, date=start + timedelta(days=i // 16),
+                         start_time=time(9 + i % 16 // 2, 30 * (i % 2)), end_time=time(9 + i % 16 // 2, 30 * (i % 2) + 29))
+            for i in range(rows)
+        ]
+        Availability.objects.bulk_create(slots, batch_size=2000)
+        Booking.objects.bulk_create([
+            Booking(user=user, service=service, status="CANCELLED", notes=f"row {i}",
+                    date=slot.date, start_time=slot.start_time, end_time=slot.end_time)
+            for i, slot in enumerate(slots)
+        ], batch_size=2000)
+
+    def run(self, opts):
+        self.seed(opts["rows"])
+        lists = {
+            "bookings": (BookingSerializer, Booking.objects.order_by("-id"), ("user",)),
+            "availabilities": (AvailabilitySerializer, Availability.objects.order_by("id"), ()),
+        }
+
+        results = {}
+        for name, (serializer_class, queryset, related) in lists.items():
+            rows = queryset.count()
+
+            def per_row(seconds):
+                return round(seconds / rows * 1e6, 3)
+
+            fetch, instances = best(lambda: list(queryset.select_related(*related)), opts["repeat"])
+            serialize, data = best(lambda: serializer_class(instances, many=True).data, opts["repeat"])
+            render, before = best(lambda: JSONRenderer().render(data), opts["repeat"])
+
+            fetch_rows, values = best(lambda: list(projection(serializer_class).values(queryset)), opts["repeat"])
+            project, fast_data = best(lambda: projection(serializer_class).rows(values), opts["repeat"])
+            fast_render, after = best(lambda: FastJSONRenderer().render(fast_data), opts["repeat"])
+
+            assert before == after, f"{name}: projected output differs"
+            results[name] = {
+                "rows": rows,
+                "serializer_us_per_row": {
+                    "fetch": per_row(fetch), "serialize": per_row(serialize), "render": per_row(render),
+                    "total": per_row(fetch + serialize + render),
+                },
+                "projection_us_per_row": {
+                    "fetch": per_row(fetch_rows), "serialize": per_row(project), "render": per_row(fast_render),
+                    "total": per_row(fetch_rows + project + fast_render),
+                },
+                "speedup": round((fetch + serialize + render) / (fetch_rows + project + fast_render), 2),
+                "bytes": len(after),
+            }
+        return {"meta": {"database": connection.vendor, "repeat": opts["repeat"]}, "lists": results}
@@ -0,0 +1,77 @@
+import threading
+import time as clock
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from bookings.throttling import BucketThrottle
+
+
+def _request(ip):
+    return SimpleNamespace(user=AnonymousUser(), META={"REMOTE_ADDR": ip})
+
+
+VIEW = SimpleNamespace(throttle_scope="bench")
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark of BucketThrottle on the configured cache: cost of one "
+        "passing and one refused check, and how many of a concurrent burst pass."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--checks", type=int, default=20000)
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--burst", type=int, default=100, help="Bucket size of the burst test.")
+
+    def handle(self, *args, **opts):
+        self.stdout.write(f"cache: {settings.CACHES['default']['BACKEND']}")
+        self.stdout.write(f"{'check':>10} {'us/check':>10}")
+        for name, rate in (("passing", f"{opts['checks'] * 10}/hour"), ("refused", "1/hour")):
+            with self.rate(rate):
+                request = _request(f"10.0.0.{len(name)}")
+                BucketThrottle().allow_request(request, VIEW)
+                elapsed = self.time(lambda: BucketThrottle().allow_request(request, VIEW), opts["checks"])
+            self.stdout.write(f"{name:>10} {elapsed / opts['checks'] * 1e6:>10.2f}")
+
+        sent = opts["burst"] * 3 // opts["threads"] * opts["threads"]
+        with self.rate(f"{opts['burst']}/hour"):
+            passed = self.burst(opts["threads"], sent)
+        self.stdout.write(
+            f"burst: {passed} of {sent} concurrent requests passed "
+            f"({opts['threads']} threads, bucket of {opts['burst']})"
+        )
+
+    @staticmethod
+    def rate(rate):
+        cache.clear()
+        return override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {"bench": rate}})
+
+    @staticmethod
+    def time(fn, n):
+        t0 = clock.perf_counter()
+        for _ in range(n):
+            fn()
+        return clock.perf_counter() - t0
+
+    @staticmethod
+    def burst(threads, requests):
+        request = _request("10.0.1.1")
+        passed = []
+        start = threading.Barrier(threads)
+
+        def worker(share):
+            start.wait()
+            passed.extend(1 for _ in range(share) if BucketThrottle().allow_request(request, VIEW))
+
+        pool = [threading.Thread(target=worker, args=(requests // threads,)) for _ in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        return len(passed)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.models import Service
+from bookings.slots import BATCH_DAYS, horizon, pregenerate_slots
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates the missing slots of every service over the rolling horizon (the next "
+        "SLOT_HORIZON_DAYS days), in batches. Idempotent: run it on deploy and daily, "
+        "so that reading available slots inside the horizon never writes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None, help="Horizon length (default: SLOT_HORIZON_DAYS).")
+        parser.add_argument("--services", type=int, nargs="*", help="Service ids (default: all).")
+        parser.add_argument("--batch-days", type=int, default=BATCH_DAYS, help="Dates per insert round.")
+
+    def handle(self, *args, **opts):
+        if (opts["days"] is not None and opts["days"] < 0) or opts["batch_days"] < 1:
+            raise CommandError("--days must not be negative and --batch-days must be positive.")
+
+        services = Service.objects.order_by("id")
+        if opts["services"]:
+            services = services.filter(id__in=opts["services"])
+        service_ids = list(services.values_list("id", flat=True))
+
+        dates = horizon(opts["days"])
+        if service_ids:
+            pregenerate_slots(service_ids, dates, batch_days=opts["batch_days"])
+        self.stdout.write(f"Slots ensured for {len(service_ids)} service(s) over {len(dates)} date(s).")
@@ -0,0 +1,69 @@
+from django.core.cache import cache
+
+PREFIX = "metrics:"
+
+# name -> help text, in exposition order
+COUNTERS = {
+    "slots_cache_hits": "available-slots responses served from the cache",
+    "slots_cache_misses": "available-slots responses computed from the database",
+    "slots_cache_invalidations": "per-date invalidations of cached available-slots",
+    "throttled_requests": "requests refused with 429 by BucketThrottle",
+}
+
+# per-process connection pool figures (bookings.db.pool), labelled by alias
+POOL = {
+    "db_pool_max_size": ("gauge", "configured connection pool size"),
+    "db_pool_open": ("gauge", "connections open, idle or checked out"),
+    "db_pool_in_use": ("gauge", "connections checked out"),
+    "db_pool_checkouts": ("counter", "connection checkouts"),
+    "db_pool_waits": ("counter", "checkouts that waited for a free connection"),
+    "db_pool_wait_seconds": ("counter", "seconds spent waiting for a free connection"),
+    "db_pool_timeouts": ("counter", "checkouts that gave up waiting"),
+}
+
+
+def incr(name, delta=1):
+    """Process-shared counter; atomic on locmem, redis and memcached."""
+    key = PREFIX + name
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # first hit (or evicted): seed it, another worker may have won the race
+        if not cache.add(key, delta, timeout=None):
+            cache.incr(key, delta)
+
+
+async def aincr(name, delta=1):
+    key = PREFIX + name
+    try:
+        await cache.aincr(key, delta)
+    except ValueError:
+        if not await cache.aadd(key, delta, timeout=None):
+            await cache.aincr(key, delta)
+
+
+def snapshot():
+    values = cache.get_many([PREFIX + name for name in COUNTERS])
+    return {name: values.get(PREFIX + name, 0) for name in COUNTERS}
+
+
+def render_prometheus(values):
+    lines = []
+    for name, value in values.items():
+        lines.append(f"# HELP booking_{name} {COUNTERS.get(name, name)}")
+        lines.append(f"# TYPE booking_{name} counter")
+        lines.append(f"booking_{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def render_pool_prometheus(pools):
+    """pools: {alias: stats} as returned by bookings.db.pool.stats()."""
+    if not pools:
+        return ""
+    lines = []
+    for name, (kind, help_text) in POOL.items():
+        lines.append(f"# HELP booking_{name} {help_text}")
+        lines.append(f"# TYPE booking_{name} {kind}")
+        for alias, values in pools.items():
+            lines.append(f'booking_{name}{{alias="{alias}"}} {values[name]}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,173 @@
+import cProfile
+import json
+import logging
+import os
+import random
+import re
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import profiling
+
+slow_log = logging.getLogger("bookings.slow_requests")
+
+DEFAULTS = {
+    "SLOW_REQUEST_MS": 500,
+    "WORST_SQL": 3,
+    "CPROFILE_SAMPLE_RATE": 0.0,
+    "CPROFILE_DIR": "profiles",
+}
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in request instrumentation (settings.PROFILING):
+    total time, DB query count and time, serializer and auth time, sent back in
+    a Server-Timing header; requests slower than SLOW_REQUEST_MS are logged with
+    their slowest statements to the "bookings.slow_requests" logger, and a
+    CPROFILE_SAMPLE_RATE share of requests is dumped as .prof files.
+
+    Runs in async mode as well, so the async views stay on the event loop. There
+    the queries their sync_to_async() threads run are still counted, and a
+    sampled cProfile covers the event loop while the request is in flight
+    (other requests' coroutines included).
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = {**DEFAULTS, **getattr(settings, "PROFILING", {})}
+        # queries of connections opened later, in any thread, find their request's profile
+        connection_created.connect(profiling.hook_connection, dispatch_uid="bookings.profiling")
+        self.hooked = False
+        self.sampling = False
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def hook_connections():
+        for conn in connections.all():
+            profiling.hook_connection(conn)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.hook_connections()
+        profile, profiler, token, t0 = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            self.stop(profiler, token)
+        return self.finish(request, response, profile, profiler, t0)
+
+    async def __acall__(self, request):
+        if not self.hooked:
+            # connections opened before this middleware, in the thread the ORM runs in
+            await sync_to_async(self.hook_connections)()
+            self.hooked = True
+        # one cProfile per thread: concurrent requests on the loop are not sampled meanwhile
+        profile, profiler, token, t0 = self.start(can_sample=not self.sampling)
+        self.sampling = profiler is not None
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.stop(profiler, token)
+            if profiler:
+                self.sampling = False
+        return self.finish(request, response, profile, profiler, t0)
+
+    def start(self, can_sample=True):
+        profile = profiling.RequestProfile(worst_sql=self.config["WORST_SQL"])
+        sampled = can_sample and random.random() < self.config["CPROFILE_SAMPLE_RATE"]
+        profiler = cProfile.Profile() if sampled else None
+        token = profiling.activate(profile)
+        if profiler:
+            profiler.enable()
+        return profile, profiler, token, time.perf_counter()
+
+    @staticmethod
+    def stop(profiler, token):
+        if profiler:
+            profiler.disable()
+        profiling.deactivate(token)
+
+    def finish(self, request, response, profile, profiler, t0):
+        total_ms = (time.perf_counter() - t0) * 1000
+
+        response["Server-Timing"] = self.server_timing(profile, total_ms)
+
+        if total_ms >= self.config["SLOW_REQUEST_MS"]:
+            slow_log.warning(json.dumps(self.record(request, response, profile, total_ms)))
+
+        if profiler:
+            self.dump(profiler, request, total_ms)
+
+        return response
+
+    @staticmethod
+    def server_timing(profile, total_ms):
+        metrics = [
+            f"total;dur={total_ms:.1f}",
+            f'db;dur={profile.db_ms:.1f};desc="{profile.queries} queries"',
+        ]
+        for name, ms in profile.phases.items():
+            metrics.append(f"{name};dur={ms:.1f}")
+        return ", ".join(metrics)
+
+    @staticmethod
+    def record(request, response, profile, total_ms):
+        return {
+            "event": "slow_request",
+            "method": request.method,
+            "path": request.get_full_path(),
+            "status": response.status_code,
+            "user_id": getattr(getattr(request, "user", None), "id", None),
+            "total_ms": round(total_ms, 1),
+            "db_ms": round(profile.db_ms, 1),
+            "queries": profile.queries,
+            **{f"{name}_ms": round(ms, 1) for name, ms in profile.phases.items()},
+            "worst_sql": profile.slowest_sql(),
+        }
+
+    def dump(self, profiler, request, total_ms):
+        directory = self.config["CPROFILE_DIR"]
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", request.path).strip("-") or "root"
+        name = f"{time.time_ns()}-{request.method}-{slug}-{total_ms:.0f}ms.prof"
+        profiler.dump_stats(os.path.join(directory, name))
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware that also runs in async mode. WhiteNoise's own is sync
+    only, which makes Django run every view below it in a thread under ASGI.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.11 on 2026-10-18 18:49
+
+from django.db import migrations, models
+
+
+def backfill_date_locks(apps, schema_editor):
+    Availability = apps.get_model("bookings", "Availability")
+    DateLock = apps.get_model("bookings", "DateLock")
+    dates = Availability.objects.values_list("date", flat=True).distinct()
+    DateLock.objects.bulk_create([DateLock(date=d) for d in dates], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_booking_date_booking_end_time_booking_start_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DateLock',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False)),
+            ],
+        ),
+        migrations.RunPython(backfill_date_locks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.11 on 2026-10-18 18:52
+
+from django.db import migrations, models
+
+
+def backfill_booking_snapshot(apps, schema_editor):
+    # conflict queries now read the snapshot columns only
+    Booking = apps.get_model("bookings", "Booking")
+    pending = Booking.objects.filter(date__isnull=True, availability__isnull=False).select_related("availability")
+    for booking in pending.iterator(chunk_size=1000):
+        slot = booking.availability
+        booking.date, booking.start_time, booking.end_time = slot.date, slot.start_time, slot.end_time
+        booking.save(update_fields=["date", "start_time", "end_time"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_datelock'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='availability',
+            index=models.Index(fields=['service', 'date', 'is_active'], name='avail_service_date_active'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'date', 'start_time', 'end_time'], name='booking_status_date_times'),
+        ),
+        migrations.RunPython(backfill_booking_snapshot, migrations.RunPython.noop),
+    ]
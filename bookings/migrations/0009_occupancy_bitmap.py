@@ -0,0 +1,51 @@
+# Generated by Django 4.2.11 on 2026-10-18 19:18
+
+import bookings.models
+from django.db import migrations, models
+
+
+def _minute(t):
+    return t.hour * 60 + t.minute
+
+
+def backfill_occupancy(apps, schema_editor):
+    # inline copy of bookings.occupancy, as of this migration
+    Booking = apps.get_model("bookings", "Booking")
+    DateLock = apps.get_model("bookings", "DateLock")
+    occupancy = {}
+    rows = Booking.objects.filter(status__in=["PENDING", "CONFIRMED"]).values_list("date", "start_time", "end_time")
+    for day, start, end in rows:
+        if None in (day, start, end):
+            continue
+        bits, exact = occupancy.get(day, (0, True))
+        first = _minute(start)
+        last = _minute(end) + (1 if (end.second or end.microsecond) else 0)
+        if last > first:
+            bits |= ((1 << (last - first)) - 1) << first
+        exact = exact and not (start.second or start.microsecond or end.second or end.microsecond) and start < end
+        occupancy[day] = (bits, exact)
+
+    DateLock.objects.bulk_create([DateLock(date=d) for d in occupancy], ignore_conflicts=True)
+    for day, (bits, exact) in occupancy.items():
+        DateLock.objects.filter(date=day).update(occupied=bits.to_bytes(180, "little"), occupied_exact=exact)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0008_token_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datelock',
+            name='occupied',
+            field=models.BinaryField(default=bookings.models.empty_occupancy, max_length=180),
+        ),
+        migrations.AddField(
+            model_name='datelock',
+            name='occupied_exact',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.RunPython(backfill_occupancy, migrations.RunPython.noop),
+    ]
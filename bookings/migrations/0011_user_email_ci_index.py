@@ -0,0 +1,28 @@
+# Generated by Django 4.2.11 on 2026-10-18 20:02
+
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+# auth_user belongs to django.contrib.auth, so the index is created through the
+# schema editor rather than declared on the model
+USER_EMAIL_CI = models.Index(Lower("email"), name="user_email_ci")
+
+
+def add_index(apps, schema_editor):
+    schema_editor.add_index(apps.get_model("auth", "User"), USER_EMAIL_CI)
+
+
+def remove_index(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model("auth", "User"), USER_EMAIL_CI)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('bookings', '0010_archive'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_index, remove_index),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.11 on 2026-10-18 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0011_user_email_ci_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('service_id', models.BigIntegerField()),
+                ('date', models.DateField()),
+                ('availability_id', models.BigIntegerField()),
+                ('kind', models.CharField(choices=[('taken', 'Taken'), ('freed', 'Freed')], max_length=5)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['service_id', 'date', 'id'], name='slot_event_service_date_id'), models.Index(fields=['created_at'], name='slot_event_created_at')],
+            },
+        ),
+    ]
@@ -26,6 +26,9 @@ class Availability(models.Model):
                 name="uniq_service_date_time_slot",
             )
         ]
+        indexes = [
+            models.Index(fields=["service", "date", "is_active"], name="avail_service_date_active"),
+        ]
 
     def __str__(self):
         return f"{self.service.name} | {self.date} {self.start_time}-{self.end_time}"
@@ -47,5 +50,146 @@ class Booking(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
     notes = models.TextField(blank=True)
 
+    ACTIVE_STATUSES = ("PENDING", "CONFIRMED")
+    OCCUPANCY_FIELDS = ("status", "date", "start_time", "end_time")
+
+    class Meta:
+        indexes = [
+            # conflict checks: active bookings of a date, covering the times
+            models.Index(fields=["status", "date", "start_time", "end_time"], name="booking_status_date_times"),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.service.name}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # what the date's occupancy bitmap holds for this row, so that saves
+        # which do not change it (e.g. confirm) skip the bitmap update
+        if set(cls.OCCUPANCY_FIELDS) <= set(field_names):
+            instance._loaded_occupancy = instance.occupied_range()
+        # and the date it was on, whose cached slots a move also changes
+        if "date" in field_names:
+            instance._loaded_date = instance.date
+        return instance
+
+    def occupied_range(self):
+        """(date, start_time, end_time) this booking holds, None when it holds no time."""
+        if self.status not in self.ACTIVE_STATUSES or None in (self.date, self.start_time, self.end_time):
+            return None
+        return (self.date, self.start_time, self.end_time)
+
+
+def empty_occupancy():
+    return bytes(180)
+
+
+class DateLock(models.Model):
+    """
+    One row per booking date. Writers that must see a stable set of bookings
+    for a date (overlap check + insert) lock its row with select_for_update,
+    so only writers of the same date are serialized.
+
+    The row also carries the date's occupancy bitmap (see bookings.occupancy):
+    one bit per minute covered by an active booking.
+    """
+    date = models.DateField(primary_key=True)
+    occupied = models.BinaryField(max_length=180, default=empty_occupancy)
+    # False when a booking with sub-minute times makes the bitmap approximate
+    occupied_exact = models.BooleanField(default=True)
+
+    def __str__(self):
+        return str(self.date)
+
+
+class TokenUser(User):
+    """
+    A User rebuilt with no query, from the claims of an access token
+    (AUTH_TOKEN_CLAIMS) or the user cache. It only carries those fields, so it
+    is never saved.
+    """
+
+    class Meta:
+        proxy = True
+
+    def save(self, *args, **kwargs):
+        raise TypeError("TokenUser is read-only; load the User to change it.")
+
+
+class ArchivedAvailability(models.Model):
+    """
+    A slot moved out of Availability by bookings.archive (past dates). Same
+    columns and primary key as the hot row; read-only history.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name="+")
+    date = models.DateField()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    is_active = models.BooleanField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["service", "date"], name="arch_avail_service_date"),
+        ]
+
+    def __str__(self):
+        return f"{self.service.name} | {self.date} {self.start_time}-{self.end_time}"
+
+
+class ArchivedBooking(models.Model):
+    """
+    A booking moved out of Booking by bookings.archive (past or cancelled).
+    availability_id is kept as a plain value: the slot may be archived too.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    date = models.DateField(null=True, blank=True)
+    start_time = models.TimeField(null=True, blank=True)
+    end_time = models.TimeField(null=True, blank=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name="+")
+    availability_id = models.BigIntegerField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=Booking.STATUS_CHOICES)
+    notes = models.TextField(blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "date"], name="arch_booking_user_date"),
+            models.Index(fields=["date"], name="arch_booking_date"),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.service.name}"
+
+
+class SlotEvent(models.Model):
+    """
+    Outbox of slot changes for the slot-events feed (bookings.feed): a slot
+    became unbookable (taken) or bookable again (freed) through a booking of
+    its own or of another service at the same time. Written in the transaction of the booking
+    change; the id orders the feed and is the SSE event id. Ids are plain
+    values so that events outlive their service, slot or booking.
+    """
+    TAKEN = "taken"
+    FREED = "freed"
+    KIND_CHOICES = ((TAKEN, "Taken"), (FREED, "Freed"))
+
+    id = models.BigAutoField(primary_key=True)
+    service_id = models.BigIntegerField()
+    date = models.DateField()
+    availability_id = models.BigIntegerField()
+    kind = models.CharField(max_length=5, choices=KIND_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # a stream reads the events of its service (and date) after the last id it sent
+            models.Index(fields=["service_id", "date", "id"], name="slot_event_service_date_id"),
+            models.Index(fields=["created_at"], name="slot_event_created_at"),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.kind} {self.service_id} {self.date} {self.availability_id}"
@@ -0,0 +1,144 @@
+"""
+Per-date occupancy bitmaps: bit m of a date is set when an active booking of
+that date covers minute m (0..1439). They live on the DateLock row of the date,
+so writers get them with the lock, and are kept in step with Booking writes by
+bookings.signals (and BulkBookingSerializer for bulk_create).
+
+A conflict check is one AND against the bitmap. Bookings with sub-minute times
+cannot be represented exactly; such a date is flagged and its checks fall back
+to the IntervalIndex of its bookings.
+"""
+from django.db import transaction
+
+from .intervals import IntervalIndex, _active_ranges_of, _index_by_date, booked_indexes
+from .locks import lock_dates
+from .models import DateLock
+
+MINUTES_PER_DAY = 24 * 60
+BITMAP_BYTES = MINUTES_PER_DAY // 8
+
+
+def _minute(t):
+    return t.hour * 60 + t.minute
+
+
+def is_exact(start, end):
+    """Whether [start, end) is a non-empty range of whole minutes."""
+    return (start.second, start.microsecond, end.second, end.microsecond) == (0, 0, 0, 0) and start < end
+
+
+def minute_mask(start, end):
+    """Bits of the minutes [start, end) touches."""
+    first = _minute(start)
+    last = _minute(end) + (1 if (end.second or end.microsecond) else 0)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+class Occupancy:
+    """
+    Bitmap of one date, same interface as IntervalIndex. `exact` is False once a
+    range that is not whole minutes was added: checks are then unreliable and
+    callers use the IntervalIndex instead (see load_occupancy).
+    """
+
+    def __init__(self, bits=0, exact=True):
+        self.bits = bits
+        self.exact = exact
+
+    @classmethod
+    def from_ranges(cls, ranges):
+        occupancy = cls()
+        for start, end in ranges:
+            occupancy.add(start, end)
+        return occupancy
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(int.from_bytes(row.occupied, "little"), row.occupied_exact)
+
+    def to_row(self, row):
+        row.occupied = self.bits.to_bytes(BITMAP_BYTES, "little")
+        row.occupied_exact = self.exact
+
+    def add(self, start, end):
+        self.bits |= minute_mask(start, end)
+        self.exact = self.exact and is_exact(start, end)
+
+    def overlaps(self, start, end):
+        return bool(self.bits & minute_mask(start, end))
+
+    def free(self, slots, bounds=lambda slot: (slot.start_time, slot.end_time)):
+        """Slots (in their original order) that overlap no booked minute."""
+        bits = self.bits
+        return [slot for slot in slots if not bits & minute_mask(*bounds(slot))]
+
+
+def _checkers(rows, days, fallback):
+    occupancies = {row.date: Occupancy.from_row(row) for row in rows}
+    checkers = {day: occ for day, occ in occupancies.items() if occ.exact}
+    inexact = [day for day in days if day not in checkers]
+    if inexact:
+        indexes = fallback(inexact)
+        checkers.update({day: indexes.get(day) or IntervalIndex() for day in inexact})
+    return checkers
+
+
+def load_occupancy(days):
+    """
+    {date: checker} for each date: its Occupancy, or the IntervalIndex of its
+    bookings when the bitmap is inexact or missing. One query on DateLock,
+    plus one on Booking only for such dates.
+    """
+    days = list(days)
+    return _checkers(DateLock.objects.filter(date__in=days), days, booked_indexes)
+
+
+async def aload_occupancy(days):
+    days = list(days)
+    rows = [row async for row in DateLock.objects.filter(date__in=days)]
+    inexact = [day for day in days if day not in {r.date for r in rows if r.occupied_exact}]
+    indexes = _index_by_date([row async for row in _active_ranges_of(inexact)]) if inexact else {}
+    return _checkers(rows, days, lambda missing: indexes)
+
+
+def checkers_of(locked_rows, days):
+    """load_occupancy() over rows already read by lock_dates()."""
+    return _checkers(locked_rows.values(), list(days), booked_indexes)
+
+
+def record(rows, ranges):
+    """
+    ORs new active (date, start, end) ranges into the locked DateLock rows
+    ({date: row}, from lock_dates) and saves the rows that changed.
+    """
+    changed = {}
+    for day, start, end in ranges:
+        if day not in changed:
+            changed[day] = Occupancy.from_row(rows[day])
+        changed[day].add(start, end)
+
+    for day, occupancy in changed.items():
+        occupancy.to_row(rows[day])
+    # one UPDATE however many dates changed
+    DateLock.objects.bulk_update([rows[day] for day in changed], ["occupied", "occupied_exact"])
+
+
+def rebuild(days):
+    """
+    Recomputes the bitmaps of the given dates from their active bookings, with
+    the dates locked so that no booking is inserted meanwhile.
+    """
+    days = {d for d in days if d is not None}
+    if not days:
+        return
+    with transaction.atomic(savepoint=False):
+        rows = lock_dates(days)
+        ranges = {}
+        for day, start, end in _active_ranges_of(days):
+            if start is not None and end is not None:
+                ranges.setdefault(day, []).append((start, end))
+        for day, row in rows.items():
+            Occupancy.from_ranges(ranges.get(day, ())).to_row(row)
+        DateLock.objects.bulk_update(rows.values(), ["occupied", "occupied_exact"])
@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination
+
+
+class BookingCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the primary key: every page is an indexed
+    `id < cursor ORDER BY id DESC LIMIT n` range, without COUNT or OFFSET,
+    so deep pages cost the same as the first one.
+    """
+    ordering = "-id"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
@@ -0,0 +1,83 @@
+"""
+Password hashing on a bounded pool of threads.
+
+Hashing a password is deliberately slow (PBKDF2_ITERATIONS rounds). Every
+hash of the process runs on PASSWORD_HASH_WORKERS threads: sync callers wait
+for their turn instead of all burning CPU at once, and the async login and
+register views await it without holding the event loop. hashlib releases
+the GIL while it hashes, so the threads run in parallel.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+_executor = None
+_executor_lock = threading.Lock()
+_local = threading.local()
+
+
+def _run_marked(fn, args):
+    _local.in_pool = True
+    return fn(*args)
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "PASSWORD_HASH_WORKERS", 2), thread_name_prefix="password-hash"
+            )
+        return _executor
+
+
+def run(fn, *args):
+    """fn(*args) on the pool, waiting for it (inline when already on the pool)."""
+    if getattr(_local, "in_pool", False):
+        return fn(*args)
+    return executor().submit(_run_marked, fn, args).result()
+
+
+async def arun(fn, *args):
+    return await asyncio.wrap_future(executor().submit(_run_marked, fn, args))
+
+
+async def amake_password(password):
+    return await arun(hashers.make_password, password)
+
+
+async def acheck_password(password, encoded):
+    return await arun(hashers.check_password, password, encoded)
+
+
+async def acheck_user_password(user, password):
+    """
+    user.check_password() for async callers: verifies on the pool and, when the
+    hash is outdated (another PBKDF2_ITERATIONS, another hasher), re-encodes it
+    on the pool and saves it, as check_password()'s setter does.
+    """
+    outdated = []
+    if not await arun(hashers.check_password, password, user.password, outdated.append):
+        return False
+    if outdated:
+        user.password = await amake_password(password)
+        await user.asave(update_fields=["password"])
+    return True
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    Django's PBKDF2 hasher with PBKDF2_ITERATIONS rounds, hashing on the pool.
+    Hashes of another round count still verify, and are re-encoded at the
+    configured count on the user's next login.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, "PBKDF2_ITERATIONS", hashers.PBKDF2PasswordHasher.iterations)
+
+    def encode(self, password, salt, iterations=None):
+        return run(super().encode, password, salt, iterations)
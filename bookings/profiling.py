@@ -0,0 +1,103 @@
+import contextvars
+import heapq
+import time
+from contextlib import contextmanager
+
+from rest_framework import serializers
+
+_current = contextvars.ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    """Timings of one request, filled by ProfilingMiddleware and the hooks below."""
+
+    def __init__(self, worst_sql=3):
+        self.worst_sql = worst_sql
+        self.queries = 0
+        self.db_ms = 0.0
+        self.phases = {}
+        self._depth = {}
+        self._slowest = []  # min-heap of (ms, seq, sql)
+
+    def __call__(self, execute, sql, params, many, context):
+        """connection.execute_wrapper() hook."""
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ms = (time.perf_counter() - t0) * 1000
+            self.queries += 1
+            self.db_ms += ms
+            if self.worst_sql:
+                item = (ms, self.queries, sql[:1000])
+                if len(self._slowest) < self.worst_sql:
+                    heapq.heappush(self._slowest, item)
+                else:
+                    heapq.heappushpop(self._slowest, item)
+
+    def slowest_sql(self):
+        return [{"ms": round(ms, 3), "sql": sql} for ms, _, sql in sorted(self._slowest, reverse=True)]
+
+    @contextmanager
+    def phase(self, name):
+        # nested timers of the same phase (a serializer inside a serializer) count once
+        depth = self._depth.get(name, 0)
+        self._depth[name] = depth + 1
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth[name] = depth
+            if depth == 0:
+                self.phases[name] = self.phases.get(name, 0.0) + (time.perf_counter() - t0) * 1000
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    execute_wrapper() hook of every connection: times the query into the
+    profile of the current request, if any. The profile is found through a
+    context variable, so queries run by sync_to_async() threads of an async
+    request report to it too.
+    """
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile(execute, sql, params, many, context)
+
+
+def hook_connection(connection, **kwargs):
+    """Installs record_query on connection (idempotent); also a connection_created receiver."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def activate(profile):
+    return _current.set(profile)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timer(name):
+    """Adds the enclosed time to phase `name` of the current request, if profiled."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    with profile.phase(name):
+        yield
+
+
+class ProfiledSerializerMixin:
+    """Accounts the time spent producing .data to the "serializer" phase."""
+
+    @property
+    def data(self):
+        with timer("serializer"):
+            return super().data
+
+
+class ProfiledListSerializer(ProfiledSerializerMixin, serializers.ListSerializer):
+    pass
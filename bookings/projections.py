@@ -0,0 +1,166 @@
+"""
+Read-only rendering of ModelSerializers from values() rows.
+
+A Projection is compiled once per serializer class: each readable field becomes
+(output name, values() key, converter), where the converter is the field's own
+to_representation, or nothing when values() already yields exactly what it
+would return (ints, strings, choices, booleans, primary keys). Lists then skip
+model instances and the per-field serializer machinery, with the same output.
+"""
+from functools import cache
+from operator import methodcaller
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import ISO_8601, exceptions, fields, relations, serializers
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .profiling import timer
+
+# to_representation() of these returns the values() value unchanged
+IDENTITY_FIELDS = (fields.IntegerField, fields.CharField, fields.ChoiceField, fields.BooleanField, fields.ReadOnlyField)
+
+
+def _key(name, field):
+    if (
+        isinstance(field, (serializers.BaseSerializer, fields.SerializerMethodField, relations.ManyRelatedField))
+        or field.source == "*"
+    ):
+        raise ImproperlyConfigured(f"Field {name!r} cannot be projected from values().")
+    return "__".join(field.source_attrs)
+
+
+def _converter(field):
+    if isinstance(field, relations.PrimaryKeyRelatedField):
+        return None if field.pk_field is None else field.pk_field.to_representation
+    if isinstance(field, IDENTITY_FIELDS):
+        return None
+    if isinstance(field, (fields.DateField, fields.TimeField)):
+        default = api_settings.DATE_FORMAT if isinstance(field, fields.DateField) else api_settings.TIME_FORMAT
+        output_format = getattr(field, "format", default)
+        if output_format is not None and output_format.lower() == ISO_8601:
+            return methodcaller("isoformat")
+    return field.to_representation
+
+
+class Projection:
+    def __init__(self, serializer_class=None, columns=None):
+        if columns is None:
+            columns = [
+                (name, _key(name, field), _converter(field))
+                for name, field in serializer_class().fields.items()
+                if not field.write_only
+            ]
+        self.columns = columns
+        self.names = [name for name, _, _ in columns]
+        # the primary key is always read: cursor pagination positions on it
+        self.keys = list(dict.fromkeys([*(key for _, key, _ in columns), "id"]))
+
+    def narrow(self, names):
+        """The Projection of the given fields only, reading only their columns."""
+        if names is None:
+            return self
+        return Projection(columns=[column for column in self.columns if column[0] in names])
+
+    def values(self, queryset):
+        return queryset.values(*self.keys)
+
+    def row(self, row):
+        data = {}
+        for name, key, convert in self.columns:
+            value = row[key]
+            data[name] = value if convert is None or value is None else convert(value)
+        return data
+
+    def rows(self, rows):
+        with timer("serializer"):
+            return [self.row(row) for row in rows]
+
+
+@cache
+def projection(serializer_class):
+    return Projection(serializer_class)
+
+
+class Shape:
+    """
+    What a request asks of a list of serializer_class data:
+
+        ?fields=id,start_time,end_time   only these fields (unknown names are a 400)
+        ?compact=1                       columnar: {"columns": [...], "rows": [[...], ...]}
+
+    `projection` reads only the requested columns; `apply()` shapes data that
+    was already rendered with every field (e.g. cached slot lists).
+    """
+
+    def __init__(self, params, serializer_class):
+        full = projection(serializer_class)
+        self.projection = full.narrow(self.requested(params.get("fields"), full.names))
+        self.sparse = self.projection is not full
+        self.compact = params.get("compact", "").lower() in ("1", "true")
+
+    @staticmethod
+    def requested(raw, available):
+        if not raw:
+            return None
+        names = {name.strip() for name in raw.split(",") if name.strip()}
+        unknown = names.difference(available)
+        if unknown:
+            raise exceptions.ValidationError({"fields": f"Unknown field(s): {', '.join(sorted(unknown))}."})
+        return names
+
+    @property
+    def etag_suffix(self):
+        """Tells this representation's ETag from the others' ("" for the full, non-compact one)."""
+        suffix = ""
+        if self.sparse:
+            suffix += "-fields:" + ".".join(self.projection.names)
+        if self.compact:
+            suffix += "-compact"
+        return suffix
+
+    def columnar(self, data):
+        names = self.projection.names
+        return {"columns": names, "rows": [[item[name] for name in names] for item in data]}
+
+    def apply(self, data):
+        if self.compact:
+            return self.columnar(data)
+        if self.sparse:
+            return [{name: item[name] for name in self.projection.names} for item in data]
+        return data
+
+    def render(self, rows):
+        """values() rows of self.projection, shaped."""
+        data = self.projection.rows(rows)
+        return self.columnar(data) if self.compact else data
+
+
+class ProjectedReadMixin:
+    """
+    list and retrieve of a GenericAPIView rendered through the Projection of
+    its serializer: one values() query, no model instances, same body.
+    Both honour ?fields=, list also ?compact=1 (see Shape).
+    """
+
+    def shape(self):
+        return Shape(self.request.query_params, self.get_serializer_class())
+
+    def list(self, request, *args, **kwargs):
+        shape = self.shape()
+        rows = shape.projection.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(shape.render(page))
+        return Response(shape.render(rows))
+
+    def retrieve(self, request, *args, **kwargs):
+        shape = self.shape()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            shape.projection.values(self.filter_queryset(self.get_queryset())),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]},
+        )
+        self.check_object_permissions(request, row)
+        return Response(shape.projection.row(row))
@@ -0,0 +1,99 @@
+import logging
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.urls import resolve
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+TRANSACTION_CONTROL = ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE SAVEPOINT")
+
+
+class QueryCounter:
+    """
+    connection.execute_wrapper() hook counting the statements it lets through.
+    Transaction control is not counted: whether it shows up depends on the
+    backend and on the caller's transaction, not on the view.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(TRANSACTION_CONTROL):
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMixin:
+    """
+    Declares the maximum number of SQL queries of each endpoint of a view,
+    authentication included, keyed by viewset action or by HTTP method:
+
+        query_budgets = {"list": 2, "retrieve": 2}
+
+    Every request is counted; going over budget is logged, and raises
+    QueryBudgetExceeded when QUERY_BUDGET_STRICT is on (tests, development).
+    """
+    query_budgets = {}
+
+    @classmethod
+    def budget_for(cls, key):
+        return cls.query_budgets.get(key)
+
+    def get_query_budget(self):
+        key = getattr(self, "action", None) or self.request.method.lower()
+        return key, self.budget_for(key)
+
+    def dispatch(self, request, *args, **kwargs):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = super().dispatch(request, *args, **kwargs)
+
+        key, budget = self.get_query_budget()
+        if budget is not None and counter.count > budget:
+            message = (
+                f"{type(self).__name__}.{key} ran {counter.count} queries, "
+                f"budget is {budget} ({request.method} {request.path})"
+            )
+            if getattr(settings, "QUERY_BUDGET_STRICT", False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+def declared_budget(method, path):
+    """Budget declared by the view serving `method path` (None if undeclared)."""
+    match = resolve(path.split("?")[0])
+    view = getattr(match.func, "cls", None) or getattr(match.func, "view_class", None)
+    actions = getattr(match.func, "actions", None)
+    key = actions.get(method.lower()) if actions else method.lower()
+    budget_for = getattr(view, "budget_for", None)
+    return budget_for(key) if budget_for else None
+
+
+class QueryBudgetTestMixin:
+    """Assertions for TestCase subclasses."""
+
+    @contextmanager
+    def assertMaxQueries(self, budget):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            yield counter
+        if counter.count > budget:
+            self.fail(f"{counter.count} queries executed, budget is {budget}")
+
+    def assertWithinBudget(self, method, path, **kwargs):
+        """Performs the request and checks it against the budget its view declares."""
+        budget = declared_budget(method, path)
+        if budget is None:
+            self.fail(f"No query budget declared for {method} {path}")
+        with self.assertMaxQueries(budget):
+            response = getattr(self.client, method.lower())(path, **kwargs)
+        return response
@@ -0,0 +1,37 @@
+try:
+    import orjson
+except ImportError:  # optional: without it FastJSONRenderer is DRF's JSONRenderer
+    orjson = None
+
+from rest_framework.renderers import JSONRenderer
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed, producing the
+    same bytes: compact separators, UTF-8 output, U+2028/U+2029 escaped, and
+    dates, times, decimals and lazy strings through DRF's JSONEncoder. Indented
+    output, non-default JSON settings and anything orjson rejects (e.g. ints
+    beyond 64 bits) go through JSONRenderer. The one difference left is the
+    spelling of floats in exponent range (1e-05 vs 0.00001); the API sends
+    none (decimals are strings).
+    """
+
+    OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or not self.compact
+            or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.OPTIONS)
+        except (orjson.JSONEncodeError, TypeError):
+            return super().render(data, accepted_media_type, renderer_context)
+        # as JSONRenderer: valid JSON, but not valid JavaScript unescaped
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
@@ -1,21 +1,32 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from .authentication import BookingRefreshToken
 from .models import Service, Availability, Booking
+from .intervals import IntervalIndex, booked_index
+from .cache import invalidate_slots
+from .feed import record_slot_changes
+from .locks import lock_dates
+from .occupancy import checkers_of, load_occupancy, record
+from .profiling import ProfiledListSerializer, ProfiledSerializerMixin
 from django.contrib.auth.models import User
 
-class ServiceSerializer(serializers.ModelSerializer):
+class ServiceSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Service
         fields = '__all__'
+        list_serializer_class = ProfiledListSerializer
 
 
-class AvailabilitySerializer(serializers.ModelSerializer):
+class AvailabilitySerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Availability
         fields = '__all__'
+        list_serializer_class = ProfiledListSerializer
 
 
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     username = serializers.CharField(source="user.username", read_only=True)
     date = serializers.DateField(read_only=True)
     start_time = serializers.TimeField(read_only=True)
@@ -35,6 +46,7 @@ class BookingSerializer(serializers.ModelSerializer):
             "end_time",
         ]
         read_only_fields = ["user", "status", "username"]
+        list_serializer_class = ProfiledListSerializer
 
     def validate(self, data):
         availability = data.get("availability")
@@ -52,23 +64,19 @@ class BookingSerializer(serializers.ModelSerializer):
         if existing and existing.status in ["PENDING", "CONFIRMED"]:
             raise serializers.ValidationError("This time slot is already booked.")
 
-        # GLOBAL rule: no overlapping bookings regardless of service/user
-        qs = Booking.objects.filter(
-            status__in=["PENDING", "CONFIRMED"],
-            availability__date=availability.date,
-        ).filter(
-            availability__start_time__lt=availability.end_time,
-            availability__end_time__gt=availability.start_time,
-        )
+        self.check_overlap(availability)
 
-        # If update, exclude itself
-        if self.instance:
-            qs = qs.exclude(id=self.instance.id)
+        return data
 
-        if qs.exists():
+    def check_overlap(self, availability, booked=None):
+        # GLOBAL rule: no overlapping bookings regardless of service/user
+        # (if update, exclude itself; the date's bitmap cannot)
+        if self.instance:
+            booked = booked_index(availability.date, exclude_id=self.instance.id)
+        elif booked is None:
+            booked = load_occupancy([availability.date])[availability.date]
+        if booked.overlaps(availability.start_time, availability.end_time):
             raise serializers.ValidationError("This time is already booked.")
-
-        return data
     
     def create(self, validated_data):
         availability = validated_data.get("availability")
@@ -81,13 +89,159 @@ class BookingSerializer(serializers.ModelSerializer):
 
         try:
             with transaction.atomic():
+                # validate() ran unlocked: repeat the overlap check while holding the date
+                if availability:
+                    day = availability.date
+                    self.check_overlap(availability, checkers_of(lock_dates([day]), [day])[day])
                 return super().create(validated_data)
         except IntegrityError:
             raise serializers.ValidationError("This time slot is already booked.")
 
+    def update(self, instance, validated_data):
+        availability = validated_data.get("availability")
+
+        # the conflict queries read the snapshot, keep it in line with the slot
+        if availability:
+            validated_data["date"] = availability.date
+            validated_data["start_time"] = availability.start_time
+            validated_data["end_time"] = availability.end_time
+
+        with transaction.atomic():
+            if availability:
+                lock_dates([availability.date])
+                self.check_overlap(availability)
+            return super().update(instance, validated_data)
+
+
+
+class BulkBookingSerializer(serializers.Serializer):
+    """
+    Books several slots at once. Every affected date's active ranges are read in
+    one query, conflicts are checked against them and within the batch, and the
+    accepted bookings are inserted with one bulk_create in one transaction.
+    """
+    ATOMIC = "atomic"
+    BEST_EFFORT = "best_effort"
+    MAX_ITEMS = 100
+
+    availabilities = serializers.ListField(
+        child=serializers.IntegerField(), min_length=1, max_length=MAX_ITEMS
+    )
+    mode = serializers.ChoiceField(choices=[ATOMIC, BEST_EFFORT], default=ATOMIC)
+    notes = serializers.CharField(required=False, allow_blank=True, default="")
+
+    def plan(self, availability_ids, locked=None):
+        """
+        [(availability_id, Availability or None, error or None)] in request order.
+        `locked` are the DateLock rows of the dates, when the caller holds them.
+        """
+        slots = Availability.objects.in_bulk(availability_ids)
+        taken = set(
+            Booking.objects.filter(availability_id__in=availability_ids)
+            .values_list("availability_id", flat=True)
+        )
+        days = {slot.date for slot in slots.values()}
+        booked = checkers_of(locked, days) if locked is not None else load_occupancy(days)
+        batch = {}
+
+        plan = []
+        for availability_id in availability_ids:
+            slot = slots.get(availability_id)
+            error = None
+            if slot is None or not slot.is_active:
+                error = "Slot not found."
+            elif availability_id in taken:
+                error = "This time slot is already booked."
+            elif slot.date in booked and booked[slot.date].overlaps(slot.start_time, slot.end_time):
+                error = "This time is already booked."
+            elif slot.date in batch and batch[slot.date].overlaps(slot.start_time, slot.end_time):
+                error = "Overlaps another slot of this request."
+            else:
+                batch.setdefault(slot.date, IntervalIndex()).add(slot.start_time, slot.end_time)
+            plan.append((availability_id, slot, error))
+        return plan
+
+    def create(self, validated_data):
+        user = validated_data["user"]
+        mode = validated_data["mode"]
+        availability_ids = validated_data["availabilities"]
+        created = {}
+
+        try:
+            with transaction.atomic():
+                # hold every affected date while checking and inserting
+                locked = lock_dates(
+                    Availability.objects.filter(id__in=availability_ids)
+                    .values_list("date", flat=True).distinct()
+                )
+                plan = self.plan(availability_ids, locked)
+                accepted = [slot for _, slot, error in plan if error is None]
+
+                if mode == self.ATOMIC and len(accepted) != len(plan):
+                    accepted = []
+
+                if accepted:
+                    Booking.objects.bulk_create([
+                        Booking(
+                            user=user,
+                            service_id=slot.service_id,
+                            availability=slot,
+                            notes=validated_data["notes"],
+                            date=slot.date,
+                            start_time=slot.start_time,
+                            end_time=slot.end_time,
+                        )
+                        for slot in accepted
+                    ])
+                    # bulk_create sends no post_save: mark the bitmaps here
+                    record(locked, [(slot.date, slot.start_time, slot.end_time) for slot in accepted])
+                    record_slot_changes([(slot.date, slot.start_time, slot.end_time) for slot in accepted])
+                    # bulk_create does not return primary keys on MySQL
+                    created = {
+                        b.availability_id: b
+                        for b in Booking.objects.filter(availability__in=accepted).select_related("user")
+                    }
+                    invalidate_slots(*{slot.date for slot in accepted})
+        except IntegrityError:
+            # a booking row of another path took one of the slots meanwhile
+            plan = [
+                (availability_id, slot, error or "This time slot is already booked.")
+                for availability_id, slot, error in plan
+            ]
+            created = {}
+
+        results = []
+        for availability_id, slot, error in plan:
+            if availability_id in created:
+                results.append({
+                    "availability": availability_id,
+                    "status": "created",
+                    "booking": BookingSerializer(created[availability_id]).data,
+                })
+            else:
+                results.append({
+                    "availability": availability_id,
+                    "status": "rejected",
+                    "detail": error or "Not created: another slot of this request was rejected.",
+                })
+
+        return {"mode": mode, "created": len(created), "results": results}
+
    
 from django.contrib.auth.models import User
 
+class BulkStatusSerializer(serializers.Serializer):
+    """
+    Bookings to confirm or cancel at once (see bookings.lifecycle): `ids`, or
+    for admins, without ids, every booking matching the list filters.
+    """
+    MAX_ITEMS = 500
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), min_length=1, max_length=MAX_ITEMS, required=False
+    )
+
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=6)
 
@@ -96,13 +250,31 @@ class RegisterSerializer(serializers.ModelSerializer):
         fields = ["username", "password", "first_name", "last_name", "email"]
 
     def validate_email(self, value):
-        if value and User.objects.filter(email__iexact=value).exists():
+        # LOWER(email) = ... is served by the user_email_ci index (migration 0011)
+        if value and User.objects.alias(email_ci=Lower("email")).filter(email_ci=value.lower()).exists():
             raise serializers.ValidationError("Email already in use.")
         return value
 
     def create(self, validated_data):
+        """save(password_hash=...) stores a hash made beforehand (the async view)."""
         password = validated_data.pop("password")
+        encoded = validated_data.pop("password_hash", None)
         user = User(**validated_data)
-        user.set_password(password)
+        if encoded is None:
+            user.set_password(password)
+        else:
+            user.password = encoded
         user.save()
         return user
+
+
+class BookingTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Login access tokens carrying the user's fields, read back when AUTH_TOKEN_CLAIMS is on."""
+
+    token_class = BookingRefreshToken
+
+
+class BookingTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refreshed access tokens carrying the user's current fields, not those of the login."""
+
+    token_class = BookingRefreshToken
@@ -0,0 +1,86 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import occupancy
+from .authentication import invalidate_user
+from .cache import invalidate_catalog, invalidate_slots
+from .feed import record_slot_changes
+from .locks import ensure_date_locks, lock_dates
+from .models import Availability, Booking, Service
+from .slots import BATCH_DAYS, horizon, pregenerate_slots
+
+UNKNOWN = object()
+
+
+@receiver([post_save, post_delete], sender=Service)
+def service_changed(sender, instance, **kwargs):
+    invalidate_catalog()
+
+
+@receiver(post_save, sender=Service)
+def service_created(sender, instance, created, **kwargs):
+    # reads inside the horizon do not generate: give a new service its first
+    # batch of dates now, one bounded insert; the job fills the rest of it
+    if created:
+        transaction.on_commit(lambda: pregenerate_slots([instance.id], horizon()[:BATCH_DAYS]))
+
+
+@receiver([post_save, post_delete], sender=Availability)
+def availability_changed(sender, instance, **kwargs):
+    invalidate_slots(instance.date)
+
+
+@receiver(post_save, sender=Availability)
+def availability_saved(sender, instance, created, **kwargs):
+    # a bookable date gets its lock row before anyone books it
+    if created:
+        ensure_date_locks([instance.date])
+
+
+@receiver([post_save, post_delete], sender=Booking)
+def booking_changed(sender, instance, **kwargs):
+    # the snapshot date survives cancel, which detaches the availability
+    day = instance.date
+    if day is None and instance.availability_id:
+        day = instance.availability.date
+    # moved to another date: the slots of the one it left are freed
+    invalidate_slots(day, getattr(instance, "_loaded_date", None))
+    instance._loaded_date = day
+
+
+@receiver(post_save, sender=Booking)
+def booking_occupancy_saved(sender, instance, created, **kwargs):
+    after = instance.occupied_range()
+    if created:
+        if after is not None:
+            # the common case: OR the new range into the locked row
+            with transaction.atomic(savepoint=False):
+                occupancy.record(lock_dates([after[0]]), [after])
+                record_slot_changes([after])
+    else:
+        before = getattr(instance, "_loaded_occupancy", UNKNOWN)
+        if before != after:
+            # cancelled, moved, or loaded without its times: recompute the dates
+            days = {instance.date}
+            if before not in (None, UNKNOWN):
+                days.add(before[0])
+            occupancy.rebuild(days)
+            # the slots of both ranges; of the whole date when the old one is unknown
+            record_slot_changes([(instance.date, None, None) if before is UNKNOWN else before, after])
+    instance._loaded_occupancy = after
+
+
+@receiver(post_delete, sender=Booking)
+def booking_occupancy_deleted(sender, instance, **kwargs):
+    held = getattr(instance, "_loaded_occupancy", None) or instance.occupied_range()
+    if held is not None:
+        occupancy.rebuild([held[0]])
+        record_slot_changes([held])
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    # saved, deactivated, password changed or deleted: drop the cached auth user
+    invalidate_user(instance.pk)
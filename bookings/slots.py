@@ -0,0 +1,174 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .cache import ainvalidate_slots, invalidate_slots
+from .locks import aensure_date_locks, ensure_date_locks
+from .models import Availability, DateLock
+from .occupancy import aload_occupancy, load_occupancy
+
+SLOT_MINUTES = 30
+WORK_START = time(9, 0)
+WORK_END = time(17, 0)
+# dates per pre-generation insert round
+BATCH_DAYS = 7
+
+
+def day_slot_bounds(target_date):
+    """(start_time, end_time) pairs of the working-day grid for target_date."""
+    start_dt = datetime.combine(target_date, WORK_START)
+    end_dt = datetime.combine(target_date, WORK_END)
+    step = timedelta(minutes=SLOT_MINUTES)
+
+    bounds = []
+    cur = start_dt
+    while cur + step <= end_dt:
+        bounds.append((cur.time(), (cur + step).time()))
+        cur += step
+    return bounds
+
+
+def _existing_slots(service_ids, days):
+    return Availability.objects.filter(service_id__in=service_ids, date__in=days).values_list(
+        "service_id", "date", "start_time", "end_time"
+    )
+
+
+def _missing_slots(service_ids, days, existing):
+    return [
+        Availability(service_id=service_id, date=day, start_time=s, end_time=e, is_active=True)
+        for day in days
+        for (s, e) in day_slot_bounds(day)
+        for service_id in service_ids
+        if (service_id, day, s, e) not in existing
+    ]
+
+
+def _active_slots(service_ids, days):
+    return Availability.objects.filter(
+        service_id__in=list(service_ids),
+        date__in=list(days),
+        is_active=True,
+    ).order_by("start_time")
+
+
+def _add_if_free(free, booked, slot):
+    index = booked.get(slot.date)
+    if index is None or not index.overlaps(slot.start_time, slot.end_time):
+        free[(slot.service_id, slot.date)].append(slot)
+
+
+def ensure_slots(service_ids, days):
+    """
+    Creates the missing grid slots of every (service, date) pair.
+    One read of the existing (start, end) pairs plus one bulk insert,
+    independently of how many slots, services or dates are involved.
+    Concurrent generators are absorbed by the uniq_service_date_time_slot constraint.
+    """
+    service_ids, days = list(service_ids), list(days)
+    to_create = _missing_slots(service_ids, days, set(_existing_slots(service_ids, days)))
+
+    if to_create:
+        Availability.objects.bulk_create(to_create, ignore_conflicts=True)
+        created_days = {slot.date for slot in to_create}
+        ensure_date_locks(created_days)
+        # bulk_create sends no post_save: drop lists cached before the slots existed
+        invalidate_slots(*created_days)
+
+
+async def aensure_slots(service_ids, days):
+    service_ids, days = list(service_ids), list(days)
+    existing = {row async for row in _existing_slots(service_ids, days)}
+    to_create = _missing_slots(service_ids, days, existing)
+
+    if to_create:
+        await Availability.objects.abulk_create(to_create, ignore_conflicts=True)
+        created_days = {slot.date for slot in to_create}
+        await aensure_date_locks(created_days)
+        await ainvalidate_slots(*created_days)
+
+
+def horizon(days=None):
+    """
+    The dates whose slots are pre-generated by `pregenerate_slots`: the next
+    SLOT_HORIZON_DAYS (or `days`) days from today. Reads only write slots of
+    the ones the job has not reached yet.
+    """
+    if days is None:
+        days = getattr(settings, "SLOT_HORIZON_DAYS", 0)
+    today = timezone.localdate()
+    return [today + timedelta(days=i) for i in range(days)]
+
+
+def _split(days):
+    """(future dates beyond the horizon, dates inside it)."""
+    covered = set(horizon())
+    today = timezone.localdate()
+    future = [day for day in days if day >= today]
+    return [day for day in future if day not in covered], [day for day in future if day in covered]
+
+
+def _generated(days):
+    # dates get their lock row with their first slots (ensure_slots)
+    return DateLock.objects.filter(date__in=days).values_list("date", flat=True)
+
+
+def ensure_slots_on_demand(service_ids, days):
+    """
+    ensure_slots() for the read paths: the future dates beyond the horizon,
+    which the pre-generation job does not cover, and the dates inside it that
+    it has not generated yet (no DateLock row). Generated dates stay read-only,
+    and past dates (possibly archived) are never regenerated.
+    """
+    days, covered = _split(days)
+    if covered:
+        generated = set(_generated(covered))
+        days += [day for day in covered if day not in generated]
+    if days:
+        ensure_slots(service_ids, days)
+
+
+async def aensure_slots_on_demand(service_ids, days):
+    days, covered = _split(days)
+    if covered:
+        generated = {day async for day in _generated(covered)}
+        days += [day for day in covered if day not in generated]
+    if days:
+        await aensure_slots(service_ids, days)
+
+
+def pregenerate_slots(service_ids, days, batch_days=BATCH_DAYS):
+    """
+    ensure_slots() over many dates, `batch_days` dates per round so that each
+    insert stays bounded. Idempotent; returns the number of dates processed.
+    """
+    days = sorted(days)
+    for i in range(0, len(days), batch_days):
+        ensure_slots(service_ids, days[i:i + batch_days])
+    return len(days)
+
+
+def free_slots(service_ids, days):
+    """
+    {(service_id, date): [Availability, ...]} of the active slots that overlap
+    no active booking, checked against the dates' occupancy bitmaps. Two queries
+    whatever the number of services and dates (three if a date needs the
+    IntervalIndex fallback).
+    """
+    booked = load_occupancy(days)
+
+    free = defaultdict(list)
+    for slot in _active_slots(service_ids, days):
+        _add_if_free(free, booked, slot)
+    return free
+
+
+async def afree_slots(service_ids, days):
+    booked = await aload_occupancy(days)
+
+    free = defaultdict(list)
+    async for slot in _active_slots(service_ids, days):
+        _add_if_free(free, booked, slot)
+    return free
@@ -1,3 +1,2136 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import os
+import pstats
+import random
+import re
+import sqlite3
+import tempfile
+import threading
+import time as time_module
+from datetime import date, time, timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import user_login_failed
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.http import HttpResponse
+from django.test import AsyncClient, SimpleTestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from django.utils import timezone
+from rest_framework import status
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.routers import APIRootView
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import authentication, export, feed, metrics, passwords, urls
+from .db import pool as db_pool
+from .db.sqlite3.base import DatabaseWrapper as PooledSQLiteWrapper
+from .intervals import IntervalIndex, active_ranges, booked_indexes
+from .locks import ensure_date_locks, lock_dates
+from .middleware import ProfilingMiddleware
+from .projections import Projection
+from .renderers import FastJSONRenderer
+from .models import ArchivedAvailability, ArchivedBooking, DateLock, Service, Availability, Booking, SlotEvent
+from .occupancy import Occupancy, checkers_of, load_occupancy
+from .querybudget import QueryBudgetExceeded, QueryBudgetTestMixin
+from .serializers import AvailabilitySerializer, BookingSerializer, ServiceSerializer
+from .slots import BATCH_DAYS, ensure_slots, horizon
+from .views import MeView
+
+
+class BookingTestCase(APITestCase):
+    """Shared fixtures: one service, a regular user and an admin."""
+
+    day = date(2030, 1, 15)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.service = Service.objects.create(
+            name="Haircut", description="", duration_minutes=30, price="15.00"
+        )
+        cls.user = User.objects.create_user("alice", password="secret123")
+        cls.admin = User.objects.create_superuser("root", password="secret123")
+
+    def setUp(self):
+        cache.clear()
+
+    def slots_url(self, service=None, day=None):
+        service = service or self.service
+        return f"/api/services/{service.id}/available-slots/?date={(day or self.day).isoformat()}"
+
+    def book(self, availability, user=None):
+        return Booking.objects.create(
+            user=user or self.user,
+            service=availability.service,
+            availability=availability,
+            date=availability.date,
+            start_time=availability.start_time,
+            end_time=availability.end_time,
+        )
+
+
+class AvailableSlotsTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries), response
+
+    def test_generates_full_grid(self):
+        response = self.client.get(self.slots_url())
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 16)
+        self.assertEqual(Availability.objects.filter(service=self.service, date=self.day).count(), 16)
+
+    def test_generation_is_idempotent(self):
+        self.client.get(self.slots_url())
+        self.client.get(self.slots_url())
+
+        self.assertEqual(Availability.objects.filter(service=self.service, date=self.day).count(), 16)
+
+    def test_fills_only_missing_slots(self):
+        Availability.objects.create(
+            service=self.service, date=self.day, start_time=time(9, 0), end_time=time(9, 30)
+        )
+
+        self.client.get(self.slots_url())
+
+        self.assertEqual(Availability.objects.filter(service=self.service, date=self.day).count(), 16)
+
+    def test_query_count_does_not_depend_on_slot_count(self):
+        counts = []
+        for i, minutes in enumerate([60, 30, 15, 5]):
+            with mock.patch("bookings.slots.SLOT_MINUTES", minutes):
+                n, response = self.count_queries(self.slots_url(day=date(2030, 2, 1 + i)))
+            self.assertEqual(len(response.data), 8 * 60 // minutes)
+            counts.append(n)
+
+        self.assertEqual(len(set(counts)), 1, counts)
+
+    def test_query_count_once_generated(self):
+        first, _ = self.count_queries(self.slots_url())
+        cache.clear()
+        second, _ = self.count_queries(self.slots_url())
+
+        # The second call skips the slot and date-lock inserts.
+        self.assertEqual(second, first - 2)
+
+    def test_booked_slot_is_hidden(self):
+        self.client.get(self.slots_url())
+        slot = Availability.objects.get(service=self.service, date=self.day, start_time=time(10, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book(slot)
+
+        response = self.client.get(self.slots_url())
+
+        self.assertEqual(len(response.data), 15)
+        self.assertNotIn(slot.id, [s["id"] for s in response.data])
+
+
+@override_settings(SLOT_HORIZON_DAYS=3)
+class SlotHorizonTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+        self.tomorrow = timezone.localdate() + timedelta(days=1)
+
+    def test_command_fills_the_horizon_idempotently(self):
+        out = io.StringIO()
+        call_command("pregenerate_slots", "--batch-days", "2", stdout=out)
+        call_command("pregenerate_slots", stdout=out)
+
+        self.assertIn("1 service(s) over 3 date(s)", out.getvalue())
+        self.assertEqual(Availability.objects.filter(service=self.service).count(), 3 * 16)
+        self.assertTrue(DateLock.objects.filter(date=self.tomorrow).exists())
+
+    def test_reads_inside_the_horizon_do_not_write(self):
+        call_command("pregenerate_slots", stdout=io.StringIO())
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.slots_url(day=self.tomorrow))
+
+        self.assertEqual(len(response.data), 16)
+        self.assertFalse([q for q in ctx.captured_queries if not q["sql"].startswith("SELECT")])
+
+    def test_dates_outside_the_horizon_are_generated_on_demand(self):
+        later = timezone.localdate() + timedelta(days=10)
+
+        self.assertEqual(len(self.client.get(self.slots_url(day=later)).data), 16)
+
+    def test_dates_the_job_has_not_reached_are_generated_on_read(self):
+        response = self.client.get(self.slots_url(day=self.tomorrow))
+
+        self.assertEqual(len(response.data), 16)
+        self.assertTrue(DateLock.objects.filter(date=self.tomorrow).exists())
+
+    def test_new_service_gets_its_horizon(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            service = Service.objects.create(name="Shave", description="", duration_minutes=30, price="5.00")
+
+        self.assertEqual(Availability.objects.filter(service=service).count(), 3 * 16)
+
+    @override_settings(SLOT_HORIZON_DAYS=60)
+    def test_new_service_generates_one_batch_on_commit(self):
+        self.client.force_authenticate(self.admin)
+
+        with self.assertNumQueries(4), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/services/", {"name": "Shave", "description": "-", "duration_minutes": 30, "price": "5.00"}, format="json"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        dates = Availability.objects.filter(service_id=response.data["id"]).values_list("date", flat=True).distinct()
+        self.assertEqual(sorted(dates), horizon()[:BATCH_DAYS])
+
+    def test_pregeneration_invalidates_cached_reads(self):
+        # the date is generated, for another service: reads of this one stay read-only
+        other = Service.objects.create(name="Shave", description="", duration_minutes=30, price="5.00")
+        ensure_slots([other.id], [self.tomorrow])
+        response = self.client.get(self.slots_url(day=self.tomorrow))
+        self.assertEqual(response.data, [])
+        etag = response["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("pregenerate_slots", stdout=io.StringIO())
+
+        response = self.client.get(self.slots_url(day=self.tomorrow), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 16)
+
+
+class IntervalIndexTests(SimpleTestCase):
+    @staticmethod
+    def brute(ranges, start, end):
+        return sum(1 for (s, e) in ranges if s < end and e > start)
+
+    def test_matches_linear_scan(self):
+        rng = random.Random(7)
+        ranges = []
+        for _ in range(200):
+            s = rng.randrange(0, 1400)
+            ranges.append((s, s + rng.randrange(1, 40)))
+        index = IntervalIndex(ranges)
+
+        for _ in range(500):
+            s = rng.randrange(0, 1440)
+            e = s + rng.randrange(1, 60)
+            self.assertEqual(index.count_overlaps(s, e), self.brute(ranges, s, e))
+
+    def test_touching_ranges_do_not_overlap(self):
+        index = IntervalIndex([(time(10, 0), time(10, 30))])
+
+        self.assertFalse(index.overlaps(time(9, 30), time(10, 0)))
+        self.assertFalse(index.overlaps(time(10, 30), time(11, 0)))
+        self.assertTrue(index.overlaps(time(10, 15), time(10, 45)))
+
+    def test_empty_index(self):
+        self.assertFalse(IntervalIndex().overlaps(time(0, 0), time(23, 59)))
+
+
+class OccupancyBitmapTests(SimpleTestCase):
+    def test_matches_interval_index(self):
+        rng = random.Random(11)
+        ranges = []
+        for _ in range(60):
+            s = rng.randrange(0, 1400)
+            ranges.append((time(s // 60, s % 60), time((s + 30) // 60, (s + 30) % 60)))
+        bitmap, index = Occupancy.from_ranges(ranges), IntervalIndex(ranges)
+
+        for _ in range(500):
+            s = rng.randrange(0, 1380)
+            e = s + rng.randrange(1, 60)
+            start, end = time(s // 60, s % 60), time(e // 60, e % 60)
+            self.assertEqual(bitmap.overlaps(start, end), index.overlaps(start, end))
+
+    def test_touching_ranges_do_not_overlap(self):
+        bitmap = Occupancy.from_ranges([(time(10, 0), time(10, 30))])
+
+        self.assertFalse(bitmap.overlaps(time(9, 30), time(10, 0)))
+        self.assertFalse(bitmap.overlaps(time(10, 30), time(11, 0)))
+        self.assertTrue(bitmap.overlaps(time(10, 29), time(10, 31)))
+
+    def test_sub_minute_ranges_are_inexact(self):
+        bitmap = Occupancy.from_ranges([(time(10, 0), time(10, 0, 30))])
+
+        self.assertFalse(bitmap.exact)
+        self.assertTrue(bitmap.overlaps(time(10, 0), time(10, 1)))
+
+
+class OccupancyTests(BookingTestCase):
+    def slot(self, start, end, day=None):
+        return Availability.objects.create(service=self.service, date=day or self.day, start_time=start, end_time=end)
+
+    def occupied(self, day=None):
+        return Occupancy.from_row(DateLock.objects.get(date=day or self.day))
+
+    def test_follows_create_cancel_and_delete(self):
+        booking = self.book(self.slot(time(10, 0), time(10, 30)))
+        self.assertTrue(self.occupied().overlaps(time(10, 15), time(10, 16)))
+
+        booking.status = "CONFIRMED"
+        with self.assertNumQueries(1):
+            booking.save(update_fields=["status"])
+        self.assertTrue(self.occupied().overlaps(time(10, 15), time(10, 16)))
+
+        booking.status = "CANCELLED"
+        booking.save(update_fields=["status"])
+        self.assertEqual(self.occupied().bits, 0)
+
+        self.book(self.slot(time(11, 0), time(11, 30))).delete()
+        self.assertEqual(self.occupied().bits, 0)
+
+    def test_move_clears_the_old_date(self):
+        booking = self.book(self.slot(time(10, 0), time(10, 30)))
+        other_day = self.day + timedelta(days=1)
+        self.client.force_authenticate(self.user)
+
+        response = self.client.patch(
+            f"/api/bookings/{booking.id}/", {"availability": self.slot(time(9, 0), time(9, 30), other_day).id}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.occupied().bits, 0)
+        self.assertTrue(self.occupied(other_day).overlaps(time(9, 0), time(9, 30)))
+
+    def test_bulk_create_marks_the_dates(self):
+        slots = [self.slot(time(9, 0), time(9, 30)), self.slot(time(9, 0), time(9, 30), self.day + timedelta(days=1))]
+        self.client.force_authenticate(self.user)
+
+        response = self.client.post("/api/bookings/bulk/", {"availabilities": [s.id for s in slots]}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        for slot in slots:
+            self.assertTrue(self.occupied(slot.date).overlaps(time(9, 0), time(9, 30)))
+
+    def test_inexact_date_falls_back_to_bookings(self):
+        self.book(self.slot(time(10, 0), time(10, 0, 30)))
+
+        checker = load_occupancy([self.day])[self.day]
+
+        self.assertIsInstance(checker, IntervalIndex)
+        self.assertFalse(checker.overlaps(time(10, 0, 30), time(10, 30)))
+
+    def test_rebuild_command(self):
+        self.book(self.slot(time(10, 0), time(10, 30)))
+        DateLock.objects.update(occupied=bytes(180), occupied_exact=False)
+
+        out = io.StringIO()
+        call_command("rebuild_occupancy", "--from", self.day.isoformat(), stdout=out)
+
+        self.assertIn("1 date(s)", out.getvalue())
+
+        occupancy = self.occupied()
+        self.assertTrue(occupancy.exact)
+        self.assertTrue(occupancy.overlaps(time(10, 0), time(10, 30)))
+
+
+class BookingOverlapTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+        self.other = Service.objects.create(
+            name="Massage", description="", duration_minutes=60, price="40.00"
+        )
+
+    def slot(self, service, start, end):
+        return Availability.objects.create(service=service, date=self.day, start_time=start, end_time=end)
+
+    def test_overlap_across_services_is_rejected(self):
+        self.book(self.slot(self.service, time(10, 0), time(10, 30)))
+        long_slot = self.slot(self.other, time(9, 45), time(10, 45))
+
+        response = self.client.post(
+            "/api/bookings/", {"service": self.other.id, "availability": long_slot.id}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_conflict_queries_do_not_join(self):
+        self.assertNotIn("JOIN", str(active_ranges(self.day).query))
+
+        with CaptureQueriesContext(connection) as ctx:
+            booked_indexes([self.day, date(2030, 1, 16)])
+        self.assertNotIn("JOIN", ctx.captured_queries[0]["sql"])
+
+    def test_update_moves_the_snapshot(self):
+        booking = self.book(self.slot(self.service, time(10, 0), time(10, 30)))
+        later = self.slot(self.service, time(14, 0), time(14, 30))
+
+        response = self.client.patch(f"/api/bookings/{booking.id}/", {"availability": later.id}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["start_time"], "14:00:00")
+        self.assertEqual(list(active_ranges(self.day)), [(time(14, 0), time(14, 30))])
+
+    def test_adjacent_slot_is_accepted(self):
+        self.book(self.slot(self.service, time(10, 0), time(10, 30)))
+        next_slot = self.slot(self.other, time(10, 30), time(11, 30))
+
+        response = self.client.post(
+            "/api/bookings/", {"service": self.other.id, "availability": next_slot.id}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["start_time"], "10:30:00")
+
+
+class AvailableSlotsCacheTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def slot_ids(self, **kwargs):
+        return [s["id"] for s in self.client.get(self.slots_url(**kwargs)).data]
+
+    def test_repeat_request_is_served_from_cache(self):
+        self.client.get(self.slots_url())
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.slots_url())
+
+        self.assertEqual(len(response.data), 16)
+        self.assertEqual(len(ctx.captured_queries), 1)  # the service lookup
+        self.assertEqual(metrics.snapshot()["slots_cache_hits"], 1)
+        self.assertEqual(metrics.snapshot()["slots_cache_misses"], 1)
+
+    def test_booking_invalidates_the_date_for_every_service(self):
+        other = Service.objects.create(name="Massage", description="", duration_minutes=30, price="1.00")
+        self.slot_ids()
+        self.slot_ids(service=other)
+        slot = Availability.objects.get(service=self.service, date=self.day, start_time=time(9, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/bookings/", {"service": self.service.id, "availability": slot.id}, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertNotIn(slot.id, self.slot_ids())
+        self.assertEqual(len(self.slot_ids(service=other)), 15)
+
+    def test_other_dates_stay_cached(self):
+        self.slot_ids(day=date(2030, 1, 16))
+        self.slot_ids()
+        slot = Availability.objects.get(service=self.service, date=self.day, start_time=time(9, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book(slot)
+
+        self.slot_ids(day=date(2030, 1, 16))
+        self.assertEqual(metrics.snapshot()["slots_cache_hits"], 1)
+
+    def test_cancel_frees_the_cached_slot(self):
+        self.slot_ids()
+        slot = Availability.objects.get(service=self.service, date=self.day, start_time=time(9, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = self.book(slot)
+        self.assertNotIn(slot.id, self.slot_ids())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f"/api/bookings/{booking.id}/cancel/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertIn(slot.id, self.slot_ids())
+
+    def test_move_to_another_date_frees_the_old_one(self):
+        next_day = self.day + timedelta(days=1)
+        self.slot_ids()
+        slot = Availability.objects.get(service=self.service, date=self.day, start_time=time(9, 0))
+        self.slot_ids(day=next_day)
+        target = Availability.objects.get(service=self.service, date=next_day, start_time=time(9, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = self.book(slot)
+        self.assertEqual(len(self.slot_ids()), 15)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f"/api/bookings/{booking.id}/", {"availability": target.id}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertIn(slot.id, self.slot_ids())
+        self.assertEqual(len(self.slot_ids()), 16)
+        self.assertNotIn(target.id, self.slot_ids(day=next_day))
+
+    def test_availability_write_invalidates(self):
+        self.slot_ids()
+        slot = Availability.objects.get(service=self.service, date=self.day, start_time=time(9, 0))
+
+        slot.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            slot.save()
+
+        self.assertNotIn(slot.id, self.slot_ids())
+
+    def test_metrics_endpoint(self):
+        self.slot_ids()
+        self.slot_ids()
+        self.client.force_authenticate(self.admin)
+
+        response = self.client.get("/api/metrics/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b"booking_slots_cache_hits 1", response.content)
+        self.assertIn(b"booking_slots_cache_misses 1", response.content)
+
+
+class AvailabilityCalendarTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+        self.other = Service.objects.create(name="Massage", description="", duration_minutes=30, price="1.00")
+
+    def calendar(self, first, last, services=None):
+        services = services or [self.service, self.other]
+        ids = ",".join(str(s.id) for s in services)
+        return self.client.get(f"/api/availability-calendar/?services={ids}&from={first}&to={last}")
+
+    def test_matrix_matches_available_slots(self):
+        booked = Availability.objects.create(
+            service=self.other, date=self.day, start_time=time(9, 0), end_time=time(10, 0)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book(booked)
+
+        response = self.calendar("2030-01-15", "2030-01-17")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([s["id"] for s in response.data["services"]], [self.service.id, self.other.id])
+        days = response.data["services"][0]["days"]
+        self.assertEqual(list(days), ["2030-01-15", "2030-01-16", "2030-01-17"])
+        self.assertEqual(len(days["2030-01-15"]), 14)  # 09:00-10:00 taken on another service
+        self.assertEqual(len(days["2030-01-16"]), 16)
+
+        cache.clear()
+        single = self.client.get(self.slots_url())
+        self.assertEqual(single.data, days["2030-01-15"])
+
+    def test_query_count_does_not_depend_on_range(self):
+        # slots already generated, cold cache
+        self.calendar("2030-03-01", "2030-03-14")
+        cache.clear()
+
+        counts = []
+        for last in ["2030-03-01", "2030-03-07", "2030-03-14"]:
+            cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.calendar("2030-03-01", last)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            counts.append(len(ctx.captured_queries))
+
+        self.assertEqual(len(set(counts)), 1, counts)
+
+    def test_warm_cache_needs_only_the_service_query(self):
+        self.calendar("2030-03-01", "2030-03-07")
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.calendar("2030-03-01", "2030-03-07")
+
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_invalid_ranges(self):
+        self.assertEqual(self.calendar("2030-03-07", "2030-03-01").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.calendar("2030-03-01", "2030-06-01").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.calendar("bad", "2030-03-01").status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BulkBookingTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+        self.slots = [
+            Availability.objects.create(service=self.service, date=self.day, start_time=time(h, 0), end_time=time(h, 30))
+            for h in range(9, 14)
+        ]
+
+    def bulk(self, ids, mode="atomic"):
+        return self.client.post("/api/bookings/bulk/", {"availabilities": ids, "mode": mode}, format="json")
+
+    def test_creates_all_in_constant_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.bulk([s.id for s in self.slots[:2]])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        few = len(ctx.captured_queries)
+
+        other_day = [
+            Availability.objects.create(service=self.service, date=date(2030, 1, 16 + i % 3), start_time=time(9 + i // 3, 0), end_time=time(9 + i // 3, 30))
+            for i in range(9)
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.bulk([s.id for s in other_day])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(len(ctx.captured_queries), few)
+        self.assertEqual(Booking.objects.filter(user=self.user).count(), 11)
+        self.assertEqual(response.data["results"][0]["booking"]["username"], "alice")
+
+    def test_atomic_mode_creates_nothing_on_conflict(self):
+        self.book(self.slots[1], user=self.admin)
+
+        response = self.bulk([self.slots[0].id, self.slots[1].id])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([r["status"] for r in response.data["results"]], ["rejected", "rejected"])
+        self.assertFalse(Booking.objects.filter(user=self.user).exists())
+
+    def test_best_effort_reports_each_item(self):
+        overlapping = Availability.objects.create(
+            service=self.service, date=self.day, start_time=time(9, 15), end_time=time(9, 45)
+        )
+        self.book(self.slots[2], user=self.admin)
+
+        response = self.bulk([self.slots[0].id, overlapping.id, self.slots[2].id, 999999, self.slots[3].id], mode="best_effort")
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(
+            [r["status"] for r in response.data["results"]],
+            ["created", "rejected", "rejected", "rejected", "created"],
+        )
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(
+            set(Booking.objects.filter(user=self.user).values_list("availability_id", flat=True)),
+            {self.slots[0].id, self.slots[3].id},
+        )
+
+    def test_bulk_invalidates_cached_slots(self):
+        self.client.get(self.slots_url())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bulk([self.slots[0].id])
+
+        ids = [s["id"] for s in self.client.get(self.slots_url()).data]
+        self.assertNotIn(self.slots[0].id, ids)
+
+
+@override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+class BulkStatusTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+        self.bookings = [
+            self.book(Availability.objects.create(
+                service=self.service, date=self.day, start_time=time(h, 0), end_time=time(h, 30)
+            ))
+            for h in range(9, 13)
+        ]
+        self.ids = [b.id for b in self.bookings]
+
+    def post(self, action, data=None, query=""):
+        return self.client.post(f"/api/bookings/{action}/{query}", data or {}, format="json")
+
+    def test_confirm_reports_each_booking(self):
+        Booking.objects.filter(id=self.ids[1]).update(status="CANCELLED", availability=None)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post("bulk-confirm", {"ids": self.ids + [999999]})
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data["confirmed"], 3)
+        self.assertEqual(
+            [(r["id"], r["status"], r.get("detail")) for r in response.data["results"]],
+            [
+                (self.ids[0], "confirmed", None),
+                (self.ids[1], "rejected", "Cannot confirm a cancelled booking."),
+                (self.ids[2], "confirmed", None),
+                (self.ids[3], "confirmed", None),
+                (999999, "rejected", "Booking not found."),
+            ],
+        )
+        self.assertEqual(
+            list(Booking.objects.order_by("id").values_list("status", flat=True)),
+            ["CONFIRMED", "CANCELLED", "CONFIRMED", "CONFIRMED"],
+        )
+        self.assertEqual(sum(q["sql"].startswith("UPDATE") for q in ctx.captured_queries), 1)
+
+    def test_cancel_frees_the_slots(self):
+        self.client.get(self.slots_url())
+        past = self.book(Availability.objects.create(
+            service=self.service, date=date(2020, 1, 1), start_time=time(9, 0), end_time=time(9, 30)
+        ))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post("bulk-cancel", {"ids": [self.ids[0], self.ids[2], past.id]})
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data["cancelled"], 2)
+        self.assertEqual(response.data["results"][2]["detail"], "You cannot cancel a past booking.")
+        cancelled = Booking.objects.filter(id__in=[self.ids[0], self.ids[2]])
+        self.assertEqual({(b.status, b.availability_id) for b in cancelled}, {("CANCELLED", None)})
+        self.assertEqual(Booking.objects.get(id=past.id).status, "PENDING")
+
+        # bitmaps and cached slot lists follow, as after single cancels
+        slots = {s["start_time"] for s in self.client.get(self.slots_url()).data}
+        self.assertLessEqual({"09:00:00", "11:00:00"}, slots)
+        self.assertFalse({"10:00:00", "12:00:00"} & slots)
+        self.assertFalse(load_occupancy([self.day])[self.day].overlaps(time(9, 0), time(9, 30)))
+        self.assertTrue(load_occupancy([self.day])[self.day].overlaps(time(10, 0), time(10, 30)))
+
+        response = self.post("bulk-cancel", {"ids": [self.ids[0]]})
+        self.assertEqual(response.data["results"][0]["detail"], "Already cancelled.")
+
+    def test_filters_select_the_bookings(self):
+        other = Availability.objects.create(service=self.service, date=self.day + timedelta(days=1), start_time=time(9, 0), end_time=time(9, 30))
+        self.book(other)
+
+        response = self.post("bulk-confirm", query=f"?date={self.day}&status=PENDING")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(r["id"] for r in response.data["results"]), self.ids)
+        self.assertEqual(Booking.objects.get(availability=other).status, "PENDING")
+
+        # without ids or filters nothing is selected
+        self.assertEqual(self.post("bulk-confirm").status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_users_cancel_only_their_own(self):
+        mine = self.ids[0]
+        theirs = self.book(Availability.objects.create(
+            service=self.service, date=self.day, start_time=time(15, 0), end_time=time(15, 30)
+        ), user=self.admin)
+        self.client.force_authenticate(self.user)
+
+        response = self.post("bulk-cancel", {"ids": [mine, theirs.id]})
+        self.assertEqual([r["status"] for r in response.data["results"]], ["cancelled", "rejected"])
+        self.assertEqual(Booking.objects.get(id=theirs.id).status, "PENDING")
+
+        self.assertEqual(self.post("bulk-cancel", query=f"?date={self.day}").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.post("bulk-confirm", {"ids": [mine]}).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_admin_actions(self):
+        self.client.force_login(self.admin)
+        Booking.objects.filter(id=self.ids[3]).update(status="CANCELLED", availability=None)
+
+        response = self.client.post(
+            "/admin/bookings/booking/",
+            {"action": "confirm_selected", "_selected_action": self.ids[2:]},
+            follow=True,
+        )
+        messages = [str(m) for m in response.context["messages"]]
+        self.assertIn("Confirmed 1 booking(s).", messages)
+        self.assertTrue(any("Cannot confirm a cancelled booking." in m for m in messages))
+
+        self.client.post("/admin/bookings/booking/", {"action": "cancel_selected", "_selected_action": self.ids[:2]})
+        self.assertEqual(
+            list(Booking.objects.order_by("id").values_list("status", flat=True)),
+            ["CANCELLED", "CANCELLED", "CONFIRMED", "CANCELLED"],
+        )
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class DateLockConcurrencyTests(TransactionTestCase):
+    """Needs a database with row locks (MySQL in production); skipped on SQLite."""
+
+    day = date(2030, 1, 15)
+
+    def setUp(self):
+        self.user = User.objects.create_user("alice", password="secret123")
+        self.services = [
+            Service.objects.create(name=f"S{i}", description="", duration_minutes=30, price="1.00")
+            for i in range(2)
+        ]
+
+    def run_threads(self, *targets):
+        errors = []
+
+        def wrap(target):
+            try:
+                target()
+            except Exception as exc:  # surfaced by the assertion below
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=wrap, args=(t,)) for t in targets]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=30)
+        self.assertEqual(errors, [])
+
+    def test_overlapping_bookings_on_different_services(self):
+        slots = [
+            Availability.objects.create(service=self.services[0], date=self.day, start_time=time(10, 0), end_time=time(11, 0)),
+            Availability.objects.create(service=self.services[1], date=self.day, start_time=time(10, 30), end_time=time(11, 30)),
+        ]
+        validated = threading.Barrier(len(slots))
+        outcomes = []
+
+        def book(slot):
+            def run():
+                serializer = BookingSerializer(data={"service": slot.service_id, "availability": slot.id})
+                serializer.is_valid(raise_exception=True)
+                validated.wait()  # both passed the unlocked check
+                try:
+                    serializer.save(user=self.user)
+                    outcomes.append("created")
+                except ValidationError:
+                    outcomes.append("rejected")
+            return run
+
+        self.run_threads(*(book(slot) for slot in slots))
+
+        self.assertEqual(sorted(outcomes), ["created", "rejected"])
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_other_dates_are_not_blocked(self):
+        other_day = date(2030, 1, 16)
+        ensure_date_locks([self.day, other_day])
+        holding = threading.Event()
+        release = threading.Event()
+        order = []
+
+        def hold_first_day():
+            with transaction.atomic():
+                lock_dates([self.day])
+                holding.set()
+                release.wait(10)
+                order.append("first")
+
+        def lock_other_day():
+            holding.wait(10)
+            with transaction.atomic():
+                lock_dates([other_day])
+                order.append("other")
+            release.set()
+
+        self.run_threads(hold_first_day, lock_other_day)
+
+        self.assertEqual(order, ["other", "first"])
+
+
+class DateLockOrderTests(BookingTestCase):
+    """
+    What DateLockConcurrencyTests proves with threads, checked on any database:
+    the overlap check of create and update runs after lock_dates, in its
+    transaction, and create checks against the locked rows.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.slots = [
+            Availability.objects.create(service=self.service, date=self.day, start_time=time(h, 0), end_time=time(h, 30))
+            for h in (9, 10)
+        ]
+
+    def trace(self):
+        """Patches lock_dates, checkers_of and check_overlap to log their calls, with the atomic depth."""
+        calls = []
+
+        def depth():
+            return len(connection.atomic_blocks)
+
+        def lock(days):
+            rows = lock_dates(days)
+            calls.append(("lock", sorted(set(days)), depth(), rows))
+            return rows
+
+        def checkers(rows, days):
+            result = checkers_of(rows, days)
+            calls.append(("checkers", rows, result))
+            return result
+
+        def check(serializer, availability, booked=None):
+            calls.append(("check", availability.date, depth(), booked))
+            return original_check(serializer, availability, booked)
+
+        original_check = BookingSerializer.check_overlap
+        for patcher in [
+            mock.patch("bookings.serializers.lock_dates", side_effect=lock),
+            mock.patch("bookings.serializers.checkers_of", side_effect=checkers),
+            mock.patch.object(BookingSerializer, "check_overlap", autospec=True, side_effect=check),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return calls
+
+    def test_create_checks_under_the_lock(self):
+        serializer = BookingSerializer(data={"service": self.service.id, "availability": self.slots[0].id})
+        serializer.is_valid(raise_exception=True)
+        calls = self.trace()
+        outside = len(connection.atomic_blocks)
+
+        serializer.save(user=self.user)
+
+        (_, days, lock_depth, rows), (_, checked_rows, checkers), (_, day, check_depth, booked) = calls
+        self.assertEqual(days, [self.day])
+        self.assertGreater(lock_depth, outside)
+        self.assertEqual(check_depth, lock_depth)
+        self.assertIs(checked_rows, rows)
+        self.assertIs(booked, checkers[self.day])
+
+    def test_update_checks_under_the_lock(self):
+        booking = self.book(self.slots[0])
+        serializer = BookingSerializer(booking, data={"availability": self.slots[1].id}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        calls = self.trace()
+        outside = len(connection.atomic_blocks)
+
+        serializer.save()
+
+        (kind, days, lock_depth, _), (next_kind, day, check_depth, _) = calls
+        self.assertEqual((kind, next_kind), ("lock", "check"))
+        self.assertEqual(days, [self.day])
+        self.assertGreater(lock_depth, outside)
+        self.assertEqual(check_depth, lock_depth)
+
+
+class BookingPaginationTests(BookingTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.bob = User.objects.create_user("bob", password="secret123")
+        for i in range(7):
+            Booking.objects.create(
+                user=cls.user if i % 2 else cls.bob,
+                service=cls.service,
+                status="CONFIRMED" if i < 4 else "PENDING",
+                date=date(2030, 1, 1 + i),
+            )
+
+    def walk(self, url):
+        ids, pages = [], 0
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            for q in ctx.captured_queries:
+                self.assertNotIn("OFFSET", q["sql"].upper())
+                self.assertNotIn("COUNT(", q["sql"].upper())
+            ids += [b["id"] for b in response.data["results"]]
+            url = response.data["next"]
+            pages += 1
+        return ids, pages
+
+    def test_admin_pages_through_everything(self):
+        self.client.force_authenticate(self.admin)
+
+        ids, pages = self.walk("/api/bookings/?page_size=3")
+
+        self.assertEqual(ids, sorted(Booking.objects.values_list("id", flat=True), reverse=True))
+        self.assertEqual(pages, 3)
+
+    def test_filters_survive_paging(self):
+        self.client.force_authenticate(self.admin)
+
+        ids, _ = self.walk("/api/bookings/?page_size=1&status=CONFIRMED&username=bo")
+
+        expected = Booking.objects.filter(status="CONFIRMED", user=self.bob).order_by("-id")
+        self.assertEqual(ids, list(expected.values_list("id", flat=True)))
+
+    def test_my_bookings_is_paginated(self):
+        self.client.force_authenticate(self.user)
+
+        ids, pages = self.walk("/api/my-bookings/?page_size=2")
+
+        self.assertEqual(ids, list(Booking.objects.filter(user=self.user).order_by("-id").values_list("id", flat=True)))
+        self.assertEqual(pages, 2)
+
+
+class BookingExportTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+        self.bookings = [
+            self.book(Availability.objects.create(service=self.service, date=self.day, start_time=time(9 + i, 0), end_time=time(9 + i, 30)))
+            for i in range(5)
+        ]
+
+    def stream(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_honors_the_list_filters(self):
+        self.bookings[0].status = "CONFIRMED"
+        self.bookings[0].save(update_fields=["status"])
+
+        lines = self.stream("/api/bookings/export/?status=CONFIRMED&username=ali").splitlines()
+
+        self.assertEqual(lines[0], "id,username,service,availability,status,date,start_time,end_time,notes")
+        self.assertEqual(lines[1:], [
+            f"{self.bookings[0].id},alice,{self.service.id},{self.bookings[0].availability_id},CONFIRMED,2030-01-15,09:00:00,09:30:00,"
+        ])
+
+    def test_csv_cells_never_start_a_formula(self):
+        for notes in ["=HYPERLINK(\"http://x\")", "+1", "-1", "@SUM(A1)", "\tx", "\rx"]:
+            with self.subTest(notes=notes):
+                Booking.objects.filter(pk=self.bookings[0].pk).update(notes=notes)
+                row = list(csv.reader(export.csv_lines(Booking.objects.filter(pk=self.bookings[0].pk))))[1]
+
+                self.assertEqual(row[-1], "'" + notes)
+
+        Booking.objects.filter(pk=self.bookings[0].pk).update(notes="Bring a towel")
+        self.assertTrue(self.stream("/api/bookings/export/").endswith(",Bring a towel\r\n"))
+
+    def test_ndjson_reads_in_keyset_chunks(self):
+        with self.assertNumQueries(3):
+            lines = list(export.ndjson_lines(Booking.objects.all(), chunk_size=2))
+
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([r["id"] for r in rows], [b.id for b in reversed(self.bookings)])
+        self.assertEqual(rows[0]["start_time"], "13:00:00")
+
+        content = self.stream("/api/bookings/export/?output=ndjson")
+        self.assertEqual(content, "".join(lines))
+
+    def test_admin_only_and_known_outputs(self):
+        self.assertEqual(self.client.get("/api/bookings/export/?output=xml").status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get("/api/bookings/export/").status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ReadProjectionTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+        Service.objects.create(name="Bärbershop \u2028", description="ü", duration_minutes=45, price="7.5")
+        slots = [
+            Availability.objects.create(service=self.service, date=self.day, start_time=time(9 + i, 0), end_time=time(9 + i, 30))
+            for i in range(3)
+        ]
+        self.book(slots[0])
+        cancelled = self.book(slots[1], user=self.admin)
+        cancelled.status, cancelled.availability, cancelled.notes = "CANCELLED", None, "naïve"
+        cancelled.save()
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def test_same_bytes_as_the_serializers(self):
+        bookings = Booking.objects.order_by("-id")
+        expected = {
+            "/api/services/": ServiceSerializer(Service.objects.all(), many=True).data,
+            f"/api/services/{self.service.id}/": ServiceSerializer(self.service).data,
+            "/api/availabilities/": AvailabilitySerializer(Availability.objects.filter(is_active=True), many=True).data,
+            "/api/bookings/": {"next": None, "previous": None, "results": BookingSerializer(bookings, many=True).data},
+            f"/api/bookings/{bookings[0].id}/": BookingSerializer(bookings[0]).data,
+        }
+        for url, data in expected.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.content, self.render(data))
+
+    def test_missing_object(self):
+        self.assertEqual(self.client.get("/api/bookings/999999/").status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get("/api/services/abc/").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_renderer_matches_drf(self):
+        data = {
+            "text": "é \u2028 \u2029 ✓",
+            "day": date(2030, 1, 2),
+            "at": time(9, 0, 0, 1234),
+            "lazy": ValidationError("bad").detail,
+            "nested": [{1: None, "b": True}],
+            "big": 2 ** 70,
+        }
+        self.assertEqual(FastJSONRenderer().render(data), self.render(data))
+        self.assertEqual(
+            FastJSONRenderer().render(data, "application/json; indent=2"),
+            JSONRenderer().render(data, "application/json; indent=2"),
+        )
+
+    def test_rejects_fields_values_cannot_provide(self):
+        class Nested(serializers.ModelSerializer):
+            extra = serializers.SerializerMethodField()
+
+            class Meta:
+                model = Service
+                fields = ["id", "extra"]
+
+        with self.assertRaises(ImproperlyConfigured):
+            Projection(Nested)
+
+    def test_sparse_fields_narrow_the_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/bookings/?fields=status,notes")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"], [{"status": "CANCELLED", "notes": "naïve"}, {"status": "PENDING", "notes": ""}])
+        select = next(q["sql"] for q in ctx.captured_queries if "bookings_booking" in q["sql"])
+        self.assertNotIn("start_time", select)
+
+        booking = Booking.objects.order_by("id").first()
+        response = self.client.get(f"/api/bookings/{booking.id}/?fields=id")
+        self.assertEqual(response.data, {"id": booking.id})
+
+    def test_available_slots_sparse_and_compact(self):
+        url = f"/api/services/{self.service.id}/available-slots/?date={self.day}"
+        sparse = self.client.get(url + "&fields=id,start_time,end_time").data
+        self.assertTrue(sparse)
+        self.assertEqual({tuple(sorted(slot)) for slot in sparse}, {("end_time", "id", "start_time")})
+
+        compact = self.client.get(url + "&fields=start_time,end_time&compact=1").data
+        self.assertEqual(compact["columns"], ["start_time", "end_time"])
+        self.assertEqual(compact["rows"], [[slot["start_time"], slot["end_time"]] for slot in sparse])
+
+        response = self.client.get(url + "&fields=id,nope")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("nope", str(response.data["fields"]))
+
+    def test_compact_list(self):
+        response = self.client.get("/api/services/?compact=1&fields=id,name")
+        self.assertEqual(response.data["columns"], ["id", "name"])
+        self.assertEqual([row[1] for row in response.data["rows"]], list(Service.objects.values_list("name", flat=True)))
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(QueryBudgetTestMixin, BookingTestCase):
+    """Every endpoint against its declared budget, authenticated with a real JWT."""
+
+    rows = 5
+
+    def setUp(self):
+        super().setUp()
+        self.login(self.user)
+        self.bookings = []
+        for i in range(self.rows):
+            slot = Availability.objects.create(
+                service=self.service, date=self.day, start_time=time(9 + i, 0), end_time=time(9 + i, 30)
+            )
+            self.bookings.append(self.book(slot))
+
+    def login(self, user):
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def free_slot(self, day=None, hour=15):
+        return Availability.objects.create(
+            service=self.service, date=day or self.day, start_time=time(hour, 0), end_time=time(hour, 30)
+        )
+
+    def test_every_endpoint_declares_budgets(self):
+        for pattern in urls.urlpatterns:
+            view = getattr(pattern.callback, "cls", None) or pattern.callback.view_class
+            actions = getattr(pattern.callback, "actions", None)
+            if actions is None:
+                if issubclass(view, APIRootView):
+                    continue
+                actions = {m: m for m in view.http_method_names if hasattr(view, m) and m not in ("options", "head")}
+            for action_name in actions.values():
+                with self.subTest(view=view.__name__, action=action_name):
+                    self.assertIsNotNone(view.budget_for(action_name))
+
+    def test_reads(self):
+        booking = self.bookings[0]
+        for path in [
+            "/api/services/",
+            f"/api/services/{self.service.id}/",
+            "/api/availabilities/",
+            f"/api/availabilities/{booking.availability_id}/",
+            "/api/bookings/",
+            f"/api/bookings/{booking.id}/",
+            "/api/my-bookings/",
+            "/api/auth/me/",
+            self.slots_url(),
+            "/api/availability-calendar/?from=2030-01-15&to=2030-01-16",
+        ]:
+            with self.subTest(path=path):
+                response = self.assertWithinBudget("GET", path)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_booking_writes(self):
+        response = self.assertWithinBudget(
+            "POST", "/api/bookings/", data={"service": self.service.id, "availability": self.free_slot().id}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        booking_id = response.data["id"]
+
+        response = self.assertWithinBudget(
+            "PATCH", f"/api/bookings/{booking_id}/", data={"availability": self.free_slot(hour=16).id}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.assertWithinBudget("POST", f"/api/bookings/{booking_id}/cancel/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.assertWithinBudget("DELETE", f"/api/bookings/{booking_id}/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        ids = [self.free_slot(day=date(2030, 2, 1 + i)).id for i in range(5)]
+        response = self.assertWithinBudget("POST", "/api/bookings/bulk/", data={"availabilities": ids}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        ids = [result["booking"]["id"] for result in response.data["results"]]
+        response = self.assertWithinBudget("POST", "/api/bookings/bulk-cancel/", data={"ids": ids}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_admin_writes(self):
+        self.login(self.admin)
+
+        response = self.assertWithinBudget("POST", f"/api/bookings/{self.bookings[0].id}/confirm/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [b.id for b in self.bookings]
+        response = self.assertWithinBudget("POST", "/api/bookings/bulk-confirm/", data={"ids": ids}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.assertWithinBudget(
+            "POST", "/api/services/", data={"name": "Nails", "description": "-", "duration_minutes": 30, "price": "9.00"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        service_id = response.data["id"]
+        response = self.assertWithinBudget("PATCH", f"/api/services/{service_id}/", data={"name": "Nail art"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.assertWithinBudget(
+            "POST", "/api/availabilities/",
+            data={"service": service_id, "date": "2030-03-01", "start_time": "09:00", "end_time": "09:30"}, format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.assertWithinBudget("PATCH", f"/api/availabilities/{response.data['id']}/", data={"end_time": "10:00"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.assertWithinBudget("DELETE", f"/api/availabilities/{response.data['id']}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        response = self.assertWithinBudget("DELETE", f"/api/services/{service_id}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        response = self.assertWithinBudget("GET", "/api/metrics/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_register(self):
+        self.client.credentials()
+
+        response = self.assertWithinBudget(
+            "POST", "/api/auth/register/", data={"username": "zoe", "password": "s3cret-pass", "email": "z@x.io"}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_over_budget_raises_in_strict_mode(self):
+        with mock.patch.dict(MeView.query_budgets, {"get": 0}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get("/api/auth/me/")
+
+
+@override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+class AdminQueryBudgetTests(QueryBudgetTestMixin, BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+
+    def fill(self, n):
+        start = Availability.objects.count()
+        for i in range(start, start + n):
+            slot = Availability.objects.create(
+                service=self.service, date=date(2030, 5, 1) + timedelta(days=i), start_time=time(9, 0), end_time=time(9, 30)
+            )
+            self.book(slot)
+
+    def test_changelists_do_not_grow_with_rows(self):
+        for url in ["/admin/bookings/booking/", "/admin/bookings/availability/"]:
+            self.fill(2)
+            with CaptureQueriesContext(connection) as few:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self.fill(10)
+            with self.subTest(url=url), self.assertMaxQueries(len(few)):
+                self.client.get(url)
+
+    def test_booking_change_form(self):
+        self.fill(20)
+        booking = Booking.objects.first()
+
+        with self.assertMaxQueries(12):
+            response = self.client.get(f"/admin/bookings/booking/{booking.id}/change/")
+
+        self.assertEqual(response.status_code, 200)
+
+
+PROFILED_MIDDLEWARE = ["bookings.middleware.ProfilingMiddleware"] + list(settings.MIDDLEWARE)
+
+
+@override_settings(MIDDLEWARE=PROFILED_MIDDLEWARE)
+class ProfilingMiddlewareTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_server_timing_header(self):
+        with override_settings(PROFILING={"SLOW_REQUEST_MS": 10_000}):
+            response = self.client.get(self.slots_url())
+
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r"^total;dur=[\d.]+, db;dur=[\d.]+;desc=\"\d+ queries\"")
+        self.assertIn("serializer;dur=", timing)
+        self.assertIn("auth;dur=", timing)
+
+    def test_slow_requests_are_logged_with_their_worst_sql(self):
+        with override_settings(PROFILING={"SLOW_REQUEST_MS": 0, "WORST_SQL": 2}):
+            with self.assertLogs("bookings.slow_requests", "WARNING") as logs:
+                self.client.get(self.slots_url())
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["path"], self.slots_url())
+        self.assertEqual(record["status"], 200)
+        self.assertEqual(record["user_id"], self.user.id)
+        self.assertGreater(record["queries"], 2)
+        self.assertEqual(len(record["worst_sql"]), 2)
+        self.assertGreaterEqual(record["worst_sql"][0]["ms"], record["worst_sql"][1]["ms"])
+
+    def test_sampled_requests_are_dumped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config = {"SLOW_REQUEST_MS": 10_000, "CPROFILE_SAMPLE_RATE": 1.0, "CPROFILE_DIR": directory}
+            with override_settings(PROFILING=config):
+                self.client.get("/api/auth/me/")
+
+            dumps = os.listdir(directory)
+            self.assertEqual(len(dumps), 1)
+            self.assertIn("GET-api-auth-me", dumps[0])
+            pstats.Stats(os.path.join(directory, dumps[0]))
+
+    def test_async_views_stay_async(self):
+        async def view(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(ProfilingMiddleware(view)))
+        self.assertFalse(iscoroutinefunction(ProfilingMiddleware(lambda request: HttpResponse())))
+
+        token = f"Bearer {RefreshToken.for_user(self.user).access_token}"
+
+        async def send():
+            return await AsyncClient().get(self.slots_url(), headers={"Authorization": token})
+
+        with override_settings(ROOT_URLCONF=AsyncURLConf, PROFILING={"SLOW_REQUEST_MS": 10_000}, DEBUG=True):
+            # with DEBUG on, Django logs every sync middleware it has to adapt
+            with self.assertNoLogs("django.request", "DEBUG"):
+                response = async_to_sync(send)()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        queries = int(re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', response["Server-Timing"])[1])
+        self.assertGreater(queries, 0)
+
+
+class AsyncURLConf:
+    urlpatterns = [
+        path("api/", include("bookings.async_urls")),
+        path("api/", include("bookings.urls")),
+    ]
+
+
+class AsyncViewsTests(BookingTestCase):
+    """The async read endpoints answer exactly like the DRF views they replace."""
+
+    def setUp(self):
+        super().setUp()
+        self.token = f"Bearer {RefreshToken.for_user(self.user).access_token}"
+        self.client.credentials(HTTP_AUTHORIZATION=self.token)
+        for hour in (9, 10):
+            slot = Availability.objects.create(
+                service=self.service, date=self.day, start_time=time(hour, 0), end_time=time(hour, 30)
+            )
+        self.book(slot)
+
+    def arequest(self, method, path, token=None, **kwargs):
+        async def send():
+            return await getattr(AsyncClient(), method)(path, headers=headers, **kwargs)
+
+        headers = {"Authorization": token} if token else {}
+        with override_settings(ROOT_URLCONF=AsyncURLConf):
+            return async_to_sync(send)()
+
+    def aget(self, path, token=None):
+        return self.arequest("get", path, token)
+
+    def test_responses_match_drf(self):
+        for path in [
+            "/api/services/",
+            f"/api/services/{self.service.id}/",
+            self.slots_url(),
+            self.slots_url(day=self.day + timedelta(days=1)),
+            "/api/my-bookings/?page_size=1",
+            "/api/auth/me/",
+            f"/api/services/{self.service.id}/available-slots/",
+            f"/api/services/{self.service.id}/available-slots/?date=tomorrow",
+            "/api/services/999/",
+        ]:
+            with self.subTest(path=path):
+                expected = self.client.get(path)
+                cache.clear()
+                response = self.aget(path, self.token)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.json(), expected.json())
+
+    def test_requires_a_valid_token(self):
+        for token in (None, "Bearer not-a-jwt"):
+            with self.subTest(token=token):
+                response = self.aget("/api/auth/me/", token)
+                self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+                self.assertIn("Bearer", response["WWW-Authenticate"])
+
+    def test_writes_fall_through_to_drf(self):
+        admin_token = f"Bearer {RefreshToken.for_user(self.admin).access_token}"
+        response = self.arequest(
+            "patch", f"/api/services/{self.service.id}/", admin_token,
+            data={"price": "20.00"}, content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.service.refresh_from_db()
+        self.assertEqual(str(self.service.price), "20.00")
+
+
+@override_settings(FEED_HEARTBEAT_SECONDS=30, FEED_MAX_SECONDS=60, FEED_SETTLE_SECONDS=0.1)
+class SlotEventFeedTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.token = f"Bearer {RefreshToken.for_user(self.user).access_token}"
+        self.client.credentials(HTTP_AUTHORIZATION=self.token)
+        self.slots = [
+            Availability.objects.create(service=self.service, date=self.day, start_time=time(h, 0), end_time=time(h, 30))
+            for h in range(9, 13)
+        ]
+        self.url = f"/api/services/{self.service.id}/slot-events/"
+
+    def events(self):
+        return list(SlotEvent.objects.order_by("id").values_list("kind", "availability_id"))
+
+    def stream(self, consume, path=None, headers=None):
+        """Opens the feed on the async views and returns (response, await consume(chunks))."""
+        async def run():
+            response = await AsyncClient().get(path or self.url, headers={"Authorization": self.token, **(headers or {})})
+            if not response.streaming:
+                return response, None
+            content = response.streaming_content
+            try:
+                return response, await consume(content)
+            finally:
+                await content.aclose()
+
+        with override_settings(ROOT_URLCONF=AsyncURLConf):
+            return async_to_sync(run)()
+
+    @staticmethod
+    async def next_chunk(content):
+        return (await asyncio.wait_for(anext(content), 5)).decode()
+
+    @staticmethod
+    def data(chunk):
+        return json.loads(chunk.split("data: ", 1)[1])
+
+    def test_booking_changes_write_the_outbox(self):
+        first, second, *rest = self.slots
+        response = self.client.post("/api/bookings/", {"service": self.service.id, "availability": first.id}, format="json")
+        booking_id = response.data["id"]
+        self.client.patch(f"/api/bookings/{booking_id}/", {"availability": second.id}, format="json")
+        self.client.post(f"/api/bookings/{booking_id}/cancel/")
+        response = self.client.post("/api/bookings/bulk/", {"availabilities": [s.id for s in rest]}, format="json")
+        ids = [result["booking"]["id"] for result in response.data["results"]]
+        self.client.post("/api/bookings/bulk-cancel/", {"ids": ids}, format="json")
+
+        events = self.events()
+        self.assertEqual(events[:6], [
+            ("taken", first.id),
+            ("freed", first.id), ("taken", second.id),
+            ("freed", second.id),
+            ("taken", rest[0].id), ("taken", rest[1].id),
+        ])
+        self.assertCountEqual(events[6:], [("freed", rest[0].id), ("freed", rest[1].id)])
+
+    def test_slots_of_other_services_at_that_time(self):
+        other = Service.objects.create(name="Shave", description="", duration_minutes=30, price="5.00")
+        same_time = Availability.objects.create(service=other, date=self.day, start_time=time(10, 0), end_time=time(10, 30))
+        Availability.objects.create(service=other, date=self.day, start_time=time(11, 0), end_time=time(11, 30))
+
+        def book():
+            with self.captureOnCommitCallbacks(execute=True):
+                return self.book(self.slots[1])
+
+        async def consume(content):
+            await self.next_chunk(content)
+            await sync_to_async(book)()
+            return self.data(await self.next_chunk(content))
+
+        _, event = self.stream(consume, path=f"/api/services/{other.id}/slot-events/")
+        self.assertEqual((event["kind"], event["availability"]), ("taken", same_time.id))
+
+        booking = Booking.objects.get()
+        self.client.post(f"/api/bookings/{booking.id}/cancel/")
+
+        self.assertEqual(self.events(), [
+            ("taken", self.slots[1].id), ("taken", same_time.id),
+            ("freed", self.slots[1].id), ("freed", same_time.id),
+        ])
+
+    def test_slots_still_covered_are_not_freed(self):
+        other = Service.objects.create(name="Shave", description="", duration_minutes=30, price="5.00")
+        overlapping = Availability.objects.create(service=other, date=self.day, start_time=time(9, 15), end_time=time(10, 15))
+        self.book(self.slots[0])
+        second = self.book(self.slots[1])
+        SlotEvent.objects.all().delete()
+
+        self.client.post(f"/api/bookings/{second.id}/cancel/")
+
+        # the 9:15 slot still overlaps the 9:00 booking
+        self.assertEqual(self.events(), [("taken", overlapping.id), ("freed", self.slots[1].id)])
+
+    def test_unchanged_slot_writes_nothing(self):
+        booking = self.book(self.slots[0])
+        self.client.force_authenticate(self.admin)
+
+        self.client.post(f"/api/bookings/{booking.id}/confirm/")
+        self.client.patch(f"/api/bookings/{booking.id}/", {"notes": "window seat"}, format="json")
+
+        self.assertEqual(self.events(), [("taken", self.slots[0].id)])
+
+    def test_streams_events_as_they_commit(self):
+        def book():
+            with self.captureOnCommitCallbacks(execute=True):
+                return self.book(self.slots[0])
+
+        async def consume(content):
+            retry = await self.next_chunk(content)
+            booking = await sync_to_async(book)()
+            return retry, self.data(await self.next_chunk(content)), booking
+
+        response, (retry, event, booking) = self.stream(consume)
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        self.assertEqual(retry, "retry: 30000\n\n")
+        self.assertEqual(
+            event,
+            {
+                "id": SlotEvent.objects.get().id, "service": self.service.id, "date": self.day.isoformat(),
+                "availability": booking.availability_id, "kind": "taken",
+            },
+        )
+
+    def test_events_committed_out_of_id_order_are_sent_in_order(self):
+        def event(event_id, slot):
+            return SlotEvent(id=event_id, kind="taken", service_id=self.service.id, date=self.day, availability_id=slot.id)
+
+        def commit_lower_id():
+            event(41, self.slots[0]).save()
+            feed.broker().publish({self.service.id})
+
+        event(42, self.slots[1]).save()  # committed first, while 41 is still in flight
+
+        async def consume(content):
+            await self.next_chunk(content)
+            await asyncio.sleep(0.02)  # the stream has read 42 alone
+            await sync_to_async(commit_lower_id)()
+            return [self.data(await self.next_chunk(content))["id"] for _ in range(2)]
+
+        _, ids = self.stream(consume, headers={"Last-Event-ID": "0"})
+
+        self.assertEqual(ids, [41, 42])
+
+    def test_resumes_after_last_event_id(self):
+        self.book(self.slots[0])
+        self.book(self.slots[1]).delete()
+        other_day = Availability.objects.create(
+            service=self.service, date=self.day + timedelta(days=1), start_time=time(9, 0), end_time=time(9, 30)
+        )
+        self.book(other_day)
+        first = SlotEvent.objects.order_by("id").first()
+
+        async def consume(content):
+            await self.next_chunk(content)
+            return [self.data(await self.next_chunk(content)) for _ in range(2)]
+
+        for headers, path in [
+            ({"Last-Event-ID": str(first.id)}, None),
+            ({}, f"{self.url}?last_event_id={first.id}&date={self.day.isoformat()}"),
+        ]:
+            with self.subTest(headers=headers, path=path):
+                _, events = self.stream(consume, path, headers)
+                self.assertEqual(
+                    [(e["kind"], e["availability"]) for e in events],
+                    [("taken", self.slots[1].id), ("freed", self.slots[1].id)],
+                )
+
+    @override_settings(FEED_HEARTBEAT_SECONDS=0.05, FEED_MAX_SECONDS=0.2)
+    def test_keep_alive_until_the_connection_ends(self):
+        self.book(self.slots[0])  # before the connection: not sent without Last-Event-ID
+
+        async def consume(content):
+            return [chunk.decode() async for chunk in content]
+
+        _, chunks = self.stream(consume)
+
+        self.assertEqual(chunks[0], "retry: 50\n\n")
+        self.assertGreaterEqual(len(chunks), 3)
+        self.assertEqual(set(chunks[1:]), {": keep-alive\n\n"})
+
+    def test_bad_requests(self):
+        for path, code in [
+            (f"{self.url}?date=tomorrow", status.HTTP_400_BAD_REQUEST),
+            (f"{self.url}?last_event_id=latest", status.HTTP_400_BAD_REQUEST),
+            ("/api/services/999/slot-events/", status.HTTP_404_NOT_FOUND),
+        ]:
+            with self.subTest(path=path):
+                response, _ = self.stream(None, path)
+                self.assertEqual(response.status_code, code)
+
+    def test_archive_prunes_old_events(self):
+        self.book(self.slots[0])
+        self.book(self.slots[1])
+        SlotEvent.objects.filter(availability_id=self.slots[0].id).update(created_at=timezone.now() - timedelta(days=2))
+
+        out = io.StringIO()
+        call_command("archive", "--events-days", "1", stdout=out)
+
+        self.assertIn("Pruned 1 slot event(s).", out.getvalue())
+        self.assertEqual(self.events(), [("taken", self.slots[1].id)])
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates})
+
+
+@throttle_rates(slots="3/min", login="2/min", booking_writes=None)
+class ThrottleTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+        self.now = 1_000_000_000
+        patcher = mock.patch("bookings.throttling._now_ms", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def statuses(self, n, path=None):
+        return [self.client.get(path or self.slots_url()).status_code for _ in range(n)]
+
+    def test_burst_then_refill(self):
+        self.assertEqual(self.statuses(4), [200, 200, 200, 429])
+        response = self.client.get(self.slots_url())
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response["Retry-After"], "20")
+        self.assertEqual(metrics.snapshot()["throttled_requests"], 2)
+
+        # one token every 20s; refused requests did not use any
+        self.now += 20_000
+        self.assertEqual(self.statuses(2), [200, 429])
+        self.now += 60_000
+        self.assertEqual(self.statuses(4), [200, 200, 200, 429])
+
+    def test_buckets_per_user_and_scope(self):
+        self.statuses(3)
+        self.assertEqual(self.statuses(1), [429])
+        # the calendar shares the slots scope, other views are not throttled
+        self.assertEqual(self.statuses(1, f"/api/availability-calendar/?from={self.day}&to={self.day}"), [429])
+        self.assertEqual(self.statuses(5, "/api/my-bookings/"), [200] * 5)
+
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.statuses(1), [200])
+
+    def test_login_per_ip(self):
+        self.client.force_authenticate(None)
+        credentials = {"username": "alice", "password": "secret123"}
+        codes = [self.client.post("/api/auth/login/", credentials).status_code for _ in range(3)]
+        self.assertEqual(codes, [200, 200, 429])
+        other = self.client.post("/api/auth/login/", credentials, REMOTE_ADDR="10.0.0.2")
+        self.assertEqual(other.status_code, status.HTTP_200_OK)
+
+    def test_async_view(self):
+        token = f"Bearer {RefreshToken.for_user(self.user).access_token}"
+
+        async def get():
+            return await AsyncClient().get(self.slots_url(), headers={"Authorization": token})
+
+        with override_settings(ROOT_URLCONF=AsyncURLConf):
+            responses = [async_to_sync(get)() for _ in range(4)]
+        self.assertEqual([r.status_code for r in responses], [200, 200, 200, 429])
+        self.assertEqual(responses[-1]["Retry-After"], "20")
+        # same bucket as the DRF view
+        self.assertEqual(self.statuses(1), [429])
+
+    @override_settings(THROTTLE_ENABLED=False)
+    def test_disabled(self):
+        self.assertEqual(self.statuses(5), [200] * 5)
+
+
+@override_settings(PBKDF2_ITERATIONS=1000)
+class PasswordHashingTests(BookingTestCase):
+    def arequest(self, path, data):
+        async def send():
+            return await AsyncClient().post(path, data, content_type="application/json")
+
+        with override_settings(ROOT_URLCONF=AsyncURLConf):
+            return async_to_sync(send)()
+
+    def test_hashes_on_the_pool(self):
+        self.assertTrue(passwords.run(lambda: threading.current_thread().name).startswith("password-hash"))
+        encoded = make_password("s3cret-pass")
+        self.assertTrue(encoded.startswith("pbkdf2_sha256$1000$"))
+        self.assertTrue(async_to_sync(passwords.acheck_password)("s3cret-pass", encoded))
+
+    def test_login_upgrades_other_iteration_counts(self):
+        with override_settings(PBKDF2_ITERATIONS=2000):
+            self.user.set_password("secret123")
+            self.user.save()
+        response = self.client.post("/api/auth/login/", {"username": "alice", "password": "secret123"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$1000$"))
+
+    def test_async_login_upgrades_other_iteration_counts(self):
+        with override_settings(PBKDF2_ITERATIONS=2000):
+            self.user.set_password("secret123")
+            self.user.save()
+        outdated = self.user.password
+
+        response = self.arequest("/api/auth/login/", {"username": "alice", "password": "secret123"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertNotEqual(self.user.password, outdated)
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$1000$"))
+        self.assertTrue(self.user.check_password("secret123"))
+
+    def test_async_login_failure_is_signalled(self):
+        failures = []
+        handler = lambda sender, credentials, request, **kwargs: failures.append(credentials)
+        user_login_failed.connect(handler)
+        self.addCleanup(user_login_failed.disconnect, handler)
+
+        response = self.arequest("/api/auth/login/", {"username": "alice", "password": "wrong"})
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(failures, [{"username": "alice", "password": "********************"}])
+
+    @override_settings(AUTHENTICATION_BACKENDS=["django.contrib.auth.backends.AllowAllUsersModelBackend"])
+    def test_async_login_defers_other_backends_to_drf(self):
+        User.objects.create_user("idle", password="secret123", is_active=False)
+
+        with mock.patch("bookings.async_views.passwords.acheck_user_password") as acheck:
+            response = self.arequest("/api/auth/login/", {"username": "idle", "password": "secret123"})
+
+        acheck.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_async_login_matches_drf(self):
+        User.objects.create_user("idle", password="secret123", is_active=False)
+        for data in [
+            {"username": "alice", "password": "secret123"},
+            {"username": "alice", "password": "wrong"},
+            {"username": "nobody", "password": "secret123"},
+            {"username": "idle", "password": "secret123"},
+            {"username": "alice"},
+        ]:
+            with self.subTest(data=data):
+                expected = self.client.post("/api/auth/login/", data, format="json")
+                cache.clear()
+                response = self.arequest("/api/auth/login/", data)
+                self.assertEqual(response.status_code, expected.status_code)
+                if expected.status_code == status.HTTP_200_OK:
+                    self.assertEqual(response.json().keys(), expected.json().keys())
+                    self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.json()['access']}")
+                    self.assertEqual(self.client.get("/api/auth/me/").json()["username"], "alice")
+                    self.client.credentials()
+                else:
+                    self.assertEqual(response.json(), expected.json())
+
+    def test_async_register(self):
+        data = {"username": "zoe", "password": "s3cret-pass", "email": "Zoe@X.io"}
+        response = self.arequest("/api/auth/register/", data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(User.objects.get(username="zoe").check_password("s3cret-pass"))
+
+        response = self.arequest("/api/auth/register/", {**data, "username": "zoe2", "email": "zoe@x.IO"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {"email": ["Email already in use."]})
+
+    def test_email_check_uses_the_index(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post("/api/auth/register/", {"username": "zoe", "password": "s3cret-pass", "email": "z@x.io"})
+        sql = next(q["sql"] for q in ctx.captured_queries if "email" in q["sql"] and q["sql"].startswith("SELECT"))
+        self.assertIn("LOWER", sql)
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("EXPLAIN QUERY PLAN " + sql)
+                self.assertIn("user_email_ci", str(cursor.fetchall()))
+
+
+class CachedAuthenticationTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def me(self, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get("/api/auth/me/")
+        return response
+
+    def test_user_is_loaded_once(self):
+        self.me(1)
+        self.assertEqual(self.me(0).data["username"], "alice")
+
+    def test_saving_the_user_drops_the_cached_copy(self):
+        self.me(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = "Alice"
+            self.user.save()
+
+        self.assertEqual(self.me(1).data["first_name"], "Alice")
+
+    def test_deactivated_user_is_rejected(self):
+        self.me(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+
+        self.assertEqual(self.me(1).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_TOKEN_CLAIMS=True)
+    def test_token_claims_need_no_query(self):
+        response = self.client.post("/api/auth/login/", {"username": "alice", "password": "secret123"})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+        response = self.me(0)
+        self.assertEqual(response.data, MeView.payload(self.user))
+
+        slot = Availability.objects.create(service=self.service, date=self.day, start_time=time(9, 0), end_time=time(9, 30))
+        self.book(slot)
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/my-bookings/")
+        self.assertEqual(len(response.data["results"]), 1)
+
+    @override_settings(AUTH_TOKEN_CLAIMS=True)
+    def test_refresh_reads_the_claims_again(self):
+        self.user.is_staff = True
+        self.user.save()
+        tokens = self.client.post("/api/auth/login/", {"username": "alice", "password": "secret123"}).data
+        self.assertNotIn("is_staff", RefreshToken(tokens["refresh"]))
+        self.assertTrue(AccessToken(tokens["access"])["is_staff"])
+
+        self.user.is_staff = False
+        self.user.save()
+        response = self.client.post("/api/auth/refresh/", {"refresh": tokens["refresh"]})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+        self.assertFalse(self.me(0).data["is_staff"])
+
+    def test_cache_keeps_no_password_hash(self):
+        self.me(1)
+        cached = cache.get(f"auth:user:{self.user.pk}")
+
+        self.assertNotIn("password", cached)
+        self.assertNotIn(self.user.password, cached.values())
+        self.assertEqual(self.me(0).data, MeView.payload(self.user))
+
+    def test_revoked_tokens_are_checked_against_the_cached_digest(self):
+        # simplejwt's modules keep the api_settings they imported, so patch that one
+        with mock.patch.object(authentication.api_settings, "CHECK_REVOKE_TOKEN", True):
+            self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+            self.me(1)
+            self.assertEqual(self.me(0).status_code, status.HTTP_200_OK)
+
+            User.objects.filter(pk=self.user.pk).update(password="changed")  # as seen by another process
+            with self.captureOnCommitCallbacks(execute=True):
+                authentication.invalidate_user(self.user.pk)
+            self.assertEqual(self.me(1).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def pool(self, **kwargs):
+        opened = []
+
+        def connect():
+            opened.append(mock.Mock(name=f"conn{len(opened)}"))
+            return opened[-1]
+
+        return db_pool.ConnectionPool(connect, close=lambda conn: conn.close(), **kwargs), opened
+
+    def test_connections_are_reused(self):
+        pool, opened = self.pool(max_size=2)
+        first = pool.checkout()
+        pool.checkin(first)
+
+        self.assertIs(pool.checkout(), first)
+        self.assertEqual(len(opened), 1)
+        self.assertEqual(pool.stats()["db_pool_checkouts"], 2)
+
+    def test_size_is_bounded(self):
+        pool, opened = self.pool(max_size=1, timeout=0.05)
+        pool.checkout()
+
+        with self.assertRaises(db_pool.PoolTimeout):
+            pool.checkout()
+        self.assertEqual(len(opened), 1)
+        self.assertEqual(pool.stats()["db_pool_timeouts"], 1)
+
+    def test_waiters_get_checked_in_connections(self):
+        pool, opened = self.pool(max_size=1, timeout=5)
+        conn = pool.checkout()
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(pool.checkout()))
+        waiter.start()
+        time_module.sleep(0.05)
+        pool.checkin(conn)
+        waiter.join()
+
+        self.assertEqual(got, [conn])
+        stats = pool.stats()
+        self.assertEqual(stats["db_pool_waits"], 1)
+        self.assertGreater(stats["db_pool_wait_seconds"], 0)
+
+    def test_broken_and_discarded_connections_are_replaced(self):
+        pool, opened = self.pool(max_size=1, check=lambda conn: conn is not opened[0])
+        pool.checkin(pool.checkout())
+        second = pool.checkout()  # the idle one fails its check
+        pool.checkin(second, discard=True)
+        pool.checkout()
+
+        self.assertEqual(len(opened), 3)
+        self.assertTrue(opened[0].close.called and opened[1].close.called)
+        self.assertEqual(pool.stats()["db_pool_open"], 1)
+
+
+class PooledBackendTests(SimpleTestCase):
+    """The pooled ENGINE on a SQLite file, as a stand-in for MySQL."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_dict = connections.configure_settings({
+            "default": {
+                "ENGINE": "bookings.db.sqlite3",
+                "NAME": os.path.join(directory.name, "pool.sqlite3"),
+                "POOL": {"MAX_SIZE": 2},
+            }
+        })["default"]
+        self.wrappers = [PooledSQLiteWrapper(settings_dict, alias="pooled") for _ in range(3)]
+        self.pool = self.wrappers[0].get_pool()
+        self.addCleanup(self.pool.clear)
+
+    def test_close_returns_the_connection(self):
+        first, second, _ = self.wrappers
+        first.ensure_connection()
+        raw = first.connection
+        first.close()
+        second.ensure_connection()
+
+        self.assertIs(second.connection, raw)
+        self.assertEqual(self.pool.stats()["db_pool_open"], 1)
+
+    def test_checked_out_connections_are_bounded(self):
+        for wrapper in self.wrappers[:2]:
+            wrapper.ensure_connection()
+        self.pool.timeout = 0.05
+
+        with self.assertRaises(db_pool.PoolTimeout):
+            self.wrappers[2].ensure_connection()
+
+        self.wrappers[0].close()
+        self.wrappers[2].ensure_connection()
+        self.assertEqual(self.pool.stats()["db_pool_in_use"], 2)
+
+    def test_connection_closed_inside_a_transaction_is_discarded(self):
+        wrapper = self.wrappers[0]
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        wrapper.in_atomic_block = True
+        wrapper.close()
+
+        self.assertEqual(self.pool.stats()["db_pool_open"], 0)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            raw.execute("SELECT 1")
+
+    def test_closed_idle_connections_fail_the_ping(self):
+        wrapper = self.wrappers[0]
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        self.assertTrue(wrapper.ping(raw))
+        wrapper.close()
+        raw.close()
+
+        self.assertFalse(wrapper.ping(raw))
+        self.wrappers[1].ensure_connection()
+        self.assertIsNot(self.wrappers[1].connection, raw)
+
+    def test_metrics(self):
+        self.wrappers[0].ensure_connection()
+        text = metrics.render_pool_prometheus({"pooled": self.pool.stats()})
+
+        self.assertIn('booking_db_pool_in_use{alias="pooled"} 1', text)
+        self.assertIn("# TYPE booking_db_pool_checkouts counter", text)
+
+
+class ConditionalGetTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+        self.slot = Availability.objects.create(
+            service=self.service, date=self.day, start_time=time(9, 0), end_time=time(9, 30)
+        )
+
+    def assertNotModified(self, path, etag):
+        with self.assertNumQueries(0):
+            response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_available_slots(self):
+        etag = self.client.get(self.slots_url())["ETag"]
+        self.assertNotModified(self.slots_url(), etag)
+
+        other_service = Service.objects.create(name="Shave", description="", duration_minutes=30, price="5.00")
+        other_slot = Availability.objects.create(
+            service=other_service, date=self.day, start_time=time(9, 0), end_time=time(9, 30)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book(other_slot)  # the overlap rule spans services
+
+        response = self.client.get(self.slots_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertNotIn(self.slot.id, [s["id"] for s in response.data])
+
+    def test_other_dates_keep_their_etag(self):
+        etag = self.client.get(self.slots_url())["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book(Availability.objects.create(
+                service=self.service, date=self.day + timedelta(days=1), start_time=time(9, 0), end_time=time(9, 30)
+            ))
+
+        self.assertNotModified(self.slots_url(), etag)
+
+    def test_move_to_another_date_changes_both_etags(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = self.book(self.slot)
+        next_day = self.day + timedelta(days=1)
+        target = Availability.objects.create(
+            service=self.service, date=next_day, start_time=time(9, 0), end_time=time(9, 30)
+        )
+        etags = {day: self.client.get(self.slots_url(day=day))["ETag"] for day in [self.day, next_day]}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f"/api/bookings/{booking.id}/", {"availability": target.id}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        for day, etag in etags.items():
+            with self.subTest(day=day):
+                response = self.client.get(self.slots_url(day=day), HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertNotEqual(response["ETag"], etag)
+        self.assertIn(self.slot.id, [s["id"] for s in self.client.get(self.slots_url()).data])
+
+    def test_service_catalog(self):
+        for path in ["/api/services/", f"/api/services/{self.service.id}/"]:
+            with self.subTest(path=path):
+                etag = self.client.get(path)["ETag"]
+                self.assertNotModified(path, etag)
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    Service.objects.filter(pk=self.service.pk).first().save()
+                self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_shapes_have_their_own_etags(self):
+        for path, other in [
+            (self.slots_url(), "start_time"),
+            ("/api/services/", "name"),
+            (f"/api/services/{self.service.id}/", "name"),
+        ]:
+            with self.subTest(path=path):
+                sep = "&" if "?" in path else "?"
+                etags = {
+                    shape: self.client.get(path + shape)["ETag"]
+                    for shape in ["", f"{sep}fields=id", f"{sep}fields={other},id", f"{sep}compact=1"]
+                }
+                self.assertEqual(len(set(etags.values())), len(etags))
+                for shape, etag in etags.items():
+                    self.assertNotModified(path + shape, etag)
+
+                response = self.client.get(f"{path}{sep}fields=nope", HTTP_IF_NONE_MATCH=etags[""])
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_async_views_send_the_same_etags(self):
+        token = f"Bearer {RefreshToken.for_user(self.user).access_token}"
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_AUTHORIZATION=token)
+        for path in ["/api/services/", self.slots_url(), "/api/services/?fields=id", self.slots_url() + "&compact=1"]:
+            with self.subTest(path=path):
+                etag = self.client.get(path)["ETag"]
+
+                async def send():
+                    return await AsyncClient().get(path, headers={"Authorization": token, "If-None-Match": etag})
+
+                with override_settings(ROOT_URLCONF=AsyncURLConf):
+                    response = async_to_sync(send)()
+                self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+                self.assertEqual(response["ETag"], etag)
+
+
+@override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+class ArchiveTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.past = timezone.localdate() - timedelta(days=200)
+        self.old = [
+            self.book(Availability.objects.create(service=self.service, date=self.past, start_time=time(9 + i, 0), end_time=time(9 + i, 30)))
+            for i in range(3)
+        ]
+        self.spare = Availability.objects.create(service=self.service, date=self.past, start_time=time(15, 0), end_time=time(15, 30))
+        self.current = self.book(Availability.objects.create(service=self.service, date=self.day, start_time=time(9, 0), end_time=time(9, 30)))
+
+    def archive(self, *args):
+        out = io.StringIO()
+        call_command("archive", *args, stdout=out)
+        return out.getvalue()
+
+    def test_moves_old_rows_in_batches(self):
+        output = self.archive("--batch", "2")
+
+        self.assertIn("Archived 3 booking(s) and 4 slot(s)", output)
+        self.assertEqual(list(Booking.objects.all()), [self.current])
+        self.assertEqual(list(Availability.objects.values_list("date", flat=True)), [self.day])
+        self.assertFalse(DateLock.objects.filter(date=self.past).exists())
+
+        archived = ArchivedBooking.objects.get(id=self.old[0].id)
+        self.assertEqual((archived.user, archived.date, archived.start_time), (self.user, self.past, time(9, 0)))
+        self.assertEqual(archived.availability_id, self.old[0].availability_id)
+        self.assertTrue(ArchivedAvailability.objects.filter(id=self.spare.id).exists())
+
+    def test_is_resumable(self):
+        with mock.patch("bookings.management.commands.archive.archive_availabilities", side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                self.archive()
+        self.assertEqual(ArchivedBooking.objects.count(), 3)
+
+        self.assertIn("Archived 0 booking(s) and 4 slot(s)", self.archive())
+
+    def test_cancelled_of_any_date(self):
+        self.current.status = "CANCELLED"
+        self.current.availability = None
+        self.current.save()
+
+        self.archive("--cancelled")
+
+        self.assertFalse(Booking.objects.exists())
+        self.assertTrue(ArchivedBooking.objects.filter(id=self.current.id, status="CANCELLED").exists())
+
+    def test_archived_dates_are_not_regenerated(self):
+        self.archive()
+        self.client.force_authenticate(self.user)
+
+        response = self.client.get(self.slots_url(day=self.past))
+
+        self.assertEqual(response.data, [])
+        self.assertFalse(Availability.objects.filter(date=self.past).exists())
+
+    def test_admin_reads_the_archive(self):
+        self.archive()
+        self.client.force_login(self.admin)
+
+        response = self.client.get("/admin/bookings/archivedbooking/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertContains(response, "alice - Haircut")
+        self.assertEqual(self.client.get(f"/admin/bookings/archivedbooking/{self.old[0].id}/delete/").status_code, 403)
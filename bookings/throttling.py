@@ -0,0 +1,130 @@
+"""
+Token-bucket throttling on the shared cache (the GCRA form of a token bucket).
+
+A scope's rate "N/period" is a bucket of N requests refilled at N per period.
+A client's bucket is one integer in the cache: its theoretical arrival time
+(TAT), in milliseconds, at which the bucket is full again. A request adds one
+emission interval to it with cache.incr(), atomic on locmem and Redis, and
+passes when the new TAT is at most a period ahead of now; a refused request
+gives its interval back. Concurrent requests each see their own TAT, so at most
+N of a burst pass. The key expires a period after the last passing request,
+which is when the bucket would be full anyway.
+"""
+import math
+import time
+
+from django.conf import settings
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from . import metrics
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+class BucketThrottle(SimpleRateThrottle):
+    """
+    Throttles a view by its scope: throttle_scopes[action] on viewsets (as
+    query_budgets), else throttle_scope; views with neither, and scopes whose
+    rate is None, are not throttled. Rates are REST_FRAMEWORK
+    ["DEFAULT_THROTTLE_RATES"]. Authenticated users get a bucket each, other
+    clients one per IP (see NUM_PROXIES).
+    """
+
+    cache_format = "throttle:%(scope)s:%(ident)s"
+
+    def __init__(self):
+        # the rate depends on the view's scope, known in allow_request()
+        self.wait_ms = 0
+
+    @property
+    def THROTTLE_RATES(self):
+        # read per request rather than at import, so overridden settings apply
+        return api_settings.DEFAULT_THROTTLE_RATES
+
+    @staticmethod
+    def scope_of(view):
+        scopes = getattr(view, "throttle_scopes", None)
+        if scopes is not None and getattr(view, "action", None) in scopes:
+            return scopes[view.action]
+        return getattr(view, "throttle_scope", None)
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f"user:{request.user.pk}"
+        else:
+            ident = f"ip:{self.get_ident(request)}"
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+    def bucket(self, request, view, scope):
+        """(key, interval_ms) of the request's bucket, or None when unthrottled."""
+        if not getattr(settings, "THROTTLE_ENABLED", True) or scope is None:
+            return None
+        self.scope = scope
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return None
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return self.get_cache_key(request, view), max(1, round(self.duration * 1000 / self.num_requests))
+
+    def allow_request(self, request, view):
+        bucket = self.bucket(request, view, self.scope_of(view))
+        if bucket is None:
+            return True
+        key, interval = bucket
+        now = _now_ms()
+        try:
+            tat = self.cache.incr(key, interval)
+        except ValueError:
+            # empty bucket; retry when another request created it meanwhile
+            if self.cache.add(key, now + interval, self.duration):
+                return True
+            tat = self.cache.incr(key, interval)
+
+        if tat - interval < now:
+            # idle since before now: the bucket is full, restart it from now.
+            # Not atomic: requests racing here all pass, and their set()s drop
+            # the increments made meanwhile, so a burst landing on an idle
+            # bucket can get up to about twice the rate through in that period.
+            self.cache.set(key, now + interval, self.duration)
+            return True
+        if tat - now <= interval * self.num_requests:
+            self.cache.touch(key, self.duration)
+            return True
+        self.cache.decr(key, interval)
+        metrics.incr("throttled_requests")
+        return self.refuse(tat - interval * self.num_requests - now)
+
+    async def aallow_request(self, request, view, scope):
+        """allow_request() for the async views, which name their scope."""
+        bucket = self.bucket(request, view, scope)
+        if bucket is None:
+            return True
+        key, interval = bucket
+        now = _now_ms()
+        try:
+            tat = await self.cache.aincr(key, interval)
+        except ValueError:
+            if await self.cache.aadd(key, now + interval, self.duration):
+                return True
+            tat = await self.cache.aincr(key, interval)
+
+        if tat - interval < now:
+            await self.cache.aset(key, now + interval, self.duration)
+            return True
+        if tat - now <= interval * self.num_requests:
+            await self.cache.atouch(key, self.duration)
+            return True
+        await self.cache.adecr(key, interval)
+        await metrics.aincr("throttled_requests")
+        return self.refuse(tat - interval * self.num_requests - now)
+
+    def refuse(self, wait_ms):
+        self.wait_ms = wait_ms
+        return False
+
+    def wait(self):
+        """Seconds until the next request passes (the Retry-After header)."""
+        return math.ceil(self.wait_ms / 1000)
@@ -1,5 +1,5 @@
 from rest_framework.routers import DefaultRouter
-from .views import ServiceViewSet, AvailabilityViewSet, BookingViewSet, RegisterView, MyBookingsView, MeView
+from .views import ServiceViewSet, AvailabilityViewSet, BookingViewSet, RegisterView, MyBookingsView, MeView, MetricsView, AvailabilityCalendarView
 from django.urls import path
 
 
@@ -12,4 +12,6 @@ urlpatterns = router.urls + [
     path('auth/register/', RegisterView.as_view(), name='register'),
     path('my-bookings/', MyBookingsView.as_view()),
     path("auth/me/", MeView.as_view(), name="me"),
+    path("availability-calendar/", AvailabilityCalendarView.as_view(), name="availability-calendar"),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
 ]
@@ -1,22 +1,71 @@
 # Create your views here.
+from django.db import transaction
 from django.db.models import Q
 from django.shortcuts import render
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny, IsAuthenticatedOrReadOnly
 from .models import Service, Availability, Booking
+from .export import FORMATS as EXPORT_FORMATS
 from .serializers import ServiceSerializer, AvailabilitySerializer, BookingSerializer
+from .slots import ensure_slots_on_demand, free_slots
+from .cache import catalog_etag, get_available_slots, get_many_available_slots, slots_etag
+from . import metrics
+from .db import pool
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from rest_framework.exceptions import PermissionDenied
 from django.utils import timezone
-from datetime import datetime, time, timedelta
+from datetime import datetime, timedelta
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics
-from .serializers import RegisterSerializer
+from .serializers import RegisterSerializer, BulkBookingSerializer, BulkStatusSerializer
+from .lifecycle import cancel_bookings, confirm_bookings
+from .pagination import BookingCursorPagination
+from .projections import ProjectedReadMixin, Shape
+from .querybudget import QueryBudgetMixin
 from rest_framework.decorators import action
+from rest_framework_simplejwt.views import TokenObtainPairView
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
-class ServiceViewSet(ModelViewSet):
+CALENDAR_MAX_DAYS = 31
+
+
+# Conditional GET: the ETags come from version counters in the cache, so a
+# matching If-None-Match is answered with 304 before any query runs. They
+# include the requested Shape, which is validated first (a bad ?fields= is a
+# 400, never a 304).
+
+def service_catalog_etag(request, *args, **kwargs):
+    return catalog_etag() + Shape(request.GET, ServiceSerializer).etag_suffix
+
+
+def available_slots_etag(request, pk=None):
+    shape = Shape(request.GET, AvailabilitySerializer)
+    try:
+        target_date = datetime.strptime(request.GET.get("date", ""), "%Y-%m-%d").date()
+    except ValueError:
+        return None
+    return slots_etag(pk, target_date) + shape.etag_suffix
+
+
+class ServiceViewSet(QueryBudgetMixin, ProjectedReadMixin, ModelViewSet):
+    # budgets include the JWT user lookup
+    query_budgets = {
+        "list": 2,
+        "retrieve": 2,
+        # first batch of slots on commit: existing pairs, slot + lock inserts
+        "create": 5,
+        "update": 3,
+        "partial_update": 3,
+        # cascades: slots, bookings and their archived copies
+        "destroy": 7,
+        # cold: existing pairs, slot + lock inserts, bookings, slots
+        "available_slots": 7,
+    }
+    throttle_scopes = {"available_slots": "slots"}
     queryset = Service.objects.all()
     serializer_class = ServiceSerializer
 
@@ -25,6 +74,14 @@ class ServiceViewSet(ModelViewSet):
             return [IsAuthenticated()]
         return [IsAdminUser()]
 
+    @method_decorator(condition(etag_func=service_catalog_etag))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @method_decorator(condition(etag_func=service_catalog_etag))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     @swagger_auto_schema(
     manual_parameters=[
         openapi.Parameter(
@@ -37,10 +94,15 @@ class ServiceViewSet(ModelViewSet):
     ]
 )
     @action(detail=True, methods=["get"], url_path="available-slots")
+    @method_decorator(condition(etag_func=available_slots_etag))
     def available_slots(self, request, pk=None):
         """
         GET /api/services/{id}/available-slots/?date=YYYY-MM-DD
-        Generates slots on demand (09:00–17:00 every 30') and returns only available ones.
+        Returns the available slots (09:00–17:00 every 30'). Slots of the next SLOT_HORIZON_DAYS
+        days are pre-generated (pregenerate_slots); later dates, and those it has not reached yet, are
+        generated on demand.
+        The result is cached per (service, date) until a booking or slot of that date changes,
+        and carries an ETag: polling with If-None-Match gets a 304 without touching the database.
         """
         service = self.get_object()
         date_str = request.query_params.get("date")
@@ -59,90 +121,142 @@ class ServiceViewSet(ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        SLOT_MINUTES = 30
-        WORK_START = time(9, 0)
-        WORK_END = time(17, 0)
-
-        start_dt = datetime.combine(target_date, WORK_START)
-        end_dt = datetime.combine(target_date, WORK_END)
-
-        cur = start_dt
-        to_create = []
-
-        while cur + timedelta(minutes=SLOT_MINUTES) <= end_dt:
-            s = cur.time()
-            e = (cur + timedelta(minutes=SLOT_MINUTES)).time()
-
-            exists = Availability.objects.filter(
-                service=service,
-                date=target_date,
-                start_time=s,
-                end_time=e,
-            ).exists()
-
-            if not exists:
-                to_create.append(
-                    Availability(
-                        service=service,
-                        date=target_date,
-                        start_time=s,
-                        end_time=e,
-                        is_active=True,
-                    )
-                )
+        shape = Shape(request.query_params, AvailabilitySerializer)
+
+        def compute():
+            ensure_slots_on_demand([service.id], [target_date])
+            available_slots = free_slots([service.id], [target_date])[(service.id, target_date)]
+            return AvailabilitySerializer(available_slots, many=True).data
+
+        return Response(
+            shape.apply(get_available_slots(service.id, target_date, compute)),
+            status=status.HTTP_200_OK,
+        )
+
+class AvailabilityViewSet(QueryBudgetMixin, ProjectedReadMixin, ModelViewSet):
+    query_budgets = {
+        "list": 2,
+        "retrieve": 2,
+        "create": 5,
+        "update": 6,
+        "partial_update": 6,
+        "destroy": 4,
+    }
+    queryset = Availability.objects.filter(is_active=True)
+    serializer_class = AvailabilitySerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
 
-            cur += timedelta(minutes=SLOT_MINUTES)
 
-        if to_create:
-            Availability.objects.bulk_create(to_create)
+class AvailabilityCalendarView(QueryBudgetMixin, APIView):
+    # cold range: services, existing pairs, slot and lock inserts
+    # (SQLite splits big inserts into batches), bookings, slots
+    query_budgets = {"get": 9}
+    throttle_scope = "slots"
+    permission_classes = [IsAuthenticated]
 
-        active_ranges = list(
-            Booking.objects.filter(
-                status__in=["PENDING", "CONFIRMED"],
-                availability__date=target_date,
-                availability__isnull=False,
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter("services", openapi.IN_QUERY, description="Comma separated service ids (default: all)", type=openapi.TYPE_STRING),
+            openapi.Parameter("from", openapi.IN_QUERY, description="First date (YYYY-MM-DD)", type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter("to", openapi.IN_QUERY, description="Last date, inclusive (YYYY-MM-DD)", type=openapi.TYPE_STRING, required=True),
+        ]
+    )
+    def get(self, request):
+        """
+        GET /api/availability-calendar/?services=1,2,3&from=YYYY-MM-DD&to=YYYY-MM-DD
+        Free slots of several services over a date range, in a bounded number of queries.
+        """
+        try:
+            first = datetime.strptime(request.query_params.get("from", ""), "%Y-%m-%d").date()
+            last = datetime.strptime(request.query_params.get("to", ""), "%Y-%m-%d").date()
+        except ValueError:
+            return Response(
+                {"detail": "from and to query params are required (YYYY-MM-DD)."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            .select_related("availability")
-            .values_list("availability__start_time", "availability__end_time")
-        )
 
-        def overlaps(start_a, end_a, start_b, end_b):
-            return start_a < end_b and end_a > start_b
-
-        available_slots = []
-        for slot in Availability.objects.filter(
-            service=service,
-            date=target_date,
-            is_active=True,
-        ).order_by("start_time"):
-            conflict = any(
-                overlaps(slot.start_time, slot.end_time, b_start, b_end)
-                for (b_start, b_end) in active_ranges
+        if last < first:
+            return Response({"detail": "to must not be before from."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if (last - first).days >= CALENDAR_MAX_DAYS:
+            return Response(
+                {"detail": f"The range cannot exceed {CALENDAR_MAX_DAYS} days."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            if not conflict:
-                available_slots.append(slot)
+
+        services = Service.objects.order_by("id")
+        services_param = request.query_params.get("services")
+        if services_param:
+            try:
+                ids = [int(i) for i in services_param.split(",") if i.strip()]
+            except ValueError:
+                return Response(
+                    {"detail": "services must be a comma separated list of ids."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            services = services.filter(id__in=ids)
+        services = list(services.values("id", "name"))
+
+        days = [first + timedelta(days=i) for i in range((last - first).days + 1)]
+        shape = Shape(request.query_params, AvailabilitySerializer)
+
+        def compute(missing):
+            service_ids = {service_id for service_id, _ in missing}
+            missing_days = {day for _, day in missing}
+            ensure_slots_on_demand(service_ids, missing_days)
+            free = free_slots(service_ids, missing_days)
+            return {pair: AvailabilitySerializer(free.get(pair, []), many=True).data for pair in missing}
+
+        matrix = get_many_available_slots([s["id"] for s in services], days, compute)
 
         return Response(
-            AvailabilitySerializer(available_slots, many=True).data,
+            {
+                "from": first.isoformat(),
+                "to": last.isoformat(),
+                "services": [
+                    {
+                        "id": s["id"],
+                        "name": s["name"],
+                        "days": {day.isoformat(): shape.apply(matrix[(s["id"], day)]) for day in days},
+                    }
+                    for s in services
+                ],
+            },
             status=status.HTTP_200_OK,
         )
 
-class AvailabilityViewSet(ModelViewSet):
-    queryset = Availability.objects.filter(is_active=True)
-    serializer_class = AvailabilitySerializer
-    permission_classes = [IsAuthenticatedOrReadOnly]
 
-
-class BookingViewSet(ModelViewSet):
+class BookingViewSet(QueryBudgetMixin, ProjectedReadMixin, ModelViewSet):
+    query_budgets = {
+        "list": 2,
+        "retrieve": 2,
+        # writes include the slot-events outbox: overlapping slots and the dates' occupancy
+        "create": 13,
+        "update": 14,
+        "partial_update": 14,
+        "destroy": 1,
+        "bulk": 10,
+        "cancel": 8,
+        "confirm": 3,
+        "bulk_confirm": 3,
+        "bulk_cancel": 8,
+        # the rows are read while the response streams, after the view returns
+        "export": 1,
+    }
+    throttle_scopes = dict.fromkeys(
+        ["create", "update", "partial_update", "destroy", "bulk", "cancel", "confirm", "bulk_confirm", "bulk_cancel"],
+        "booking_writes",
+    )
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = BookingCursorPagination
 
     def get_queryset(self):
         if getattr(self, "swagger_fake_view", False):
             return Booking.objects.none()
 
-        qs = Booking.objects.all()
+        qs = Booking.objects.select_related("user")
 
         # Admin sees all
         if self.request.user.is_staff or self.request.user.is_superuser:
@@ -175,6 +289,49 @@ class BookingViewSet(ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         raise PermissionDenied("Bookings cannot be deleted. Use cancel instead.")
 
+    @swagger_auto_schema(request_body=BulkBookingSerializer)
+    @action(detail=False, methods=["post"], url_path="bulk", permission_classes=[IsAuthenticated])
+    def bulk(self, request):
+        """
+        POST /api/bookings/bulk/ {"availabilities": [ids], "mode": "atomic" | "best_effort", "notes": ""}
+        atomic: all slots are booked or none; best_effort: every bookable slot is booked.
+        """
+        serializer = BulkBookingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = serializer.save(user=request.user)
+
+        if result["created"] == len(result["results"]):
+            code = status.HTTP_201_CREATED
+        elif result["mode"] == BulkBookingSerializer.ATOMIC:
+            code = status.HTTP_400_BAD_REQUEST
+        else:
+            code = status.HTTP_207_MULTI_STATUS
+        return Response(result, status=code)
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter("output", openapi.IN_QUERY, description="csv (default) or ndjson", type=openapi.TYPE_STRING),
+        ]
+    )
+    @action(detail=False, methods=["get"], url_path="export", permission_classes=[IsAdminUser])
+    def export(self, request):
+        """
+        GET /api/bookings/export/?output=csv|ndjson (admin)
+        Every booking matching the list filters (status, service, date, username), streamed
+        in constant memory. `output` rather than `format`, which DRF keeps for renderers.
+        """
+        output = request.query_params.get("output", "csv")
+        if output not in EXPORT_FORMATS:
+            return Response(
+                {"detail": f"output must be one of: {', '.join(EXPORT_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        lines, content_type = EXPORT_FORMATS[output]
+        response = StreamingHttpResponse(lines(self.get_queryset()), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="bookings.{output}"'
+        return response
+
     @action(detail=True, methods=["post"], url_path="cancel", permission_classes=[IsAuthenticated])
     def cancel(self, request, pk=None):
         booking = self.get_object()
@@ -186,7 +343,11 @@ class BookingViewSet(ModelViewSet):
             return Response({"detail": "Already cancelled."}, status=status.HTTP_400_BAD_REQUEST)
 
         if booking.availability_id is not None:
-            naive_dt = datetime.combine(booking.availability.date, booking.availability.start_time)
+            # snapshot columns; bookings older than the snapshot still read the slot
+            day, start = booking.date, booking.start_time
+            if day is None or start is None:
+                day, start = booking.availability.date, booking.availability.start_time
+            naive_dt = datetime.combine(day, start)
             booking_dt = timezone.make_aware(naive_dt, timezone.get_current_timezone())
 
             if booking_dt <= timezone.now():
@@ -197,7 +358,9 @@ class BookingViewSet(ModelViewSet):
 
         booking.status = "CANCELLED"
         booking.availability = None  # frees slot (OneToOne)
-        booking.save(update_fields=["status", "availability"])
+        with transaction.atomic():
+            # the bitmap update and the slot event commit with the booking
+            booking.save(update_fields=["status", "availability"])
 
         return Response(self.get_serializer(booking).data, status=status.HTTP_200_OK)
 
@@ -215,7 +378,52 @@ class BookingViewSet(ModelViewSet):
         booking.save(update_fields=["status"])
         return Response(self.get_serializer(booking).data, status=status.HTTP_200_OK)
 
-class RegisterView(APIView):
+    @swagger_auto_schema(request_body=BulkStatusSerializer)
+    @action(detail=False, methods=["post"], url_path="bulk-confirm", permission_classes=[IsAdminUser])
+    def bulk_confirm(self, request):
+        """
+        POST /api/bookings/bulk-confirm/ {"ids": [...]} (admin), or without ids with the
+        list filters (?status=PENDING&date=...). Per-booking report; 207 when some are rejected.
+        """
+        return self.change_status(request, confirm_bookings)
+
+    @swagger_auto_schema(request_body=BulkStatusSerializer)
+    @action(detail=False, methods=["post"], url_path="bulk-cancel", permission_classes=[IsAuthenticated])
+    def bulk_cancel(self, request):
+        """
+        POST /api/bookings/bulk-cancel/ {"ids": [...]}: own bookings, any for admins, who
+        may also use the list filters instead of ids. Past bookings are rejected.
+        """
+        return self.change_status(request, cancel_bookings)
+
+    def change_status(self, request, change):
+        serializer = BulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data.get("ids")
+        queryset = self.get_queryset()
+
+        if ids is None:
+            # the filters only apply to admins: anyone else would select all their bookings
+            filters = {"date", "service", "status", "username"} & set(request.query_params)
+            if not request.user.is_staff or not filters:
+                return Response(
+                    {"ids": ["Give the booking ids, or (admins) at least one list filter."]},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if queryset.count() > BulkStatusSerializer.MAX_ITEMS:
+                return Response(
+                    {"detail": f"More than {BulkStatusSerializer.MAX_ITEMS} bookings match; narrow the filters."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        report = change(queryset, ids)
+        if any(result["status"] == "rejected" for result in report["results"]):
+            return Response(report, status=status.HTTP_207_MULTI_STATUS)
+        return Response(report, status=status.HTTP_200_OK)
+
+class RegisterView(QueryBudgetMixin, APIView):
+    query_budgets = {"post": 3}
+    throttle_scope = "register"
     permission_classes = [AllowAny]
 
     def post(self, request):
@@ -227,20 +435,28 @@ class RegisterView(APIView):
             status=status.HTTP_201_CREATED
         )
 
-class MyBookingsView(APIView):
+class LoginView(TokenObtainPairView):
+    throttle_scope = "login"
+
+
+class MyBookingsView(QueryBudgetMixin, APIView):
+    query_budgets = {"get": 2}
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        bookings = Booking.objects.filter(user=request.user)
-        serializer = BookingSerializer(bookings, many=True)
-        return Response(serializer.data)
+        shape = Shape(request.query_params, BookingSerializer)
+        rows = shape.projection.values(Booking.objects.filter(user=request.user))
+        paginator = BookingCursorPagination()
+        page = paginator.paginate_queryset(rows, request, view=self)
+        return paginator.get_paginated_response(shape.render(page))
     
-class MeView(APIView):
+class MeView(QueryBudgetMixin, APIView):
+    query_budgets = {"get": 1}
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
-        u = request.user
-        return Response({
+    @staticmethod
+    def payload(u):
+        return {
             "id": u.id,
             "username": u.username,
             "first_name": u.first_name,
@@ -248,4 +464,19 @@ class MeView(APIView):
             "email": u.email,
             "is_staff": u.is_staff,
             "is_superuser": u.is_superuser,
-        })
\ No newline at end of file
+        }
+
+    def get(self, request):
+        return Response(self.payload(request.user))
+
+
+class MetricsView(QueryBudgetMixin, APIView):
+    """Prometheus text exposition of the process-shared counters."""
+    query_budgets = {"get": 1}
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(
+            metrics.render_prometheus(metrics.snapshot()) + metrics.render_pool_prometheus(pool.stats()),
+            content_type="text/plain; version=0.0.4",
+        )
@@ -3,4 +3,11 @@ set -euo pipefail
 
 python manage.py migrate
 python manage.py collectstatic --noinput
+# slots of the rolling horizon (also schedule this daily, e.g. as a cron job)
+python manage.py pregenerate_slots
+
+# SERVER_MODE=asgi serves the app through uvicorn workers (pair with ASYNC_VIEWS=True)
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+    exec gunicorn booking_system.asgi:application -k uvicorn.workers.UvicornWorker --bind 0.0.0.0:${PORT}
+fi
 exec gunicorn booking_system.wsgi:application --bind 0.0.0.0:${PORT}